@@ -16,7 +16,10 @@ from flask import Flask, request, Response, session
 import flask_login
 from flask_cors import CORS
 
+from core.embedding import embedding_cache
 from core.model_providers.providers import hosted
+from core.stream import stream_transport
+from core.stream.generate_task_scheduler import generate_task_scheduler
 from extensions import ext_session, ext_celery, ext_sentry, ext_redis, ext_login, ext_migrate, \
     ext_database, ext_storage, ext_mail, ext_stripe
 from extensions.ext_database import db
@@ -32,6 +35,7 @@ from config import Config, CloudEditionConfig
 from commands import register_commands
 from models.account import TenantAccountJoin, AccountStatus
 from models.model import Account, EndUser, App
+from services import api_token_service
 from services.account_service import TenantService
 
 import warnings
@@ -73,6 +77,9 @@ def create_app(test_config=None) -> Flask:
     register_commands(app)
 
     hosted.init_app(app)
+    embedding_cache.init_app(app)
+    stream_transport.init_app(app)
+    api_token_service.init_app(app)
 
     return app
 
@@ -248,7 +255,8 @@ def threads():
 
     return {
         'thread_num': num_threads,
-        'threads': thread_list
+        'threads': thread_list,
+        'generate_task_num': generate_task_scheduler.pending_count()
     }
 
 
@@ -265,5 +273,10 @@ def pool_stat():
     }
 
 
+@app.route('/embedding-cache-stat')
+def embedding_cache_stat():
+    return embedding_cache.embedding_cache.stats()
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001)
@@ -9,26 +9,31 @@ import click
 from tqdm import tqdm
 from flask import current_app
 from langchain.embeddings import OpenAIEmbeddings
+from sqlalchemy import func
 from werkzeug.exceptions import NotFound
 
 from core.embedding.cached_embedding import CacheEmbedding
 from core.index.index import IndexBuilder
+from core.index.keyword_table_index.keyword_table_index import KeywordTableIndex
 from core.model_providers.model_factory import ModelFactory
 from core.model_providers.models.embedding.openai_embedding import OpenAIEmbedding
 from core.model_providers.models.entity.model_params import ModelType
 from core.model_providers.providers.hosted import hosted_model_providers
 from core.model_providers.providers.openai_provider import OpenAIProvider
+from core.model_providers.quota_accounting import ProviderQuotaAccounting
 from libs.password import password_pattern, valid_password, hash_password
 from libs.helper import email as email_validate
 from extensions.ext_database import db
 from libs.rsa import generate_key_pair
 from models.account import InvitationCode, Tenant, TenantAccountJoin
-from models.dataset import Dataset, DatasetQuery, Document
+from models.dataset import Dataset, DatasetQuery, Document, Embedding, DatasetKeywordTable, DatasetKeywordPosting, \
+    DatasetKeywordFrequency
 from models.model import Account, AppModelConfig, App
 import secrets
 import base64
 
 from models.provider import Provider, ProviderType, ProviderQuotaType, ProviderModel
+from services.app_statistics_service import AppStatisticsService
 
 
 @click.command('reset-password', help='Reset the account password.')
@@ -286,6 +291,7 @@ def sync_anthropic_hosted_providers():
             try:
                 click.echo('Syncing tenant anthropic hosted provider: {}, origin: limit {}, used {}'
                            .format(provider.tenant_id, provider.quota_limit, provider.quota_used))
+                provider.quota_used += ProviderQuotaAccounting.evict(provider)
                 original_quota_limit = provider.quota_limit
                 division = math.ceil(new_quota_limit / 1000)
 
@@ -541,6 +547,159 @@ def update_app_model_configs(batch_size):
             
             pbar.update(len(data_batch))
 
+
+@click.command('migrate-embeddings-format', help='Migrate pickled embeddings to the compact binary format. '
+                                                 'The float64 values of pickled embeddings are stored '
+                                                 'with the lower precision of the chosen dtype.')
+@click.option("--batch-size", default=1000, help="Number of embeddings to migrate in each batch.")
+@click.option("--dtype", default=None, help="Storage dtype of migrated embeddings, float32 or float16.")
+def migrate_embeddings_format(batch_size, dtype):
+    dtype = dtype or current_app.config.get('EMBEDDING_STORAGE_DTYPE', 'float32')
+    click.echo(click.style('Start migrate embeddings to {} format.'.format(dtype), fg='green'))
+    start_at = time.perf_counter()
+    migrate_count = 0
+
+    # legacy rows are pickled lists, which always start with the pickle PROTO opcode (0x80)
+    legacy_filter = func.get_byte(Embedding.embedding, 0) == 0x80
+
+    last_id = None
+    while True:
+        query = db.session.query(Embedding.id, Embedding.embedding).filter(legacy_filter)
+        if last_id:
+            query = query.filter(Embedding.id > last_id)
+
+        rows = query.order_by(Embedding.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        last_id = rows[-1].id
+
+        try:
+            mappings = []
+            for row in rows:
+                if not Embedding.is_legacy_embedding(row.embedding):
+                    continue
+
+                mappings.append({
+                    'id': row.id,
+                    'embedding': Embedding.encode_embedding(Embedding.decode_embedding(row.embedding), dtype)
+                })
+
+            db.session.bulk_update_mappings(Embedding, mappings)
+            db.session.commit()
+            migrate_count += len(mappings)
+            click.echo('Migrated {} embeddings.'.format(migrate_count))
+        except Exception as e:
+            db.session.rollback()
+            click.echo(
+                click.style('Migrate embeddings error: {} {}'.format(e.__class__.__name__, str(e)), fg='red'))
+            continue
+
+    end_at = time.perf_counter()
+    click.echo(click.style('Congratulations! Migrate {} embeddings, latency: {}'.format(
+        migrate_count, end_at - start_at), fg='green'))
+
+
+@click.command('migrate-keyword-tables', help='Move the legacy JSON keyword tables of economy datasets '
+                                              'to keyword postings and count the term frequencies of '
+                                              'postings written before they were stored.')
+def migrate_keyword_tables():
+    click.echo(click.style('Start migrate keyword tables.', fg='green'))
+    start_at = time.perf_counter()
+    migrate_count = 0
+    failed_dataset_ids = set()
+
+    while True:
+        query = db.session.query(DatasetKeywordTable.dataset_id)
+        if failed_dataset_ids:
+            query = query.filter(DatasetKeywordTable.dataset_id.notin_(failed_dataset_ids))
+
+        dataset_keyword_table = query.first()
+        if not dataset_keyword_table:
+            break
+
+        dataset_id = dataset_keyword_table.dataset_id
+        try:
+            dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
+            if not dataset:
+                db.session.query(DatasetKeywordTable).filter(DatasetKeywordTable.dataset_id == dataset_id) \
+                    .delete(synchronize_session=False)
+                db.session.commit()
+                continue
+
+            node_count = KeywordTableIndex(dataset).migrate_legacy_keyword_table()
+            migrate_count += 1
+            click.echo('Migrated keyword table of dataset {} with {} nodes.'.format(dataset_id, node_count))
+        except Exception as e:
+            db.session.rollback()
+            failed_dataset_ids.add(dataset_id)
+            click.echo(click.style('Migrate keyword table of dataset {} error: {} {}'.format(
+                dataset_id, e.__class__.__name__, str(e)), fg='red'))
+
+    count_count = 0
+    while True:
+        query = db.session.query(DatasetKeywordPosting.dataset_id).filter(DatasetKeywordPosting.segment_length == 0)
+        if failed_dataset_ids:
+            query = query.filter(DatasetKeywordPosting.dataset_id.notin_(failed_dataset_ids))
+
+        dataset_keyword_posting = query.first()
+        if not dataset_keyword_posting:
+            break
+
+        dataset_id = dataset_keyword_posting.dataset_id
+        try:
+            dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
+            if not dataset:
+                db.session.query(DatasetKeywordPosting).filter(DatasetKeywordPosting.dataset_id == dataset_id) \
+                    .delete(synchronize_session=False)
+                db.session.query(DatasetKeywordFrequency).filter(DatasetKeywordFrequency.dataset_id == dataset_id) \
+                    .delete(synchronize_session=False)
+                db.session.commit()
+                continue
+
+            node_count = KeywordTableIndex(dataset).count_uncounted_postings()
+            count_count += 1
+            click.echo('Counted keyword postings of dataset {} with {} nodes.'.format(dataset_id, node_count))
+        except Exception as e:
+            db.session.rollback()
+            failed_dataset_ids.add(dataset_id)
+            click.echo(click.style('Count keyword postings of dataset {} error: {} {}'.format(
+                dataset_id, e.__class__.__name__, str(e)), fg='red'))
+
+    end_at = time.perf_counter()
+    click.echo(click.style('Congratulations! Migrate {} keyword tables, count postings of {} datasets, '
+                           'latency: {}'.format(migrate_count, count_count, end_at - start_at), fg='green'))
+
+
+@click.command('rebuild-app-statistics', help='Rebuild the hourly app statistics from messages. '
+                                              'The last hour is left to live updates, '
+                                              'run it again later to complete it after upgrading.')
+@click.option("--app-id", default=None, help="Only rebuild the statistics of this app.")
+def rebuild_app_statistics(app_id):
+    click.echo(click.style('Start rebuild app statistics.', fg='green'))
+    start_at = time.perf_counter()
+    cutoff = datetime.datetime.utcnow().replace(minute=0, second=0, microsecond=0) - datetime.timedelta(hours=1)
+
+    if app_id:
+        app_ids = [app_id]
+    else:
+        app_ids = [app.id for app in db.session.query(App.id).order_by(App.created_at).all()]
+
+    rebuild_count = 0
+    for app_id in app_ids:
+        try:
+            AppStatisticsService.rebuild(app_id, cutoff)
+            rebuild_count += 1
+        except Exception as e:
+            click.echo(click.style('Rebuild app statistics error: {} {}, app_id: {}'.format(
+                e.__class__.__name__, str(e), app_id), fg='red'))
+            continue
+
+    end_at = time.perf_counter()
+    click.echo(click.style('Congratulations! Rebuild statistics of {} apps, latency: {}'.format(
+        rebuild_count, end_at - start_at), fg='green'))
+
+
 def register_commands(app):
     app.cli.add_command(reset_password)
     app.cli.add_command(reset_email)
@@ -551,4 +710,7 @@ def register_commands(app):
     app.cli.add_command(clean_unused_dataset_indexes)
     app.cli.add_command(create_qdrant_indexes)
     app.cli.add_command(update_qdrant_indexes)
-    app.cli.add_command(update_app_model_configs)
\ No newline at end of file
+    app.cli.add_command(update_app_model_configs)
+    app.cli.add_command(migrate_embeddings_format)
+    app.cli.add_command(migrate_keyword_tables)
+    app.cli.add_command(rebuild_app_statistics)
@@ -65,6 +65,23 @@ DEFAULTS = {
     'CLEAN_DAY_SETTING': 30,
     'UPLOAD_FILE_SIZE_LIMIT': 15,
     'UPLOAD_FILE_BATCH_LIMIT': 5,
+    'EMBEDDING_CACHE_LRU_SIZE': 1000,
+    'EMBEDDING_CACHE_REDIS_ENABLED': 'False',
+    'EMBEDDING_CACHE_REDIS_TTL': 3600,
+    'EMBEDDING_STORAGE_DTYPE': 'float32',
+    'INDEXING_EMBEDDING_CONCURRENCY': 4,
+    'INDEXING_EMBEDDING_BATCH_MAX_TOKENS': 20000,
+    'INDEXING_EMBEDDING_MAX_RETRIES': 5,
+    'STREAM_TRANSPORT': 'memory',
+    'STREAM_TEXT_COALESCE_WINDOW_MS': 50,
+    'STREAM_TEXT_COALESCE_MAX_BYTES': 2048,
+    'STREAM_STOP_CHECK_INTERVAL_MS': 200,
+    'API_TOKEN_CACHE_TTL': 10,
+    'API_TOKEN_LAST_USED_UPDATE_INTERVAL': 60,
+    'PROVIDER_QUOTA_FLUSH_INTERVAL': 5,
+    'PROVIDER_LAST_USED_UPDATE_INTERVAL': 60,
+    'SEGMENT_HIT_COUNT_FLUSH_INTERVAL': 10,
+    'APP_STATISTICS_FLUSH_INTERVAL': 10,
 }
 
 
@@ -247,6 +264,43 @@ class Config:
         self.UPLOAD_FILE_SIZE_LIMIT = int(get_env('UPLOAD_FILE_SIZE_LIMIT'))
         self.UPLOAD_FILE_BATCH_LIMIT = int(get_env('UPLOAD_FILE_BATCH_LIMIT'))
 
+        # embedding cache settings
+        self.EMBEDDING_CACHE_LRU_SIZE = int(get_env('EMBEDDING_CACHE_LRU_SIZE'))
+        self.EMBEDDING_CACHE_REDIS_ENABLED = get_bool_env('EMBEDDING_CACHE_REDIS_ENABLED')
+        self.EMBEDDING_CACHE_REDIS_TTL = int(get_env('EMBEDDING_CACHE_REDIS_TTL'))
+
+        # embedding storage format, support float32, float16
+        self.EMBEDDING_STORAGE_DTYPE = get_env('EMBEDDING_STORAGE_DTYPE')
+
+        # indexing embedding settings
+        self.INDEXING_EMBEDDING_CONCURRENCY = int(get_env('INDEXING_EMBEDDING_CONCURRENCY'))
+        self.INDEXING_EMBEDDING_BATCH_MAX_TOKENS = int(get_env('INDEXING_EMBEDDING_BATCH_MAX_TOKENS'))
+        self.INDEXING_EMBEDDING_MAX_RETRIES = int(get_env('INDEXING_EMBEDDING_MAX_RETRIES'))
+
+        # streaming transport between generate worker and response, support memory, redis
+        self.STREAM_TRANSPORT = get_env('STREAM_TRANSPORT')
+
+        # merge streamed text deltas within the window or until the size is reached, 0 to disable
+        self.STREAM_TEXT_COALESCE_WINDOW_MS = int(get_env('STREAM_TEXT_COALESCE_WINDOW_MS'))
+        self.STREAM_TEXT_COALESCE_MAX_BYTES = int(get_env('STREAM_TEXT_COALESCE_MAX_BYTES'))
+
+        # minimal interval between two reads of the stop flag from redis while streaming, 0 to read every time
+        self.STREAM_STOP_CHECK_INTERVAL_MS = int(get_env('STREAM_STOP_CHECK_INTERVAL_MS'))
+
+        # service api token settings, seconds, 0 to disable the cache / update last_used_at on every request
+        self.API_TOKEN_CACHE_TTL = int(get_env('API_TOKEN_CACHE_TTL'))
+        self.API_TOKEN_LAST_USED_UPDATE_INTERVAL = int(get_env('API_TOKEN_LAST_USED_UPDATE_INTERVAL'))
+
+        # system provider quota is accounted in redis and flushed to db every interval, seconds
+        self.PROVIDER_QUOTA_FLUSH_INTERVAL = int(get_env('PROVIDER_QUOTA_FLUSH_INTERVAL'))
+        self.PROVIDER_LAST_USED_UPDATE_INTERVAL = int(get_env('PROVIDER_LAST_USED_UPDATE_INTERVAL'))
+
+        # hit counts of retrieved segments are aggregated in redis and flushed to db every interval, seconds
+        self.SEGMENT_HIT_COUNT_FLUSH_INTERVAL = int(get_env('SEGMENT_HIT_COUNT_FLUSH_INTERVAL'))
+
+        # hourly app statistics are aggregated in redis and flushed to db every interval, seconds
+        self.APP_STATISTICS_FLUSH_INTERVAL = int(get_env('APP_STATISTICS_FLUSH_INTERVAL'))
+
 
 class CloudEditionConfig(Config):
 
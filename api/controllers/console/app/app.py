@@ -22,6 +22,7 @@ from events.app_event import app_was_created, app_was_deleted
 from libs.helper import TimestampField
 from extensions.ext_database import db
 from models.model import App, AppModelConfig, Site
+from services.api_token_service import ApiTokenService
 from services.app_model_config_service import AppModelConfigService
 
 model_config_fields = {
@@ -416,6 +417,8 @@ class AppApiStatus(Resource):
         app.enable_api = args.get('enable_api')
         app.updated_at = datetime.utcnow()
         db.session.commit()
+
+        ApiTokenService.invalidate_app(app.id)
         return app
 
 
@@ -13,9 +13,10 @@ from controllers.console import api
 from controllers.console.app import _get_app
 from controllers.console.setup import setup_required
 from controllers.console.wraps import account_initialization_required
-from libs.helper import TimestampField, datetime_string, uuid_value
+from libs.helper import TimestampField, datetime_string, uuid_value, escape_like_pattern
 from extensions.ext_database import db
 from models.model import Message, MessageAnnotation, Conversation
+from services.conversation_service import ConversationService
 
 account_fields = {
     'id': fields.String,
@@ -138,14 +139,19 @@ class CompletionConversationApi(Resource):
         query = db.select(Conversation).where(Conversation.app_id == app.id, Conversation.mode == 'completion')
 
         if args['keyword']:
-            query = query.join(
-                Message, Message.conversation_id == Conversation.id
-            ).filter(
-                or_(
-                    Message.query.ilike('%{}%'.format(args['keyword'])),
-                    Message.answer.ilike('%{}%'.format(args['keyword']))
+            keyword_filter = '%{}%'.format(escape_like_pattern(args['keyword']))
+
+            # a semi-join served by the trigram indexes of messages, each conversation is matched once.
+            # keywords shorter than 3 characters have no trigram and fall back to scanning the app's messages
+            query = query.where(Conversation.id.in_(
+                db.select(Message.conversation_id).where(
+                    Message.app_id == app.id,
+                    or_(
+                        Message.query.ilike(keyword_filter, escape='\\'),
+                        Message.answer.ilike(keyword_filter, escape='\\')
+                    )
                 )
-            )
+            ))
 
         account = current_user
         timezone = pytz.timezone(account.timezone)
@@ -187,6 +193,11 @@ class CompletionConversationApi(Resource):
             error_out=False
         )
 
+        ConversationService.load_properties(conversations.items, [
+            'from_end_user_session_id', 'annotation', 'model_config', 'user_feedback_stats', 'admin_feedback_stats',
+            'first_message'
+        ])
+
         return conversations
 
 
@@ -292,16 +303,24 @@ class ChatConversationApi(Resource):
         query = db.select(Conversation).where(Conversation.app_id == app.id, Conversation.mode == 'chat')
 
         if args['keyword']:
-            query = query.join(
-                Message, Message.conversation_id == Conversation.id
-            ).filter(
-                or_(
-                    Message.query.ilike('%{}%'.format(args['keyword'])),
-                    Message.answer.ilike('%{}%'.format(args['keyword'])),
-                    Conversation.name.ilike('%{}%'.format(args['keyword'])),
-                    Conversation.introduction.ilike('%{}%'.format(args['keyword'])),
-                ),
+            keyword_filter = '%{}%'.format(escape_like_pattern(args['keyword']))
 
+            # a semi-join served by the trigram indexes of messages, each conversation is matched once.
+            # keywords shorter than 3 characters have no trigram and fall back to scanning the app's messages
+            query = query.where(
+                or_(
+                    Conversation.name.ilike(keyword_filter, escape='\\'),
+                    Conversation.introduction.ilike(keyword_filter, escape='\\'),
+                    Conversation.id.in_(
+                        db.select(Message.conversation_id).where(
+                            Message.app_id == app.id,
+                            or_(
+                                Message.query.ilike(keyword_filter, escape='\\'),
+                                Message.answer.ilike(keyword_filter, escape='\\')
+                            )
+                        )
+                    )
+                )
             )
 
         account = current_user
@@ -352,6 +371,11 @@ class ChatConversationApi(Resource):
             error_out=False
         )
 
+        ConversationService.load_properties(conversations.items, [
+            'from_end_user_session_id', 'annotation', 'model_config', 'message_count', 'user_feedback_stats',
+            'admin_feedback_stats', 'first_message'
+        ])
+
         return conversations
 
 
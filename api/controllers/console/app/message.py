@@ -21,10 +21,11 @@ from libs.helper import uuid_value, TimestampField
 from libs.infinite_scroll_pagination import InfiniteScrollPagination
 from extensions.ext_database import db
 from models.model import MessageAnnotation, Conversation, Message, MessageFeedback
+from services.app_statistics_service import AppStatisticsService
 from services.completion_service import CompletionService
 from services.errors.app import MoreLikeThisDisabledError
 from services.errors.conversation import ConversationNotExistsError
-from services.errors.message import MessageNotExistsError
+from services.errors.message import MessageNotExistsError, FirstMessageNotExistsError
 from services.message_service import MessageService
 
 account_fields = {
@@ -97,42 +98,20 @@ class ChatMessageListApi(Resource):
         if not conversation:
             raise NotFound("Conversation Not Exists.")
 
-        if args['first_id']:
-            first_message = db.session.query(Message) \
-                .filter(Message.conversation_id == conversation.id, Message.id == args['first_id']).first()
-
-            if not first_message:
-                raise NotFound("First message not found")
-
-            history_messages = db.session.query(Message).filter(
-                Message.conversation_id == conversation.id,
-                Message.created_at < first_message.created_at,
-                Message.id != first_message.id
-            ) \
-                .order_by(Message.created_at.desc()).limit(args['limit']).all()
-        else:
-            history_messages = db.session.query(Message).filter(Message.conversation_id == conversation.id) \
-                .order_by(Message.created_at.desc()).limit(args['limit']).all()
-
-        has_more = False
-        if len(history_messages) == args['limit']:
-            current_page_first_message = history_messages[-1]
-            rest_count = db.session.query(Message).filter(
-                Message.conversation_id == conversation.id,
-                Message.created_at < current_page_first_message.created_at,
-                Message.id != current_page_first_message.id
-            ).count()
-
-            if rest_count > 0:
-                has_more = True
+        try:
+            pagination = InfiniteScrollPagination.paginate_by_keyset(
+                query=db.session.query(Message).filter(Message.conversation_id == conversation.id),
+                model=Message,
+                last_id=args['first_id'],
+                limit=args['limit'],
+                last_not_exists_error=FirstMessageNotExistsError
+            )
+        except FirstMessageNotExistsError:
+            raise NotFound("First message not found")
 
-        history_messages = list(reversed(history_messages))
+        pagination.data = list(reversed(pagination.data))
 
-        return InfiniteScrollPagination(
-            data=history_messages,
-            limit=args['limit'],
-            has_more=has_more
-        )
+        return pagination
 
 
 class MessageFeedbackApi(Resource):
@@ -162,8 +141,10 @@ class MessageFeedbackApi(Resource):
 
         feedback = message.admin_feedback
 
+        feedback_count_delta = 0
         if not args['rating'] and feedback:
             db.session.delete(feedback)
+            feedback_count_delta = -1
         elif args['rating'] and feedback:
             feedback.rating = args['rating']
         elif not args['rating'] and not feedback:
@@ -178,9 +159,13 @@ class MessageFeedbackApi(Resource):
                 from_account_id=current_user.id
             )
             db.session.add(feedback)
+            feedback_count_delta = 1
 
         db.session.commit()
 
+        if feedback_count_delta:
+            AppStatisticsService.record_feedback(message, feedback_count_delta)
+
         return {'result': 'success'}
 
 
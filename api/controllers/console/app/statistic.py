@@ -32,8 +32,8 @@ class DailyConversationStatistic(Resource):
         args = parser.parse_args()
 
         sql_query = '''
-        SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, count(distinct messages.conversation_id) AS conversation_count
-            FROM messages where app_id = :app_id 
+        SELECT date(DATE_TRUNC('day', hour AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, count(distinct member_id) AS conversation_count
+            FROM app_statistics_hourly_members where app_id = :app_id and member_type = 'conversation'
         '''
         arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
 
@@ -47,7 +47,7 @@ class DailyConversationStatistic(Resource):
             start_datetime_timezone = timezone.localize(start_datetime)
             start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and created_at >= :start'
+            sql_query += ' and hour >= :start'
             arg_dict['start'] = start_datetime_utc
 
         if args['end']:
@@ -57,7 +57,7 @@ class DailyConversationStatistic(Resource):
             end_datetime_timezone = timezone.localize(end_datetime)
             end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and created_at < :end'
+            sql_query += ' and hour < :end'
             arg_dict['end'] = end_datetime_utc
 
         sql_query += ' GROUP BY date order by date'
@@ -94,8 +94,8 @@ class DailyTerminalsStatistic(Resource):
         args = parser.parse_args()
 
         sql_query = '''
-                SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, count(distinct messages.from_end_user_id) AS terminal_count
-                    FROM messages where app_id = :app_id 
+                SELECT date(DATE_TRUNC('day', hour AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, count(distinct member_id) AS terminal_count
+                    FROM app_statistics_hourly_members where app_id = :app_id and member_type = 'end_user'
                 '''
         arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
 
@@ -109,7 +109,7 @@ class DailyTerminalsStatistic(Resource):
             start_datetime_timezone = timezone.localize(start_datetime)
             start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and created_at >= :start'
+            sql_query += ' and hour >= :start'
             arg_dict['start'] = start_datetime_utc
 
         if args['end']:
@@ -119,7 +119,7 @@ class DailyTerminalsStatistic(Resource):
             end_datetime_timezone = timezone.localize(end_datetime)
             end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and created_at < :end'
+            sql_query += ' and hour < :end'
             arg_dict['end'] = end_datetime_utc
 
         sql_query += ' GROUP BY date order by date'
@@ -155,10 +155,10 @@ class DailyTokenCostStatistic(Resource):
         args = parser.parse_args()
 
         sql_query = '''
-                SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-                    (sum(messages.message_tokens) + sum(messages.answer_tokens)) as token_count,
+                SELECT date(DATE_TRUNC('day', hour AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
+                    (sum(message_tokens) + sum(answer_tokens)) as token_count,
                     sum(total_price) as total_price
-                    FROM messages where app_id = :app_id 
+                    FROM app_statistics_hourly where app_id = :app_id and message_count > 0
                 '''
         arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
 
@@ -172,7 +172,7 @@ class DailyTokenCostStatistic(Resource):
             start_datetime_timezone = timezone.localize(start_datetime)
             start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and created_at >= :start'
+            sql_query += ' and hour >= :start'
             arg_dict['start'] = start_datetime_utc
 
         if args['end']:
@@ -182,7 +182,7 @@ class DailyTokenCostStatistic(Resource):
             end_datetime_timezone = timezone.localize(end_datetime)
             end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and created_at < :end'
+            sql_query += ' and hour < :end'
             arg_dict['end'] = end_datetime_utc
 
         sql_query += ' GROUP BY date order by date'
@@ -219,12 +219,18 @@ class AverageSessionInteractionStatistic(Resource):
         parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
         args = parser.parse_args()
 
-        sql_query = """SELECT date(DATE_TRUNC('day', c.created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-AVG(subquery.message_count) AS interactions
-FROM (SELECT m.conversation_id, COUNT(m.id) AS message_count
-    FROM conversations c
-    JOIN messages m ON c.id = m.conversation_id
-    WHERE c.override_model_configs IS NULL AND c.app_id = :app_id"""
+        sql_query = """SELECT s.date, CAST(m.session_message_count AS numeric) / s.session_count AS interactions
+FROM (SELECT date(DATE_TRUNC('day', hour AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, COUNT(*) AS session_count
+    FROM app_statistics_hourly_members
+    WHERE app_id = :app_id AND member_type = 'session'{time_filter}
+    GROUP BY date) s
+JOIN (SELECT date(DATE_TRUNC('day', hour AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date,
+    SUM(session_message_count) AS session_message_count
+    FROM app_statistics_hourly
+    WHERE app_id = :app_id{time_filter}
+    GROUP BY date) m ON m.date = s.date
+ORDER BY s.date"""
+        time_filter = ''
         arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
 
         timezone = pytz.timezone(account.timezone)
@@ -237,7 +243,7 @@ FROM (SELECT m.conversation_id, COUNT(m.id) AS message_count
             start_datetime_timezone = timezone.localize(start_datetime)
             start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and c.created_at >= :start'
+            time_filter += ' and hour >= :start'
             arg_dict['start'] = start_datetime_utc
 
         if args['end']:
@@ -247,14 +253,10 @@ FROM (SELECT m.conversation_id, COUNT(m.id) AS message_count
             end_datetime_timezone = timezone.localize(end_datetime)
             end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and c.created_at < :end'
+            time_filter += ' and hour < :end'
             arg_dict['end'] = end_datetime_utc
 
-        sql_query += """
-        GROUP BY m.conversation_id) subquery
-LEFT JOIN conversations c on c.id=subquery.conversation_id
-GROUP BY date
-ORDER BY date"""
+        sql_query = sql_query.format(time_filter=time_filter)
 
         with db.engine.begin() as conn:
             rs = conn.execute(db.text(sql_query), arg_dict)
@@ -287,11 +289,10 @@ class UserSatisfactionRateStatistic(Resource):
         args = parser.parse_args()
 
         sql_query = '''
-                        SELECT date(DATE_TRUNC('day', m.created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-                            COUNT(m.id) as message_count, COUNT(mf.id) as feedback_count 
-                            FROM messages m
-                            LEFT JOIN message_feedbacks mf on mf.message_id=m.id
-                            WHERE m.app_id = :app_id 
+                        SELECT date(DATE_TRUNC('day', hour AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
+                            sum(message_count) as message_count, sum(feedback_count) as feedback_count 
+                            FROM app_statistics_hourly
+                            WHERE app_id = :app_id and message_count > 0
                         '''
         arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
 
@@ -305,7 +306,7 @@ class UserSatisfactionRateStatistic(Resource):
             start_datetime_timezone = timezone.localize(start_datetime)
             start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and m.created_at >= :start'
+            sql_query += ' and hour >= :start'
             arg_dict['start'] = start_datetime_utc
 
         if args['end']:
@@ -315,7 +316,7 @@ class UserSatisfactionRateStatistic(Resource):
             end_datetime_timezone = timezone.localize(end_datetime)
             end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and m.created_at < :end'
+            sql_query += ' and hour < :end'
             arg_dict['end'] = end_datetime_utc
 
         sql_query += ' GROUP BY date order by date'
@@ -351,10 +352,10 @@ class AverageResponseTimeStatistic(Resource):
         args = parser.parse_args()
 
         sql_query = '''
-                SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-                    AVG(provider_response_latency) as latency
-                    FROM messages
-                    WHERE app_id = :app_id
+                SELECT date(DATE_TRUNC('day', hour AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
+                    sum(total_latency) / sum(message_count) as latency
+                    FROM app_statistics_hourly
+                    WHERE app_id = :app_id and message_count > 0
                 '''
         arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
 
@@ -368,7 +369,7 @@ class AverageResponseTimeStatistic(Resource):
             start_datetime_timezone = timezone.localize(start_datetime)
             start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and created_at >= :start'
+            sql_query += ' and hour >= :start'
             arg_dict['start'] = start_datetime_utc
 
         if args['end']:
@@ -378,7 +379,7 @@ class AverageResponseTimeStatistic(Resource):
             end_datetime_timezone = timezone.localize(end_datetime)
             end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and created_at < :end'
+            sql_query += ' and hour < :end'
             arg_dict['end'] = end_datetime_utc
 
         sql_query += ' GROUP BY date order by date'
@@ -413,13 +414,13 @@ class TokensPerSecondStatistic(Resource):
         parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
         args = parser.parse_args()
 
-        sql_query = '''SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
+        sql_query = '''SELECT date(DATE_TRUNC('day', hour AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
     CASE 
-        WHEN SUM(provider_response_latency) = 0 THEN 0
-        ELSE (SUM(answer_tokens) / SUM(provider_response_latency))
+        WHEN SUM(total_latency) = 0 THEN 0
+        ELSE (SUM(answer_tokens) / SUM(total_latency))
     END as tokens_per_second
-FROM messages
-WHERE app_id = :app_id'''
+FROM app_statistics_hourly
+WHERE app_id = :app_id and message_count > 0'''
         arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
 
         timezone = pytz.timezone(account.timezone)
@@ -432,7 +433,7 @@ WHERE app_id = :app_id'''
             start_datetime_timezone = timezone.localize(start_datetime)
             start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and created_at >= :start'
+            sql_query += ' and hour >= :start'
             arg_dict['start'] = start_datetime_utc
 
         if args['end']:
@@ -442,7 +443,7 @@ WHERE app_id = :app_id'''
             end_datetime_timezone = timezone.localize(end_datetime)
             end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
 
-            sql_query += ' and created_at < :end'
+            sql_query += ' and hour < :end'
             arg_dict['end'] = end_datetime_utc
 
         sql_query += ' GROUP BY date order by date'
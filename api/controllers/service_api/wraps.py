@@ -1,5 +1,4 @@
 # -*- coding:utf-8 -*-
-from datetime import datetime
 from functools import wraps
 
 from flask import request
@@ -8,7 +7,7 @@ from werkzeug.exceptions import NotFound, Unauthorized
 
 from extensions.ext_database import db
 from models.dataset import Dataset
-from models.model import ApiToken, App
+from services.api_token_service import ApiTokenService
 
 
 def validate_app_token(view=None):
@@ -17,7 +16,7 @@ def validate_app_token(view=None):
         def decorated(*args, **kwargs):
             api_token = validate_and_get_api_token('app')
 
-            app_model = db.session.query(App).filter(App.id == api_token.app_id).first()
+            app_model = ApiTokenService.get_app(api_token.app_id)
             if not app_model:
                 raise NotFound()
 
@@ -73,16 +72,12 @@ def validate_and_get_api_token(scope=None):
     if auth_scheme != 'bearer':
         raise Unauthorized("Authorization scheme must be 'Bearer'")
 
-    api_token = db.session.query(ApiToken).filter(
-        ApiToken.token == auth_token,
-        ApiToken.type == scope,
-    ).first()
+    api_token = ApiTokenService.get_api_token(auth_token, scope)
 
     if not api_token:
         raise Unauthorized("Access token is invalid")
 
-    api_token.last_used_at = datetime.utcnow()
-    db.session.commit()
+    ApiTokenService.record_last_used(api_token)
 
     return api_token
 
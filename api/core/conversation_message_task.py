@@ -1,7 +1,12 @@
 import decimal
 import json
+import threading
+import time
 from typing import Optional, Union, List
 
+from cachetools import TTLCache
+from flask import current_app
+
 from core.callback_handler.entity.agent_loop import AgentLoop
 from core.callback_handler.entity.dataset_query import DatasetQueryObj
 from core.callback_handler.entity.llm_message import LLMMessage
@@ -11,6 +16,8 @@ from core.model_providers.models.entity.message import to_prompt_messages, Messa
 from core.model_providers.models.llm.base import BaseLLM
 from core.prompt.prompt_builder import PromptBuilder
 from core.prompt.prompt_template import JinjaPromptTemplate
+from core.stream.generate_task_scheduler import generate_task_scheduler, ScheduledCall
+from core.stream.stream_transport import stream_transport
 from events.message_event import message_was_created
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
@@ -57,7 +64,10 @@ class ConversationMessageTask:
             message=self.message,
             conversation=self.conversation,
             chain_pub=False,  # disabled currently
-            agent_thought_pub=True
+            agent_thought_pub=True,
+            text_coalesce_window=current_app.config.get('STREAM_TEXT_COALESCE_WINDOW_MS', 0) / 1000,
+            text_coalesce_max_bytes=current_app.config.get('STREAM_TEXT_COALESCE_MAX_BYTES', 0),
+            stop_check_interval=current_app.config.get('STREAM_STOP_CHECK_INTERVAL_MS', 0) / 1000
         )
 
     def init(self):
@@ -97,7 +107,8 @@ class ConversationMessageTask:
                 model_id=self.model_name,
                 override_model_configs=json.dumps(override_model_configs) if override_model_configs else None,
                 mode=self.mode,
-                name='',
+                # replaced by the generated name after the first message
+                name='New conversation' if self.mode == 'chat' else '',
                 inputs=self.inputs,
                 introduction=introduction,
                 system_instruction=system_instruction,
@@ -170,14 +181,16 @@ class ConversationMessageTask:
 
         db.session.commit()
 
-        message_was_created.send(
-            self.message,
-            conversation=self.conversation,
-            is_first_message=self.is_new_conversation
-        )
-
-        if not by_stopped:
-            self.end()
+        # finish the stream before running the side effects of the message
+        try:
+            if not by_stopped:
+                self.end()
+        finally:
+            message_was_created.send(
+                self.message,
+                conversation=self.conversation,
+                is_first_message=self.is_new_conversation
+            )
 
     def init_chain(self, chain_result: ChainResult):
         message_chain = MessageChain(
@@ -294,9 +307,15 @@ class ConversationMessageTask:
 
 
 class PubHandler:
+    # stop flags set in this process, consulted before falling back to redis
+    _local_stopped_keys = TTLCache(maxsize=10000, ttl=600)
+    _local_stopped_keys_lock = threading.Lock()
+
     def __init__(self, user: Union[Account | EndUser], task_id: str,
                  message: Message, conversation: Conversation,
-                 chain_pub: bool = False, agent_thought_pub: bool = False):
+                 chain_pub: bool = False, agent_thought_pub: bool = False,
+                 text_coalesce_window: float = 0, text_coalesce_max_bytes: int = 0,
+                 stop_check_interval: float = 0):
         self._channel = PubHandler.generate_channel_name(user, task_id)
         self._stopped_cache_key = PubHandler.generate_stopped_cache_key(user, task_id)
 
@@ -306,6 +325,27 @@ class PubHandler:
         self._chain_pub = chain_pub
         self._agent_thought_pub = agent_thought_pub
 
+        # read once, text may be flushed from the scheduler thread that must not touch the session
+        self._message_id = str(message.id)
+        self._conversation_id = str(conversation.id)
+        self._mode = conversation.mode
+
+        # consecutive text deltas published within the window are merged into one message,
+        # the first delta is always published immediately and buffered text at most a window later
+        self._text_coalesce_window = text_coalesce_window
+        self._text_coalesce_max_bytes = text_coalesce_max_bytes
+        self._text_buffer = []
+        self._text_buffer_bytes = 0
+        self._text_flushed_at = None
+        self._text_flush_call: Optional[ScheduledCall] = None
+        # the buffer is flushed from the generate thread and the scheduler thread
+        self._text_lock = threading.RLock()
+
+        # the redis stop flag is read at most once per interval, stops from this process are seen at once
+        self._stop_check_interval = stop_check_interval
+        self._stopped = False
+        self._stopped_checked_at = None
+
     @classmethod
     def generate_channel_name(cls, user: Union[Account | EndUser], task_id: str):
         if not user:
@@ -320,24 +360,55 @@ class PubHandler:
         return "generate_result_stopped:{}-{}".format(user_str, task_id)
 
     def pub_text(self, text: str):
-        content = {
-            'event': 'message',
-            'data': {
-                'task_id': self._task_id,
-                'message_id': str(self._message.id),
-                'text': text,
-                'mode': self._conversation.mode,
-                'conversation_id': str(self._conversation.id)
-            }
-        }
-
-        redis_client.publish(self._channel, json.dumps(content))
+        with self._text_lock:
+            self._text_buffer.append(text)
+            self._text_buffer_bytes += len(text.encode('utf-8'))
+
+            now = time.monotonic()
+            if self._text_flushed_at is None \
+                    or now - self._text_flushed_at >= self._text_coalesce_window \
+                    or self._text_buffer_bytes >= self._text_coalesce_max_bytes:
+                self._flush_text(now)
+            elif self._text_flush_call is None:
+                # the buffer was empty, publish it when the window ends even if no more text comes
+                self._text_flush_call = generate_task_scheduler.call_later(
+                    max(self._text_flushed_at + self._text_coalesce_window - now, 0),
+                    self._flush_text
+                )
 
         if self._is_stopped():
             self.pub_end()
             raise ConversationTaskStoppedException()
 
+    def _flush_text(self, now: Optional[float] = None):
+        with self._text_lock:
+            if self._text_flush_call is not None:
+                self._text_flush_call.cancel()
+                self._text_flush_call = None
+
+            if not self._text_buffer:
+                return
+
+            content = {
+                'event': 'message',
+                'data': {
+                    'task_id': self._task_id,
+                    'message_id': self._message_id,
+                    'text': ''.join(self._text_buffer),
+                    'mode': self._mode,
+                    'conversation_id': self._conversation_id
+                }
+            }
+
+            stream_transport.publish(self._channel, content)
+
+            self._text_buffer = []
+            self._text_buffer_bytes = 0
+            self._text_flushed_at = now if now is not None else time.monotonic()
+
     def pub_chain(self, message_chain: MessageChain):
+        self._flush_text()
+
         if self._chain_pub:
             content = {
                 'event': 'chain',
@@ -353,13 +424,15 @@ class PubHandler:
                 }
             }
 
-            redis_client.publish(self._channel, json.dumps(content))
+            stream_transport.publish(self._channel, content)
 
         if self._is_stopped():
             self.pub_end()
             raise ConversationTaskStoppedException()
 
     def pub_agent_thought(self, message_agent_thought: MessageAgentThought):
+        self._flush_text()
+
         if self._agent_thought_pub:
             content = {
                 'event': 'agent_thought',
@@ -377,13 +450,15 @@ class PubHandler:
                 }
             }
 
-            redis_client.publish(self._channel, json.dumps(content))
+            stream_transport.publish(self._channel, content)
 
         if self._is_stopped():
             self.pub_end()
             raise ConversationTaskStoppedException()
 
     def pub_message_end(self, retriever_resource: List):
+        self._flush_text()
+
         content = {
             'event': 'message_end',
             'data': {
@@ -395,18 +470,20 @@ class PubHandler:
         }
         if retriever_resource:
             content['data']['retriever_resources'] = retriever_resource
-        redis_client.publish(self._channel, json.dumps(content))
+        stream_transport.publish(self._channel, content)
 
         if self._is_stopped():
             self.pub_end()
             raise ConversationTaskStoppedException()
 
     def pub_end(self):
+        self._flush_text()
+
         content = {
             'event': 'end',
         }
 
-        redis_client.publish(self._channel, json.dumps(content))
+        stream_transport.publish(self._channel, content)
 
     @classmethod
     def pub_error(cls, user: Union[Account | EndUser], task_id: str, e):
@@ -416,10 +493,24 @@ class PubHandler:
         }
 
         channel = cls.generate_channel_name(user, task_id)
-        redis_client.publish(channel, json.dumps(content))
+        stream_transport.publish(channel, content)
 
     def _is_stopped(self):
-        return redis_client.get(self._stopped_cache_key) is not None
+        if self._stopped:
+            return True
+
+        with PubHandler._local_stopped_keys_lock:
+            if self._stopped_cache_key in PubHandler._local_stopped_keys:
+                self._stopped = True
+                return True
+
+        now = time.monotonic()
+        if self._stopped_checked_at is not None and now - self._stopped_checked_at < self._stop_check_interval:
+            return False
+
+        self._stopped_checked_at = now
+        self._stopped = redis_client.get(self._stopped_cache_key) is not None
+        return self._stopped
 
     @classmethod
     def ping(cls, user: Union[Account | EndUser], task_id: str):
@@ -428,11 +519,14 @@ class PubHandler:
         }
 
         channel = cls.generate_channel_name(user, task_id)
-        redis_client.publish(channel, json.dumps(content))
+        stream_transport.publish(channel, content)
 
     @classmethod
     def stop(cls, user: Union[Account | EndUser], task_id: str):
         stopped_cache_key = cls.generate_stopped_cache_key(user, task_id)
+        with cls._local_stopped_keys_lock:
+            cls._local_stopped_keys[stopped_cache_key] = True
+
         redis_client.setex(stopped_cache_key, 600, 1)
 
 
@@ -1,10 +1,13 @@
 import logging
-from typing import List
+from typing import List, Optional
 
 import numpy as np
+from flask import current_app
 from langchain.embeddings.base import Embeddings
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 
+from core.embedding.embedding_cache import embedding_cache
 from core.model_providers.models.embedding.base import BaseEmbedding
 from extensions.ext_database import db
 from libs import helper
@@ -12,59 +15,72 @@ from models.dataset import Embedding
 
 
 class CacheEmbedding(Embeddings):
+    # max number of hashes resolved by a single `IN (...)` lookup / rows written by a single insert
+    lookup_batch_size = 1000
+
     def __init__(self, embeddings: BaseEmbedding):
         self._embeddings = embeddings
+        # embeddings computed ahead of time by the caller, consumed by embed_documents without a db lookup
+        self._precomputed_embeddings: dict[str, np.ndarray] = {}
+
+    def add_precomputed_embeddings(self, embeddings: dict[str, np.ndarray]):
+        self._precomputed_embeddings.update(embeddings)
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed search docs."""
         # use doc embedding cache or store if not exists
-        text_embeddings = []
-        embedding_queue_texts = []
-        for text in texts:
-            hash = helper.generate_text_hash(text)
-            embedding = db.session.query(Embedding).filter_by(model_name=self._embeddings.name, hash=hash).first()
-            if embedding:
-                text_embeddings.append(embedding.get_embedding())
+        hashes = [helper.generate_text_hash(text) for text in texts]
+        text_embeddings: List[Optional[List[float]]] = [None] * len(texts)
+
+        cached_embeddings = {}
+        for hash in hashes:
+            precomputed_embedding = self._precomputed_embeddings.pop(hash, None)
+            if precomputed_embedding is not None:
+                cached_embeddings[hash] = precomputed_embedding.tolist()
+
+        cached_embeddings.update(self._get_cached_embeddings(set(hashes) - cached_embeddings.keys()))
+
+        # texts with the same hash are only sent to the provider once
+        embedding_queue_indices = {}
+        for i, hash in enumerate(hashes):
+            if hash in cached_embeddings:
+                text_embeddings[i] = cached_embeddings[hash]
             else:
-                embedding_queue_texts.append(text)
+                embedding_queue_indices.setdefault(hash, []).append(i)
+
+        if embedding_queue_indices:
+            embedding_queue_hashes = list(embedding_queue_indices.keys())
+            embedding_queue_texts = [texts[embedding_queue_indices[hash][0]] for hash in embedding_queue_hashes]
 
-        if embedding_queue_texts:
             try:
                 embedding_results = self._embeddings.client.embed_documents(embedding_queue_texts)
             except Exception as ex:
                 raise self._embeddings.handle_exceptions(ex)
-            i = 0
-            normalized_embedding_results = []
-            for text in embedding_queue_texts:
-                hash = helper.generate_text_hash(text)
-
-                try:
-                    embedding = Embedding(model_name=self._embeddings.name, hash=hash)
-                    vector = embedding_results[i]
-                    normalized_embedding = (vector / np.linalg.norm(vector)).tolist()
-                    normalized_embedding_results.append(normalized_embedding)
-                    embedding.set_embedding(normalized_embedding)
-                    db.session.add(embedding)
-                    db.session.commit()
-                except IntegrityError:
-                    db.session.rollback()
-                    continue
-                except:
-                    logging.exception('Failed to add embedding to db')
-                    continue
-                finally:
-                    i += 1
-
-            text_embeddings.extend(normalized_embedding_results)
+
+            new_embeddings = {}
+            for hash, vector in zip(embedding_queue_hashes, embedding_results):
+                normalized_embedding = (vector / np.linalg.norm(vector)).tolist()
+                new_embeddings[hash] = normalized_embedding
+                for i in embedding_queue_indices[hash]:
+                    text_embeddings[i] = normalized_embedding
+
+            self._save_embeddings(new_embeddings)
+
         return text_embeddings
 
     def embed_query(self, text: str) -> List[float]:
         """Embed query text."""
         # use doc embedding cache or store if not exists
         hash = helper.generate_text_hash(text)
+        cached_embedding = embedding_cache.get(self._embeddings.name, hash)
+        if cached_embedding is not None:
+            return cached_embedding
+
         embedding = db.session.query(Embedding).filter_by(model_name=self._embeddings.name, hash=hash).first()
         if embedding:
-            return embedding.get_embedding()
+            cached_embedding = embedding.get_embedding()
+            embedding_cache.set(self._embeddings.name, hash, cached_embedding)
+            return cached_embedding
 
         try:
             embedding_results = self._embeddings.client.embed_query(text)
@@ -72,9 +88,11 @@ class CacheEmbedding(Embeddings):
         except Exception as ex:
             raise self._embeddings.handle_exceptions(ex)
 
+        embedding_cache.set(self._embeddings.name, hash, embedding_results)
+
         try:
             embedding = Embedding(model_name=self._embeddings.name, hash=hash)
-            embedding.set_embedding(embedding_results)
+            embedding.set_embedding(embedding_results, self._storage_dtype)
             db.session.add(embedding)
             db.session.commit()
         except IntegrityError:
@@ -84,3 +102,40 @@ class CacheEmbedding(Embeddings):
 
         return embedding_results
 
+    def _get_cached_embeddings(self, hashes: set[str]) -> dict[str, List[float]]:
+        """Resolve cached embeddings of the given hashes with one query per batch."""
+        cached_embeddings = {}
+        hashes = list(hashes)
+        for i in range(0, len(hashes), self.lookup_batch_size):
+            batch_hashes = hashes[i:i + self.lookup_batch_size]
+            embeddings = db.session.query(Embedding).filter(
+                Embedding.model_name == self._embeddings.name,
+                Embedding.hash.in_(batch_hashes)
+            ).all()
+
+            for embedding in embeddings:
+                cached_embeddings[embedding.hash] = embedding.get_embedding()
+
+        return cached_embeddings
+
+    @property
+    def _storage_dtype(self) -> str:
+        return current_app.config.get('EMBEDDING_STORAGE_DTYPE', 'float32')
+
+    def _save_embeddings(self, embeddings: dict[str, List[float]]):
+        """Store new embeddings with one multi-row insert per batch, skipping rows written concurrently."""
+        rows = []
+        for hash, vector in embeddings.items():
+            embedding = Embedding(model_name=self._embeddings.name, hash=hash)
+            embedding.set_embedding(vector, self._storage_dtype)
+            rows.append({'model_name': embedding.model_name, 'hash': embedding.hash, 'embedding': embedding.embedding})
+
+        try:
+            for i in range(0, len(rows), self.lookup_batch_size):
+                stmt = insert(Embedding).values(rows[i:i + self.lookup_batch_size]) \
+                    .on_conflict_do_nothing(index_elements=['model_name', 'hash'])
+                db.session.execute(stmt)
+            db.session.commit()
+        except:
+            db.session.rollback()
+            logging.exception('Failed to add embeddings to db')
@@ -0,0 +1,113 @@
+import logging
+import threading
+from typing import Optional, List
+
+from cachetools import LRUCache
+from flask import Flask
+
+from extensions.ext_redis import redis_client
+from models.dataset import Embedding
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of normalized embeddings keyed by (model_name, text_hash):
+    a bounded in-process LRU in front of an optional Redis tier with TTL.
+    The embeddings table stays the source of truth.
+    """
+
+    def __init__(self, maxsize: int = 1000, redis_enabled: bool = False, redis_ttl: int = 3600):
+        self._lock = threading.Lock()
+        self._local = LRUCache(maxsize=maxsize) if maxsize > 0 else None
+        self.redis_enabled = redis_enabled
+        self.redis_ttl = redis_ttl
+
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def configure(self, maxsize: int, redis_enabled: bool, redis_ttl: int):
+        with self._lock:
+            self._local = LRUCache(maxsize=maxsize) if maxsize > 0 else None
+        self.redis_enabled = redis_enabled
+        self.redis_ttl = redis_ttl
+
+    def get(self, model_name: str, text_hash: str) -> Optional[List[float]]:
+        key = (model_name, text_hash)
+        if self._local is not None:
+            with self._lock:
+                embedding = self._local.get(key)
+                if embedding is not None:
+                    self.local_hits += 1
+                    # a new list per caller, so that changing it does not change the cached embedding
+                    return list(embedding)
+
+        if self.redis_enabled:
+            try:
+                cache_result = redis_client.get(self._redis_key(model_name, text_hash))
+            except Exception:
+                logging.exception('Failed to get embedding from redis cache')
+                cache_result = None
+
+            if cache_result is not None:
+                embedding = Embedding.decode_embedding(cache_result).tolist()
+                self._set_local(key, embedding)
+                with self._lock:
+                    self.redis_hits += 1
+                return embedding
+
+        with self._lock:
+            self.misses += 1
+
+        return None
+
+    def set(self, model_name: str, text_hash: str, embedding: List[float]):
+        self._set_local((model_name, text_hash), embedding)
+
+        if self.redis_enabled:
+            try:
+                redis_client.setex(
+                    self._redis_key(model_name, text_hash),
+                    self.redis_ttl,
+                    Embedding.encode_embedding(embedding)
+                )
+            except Exception:
+                logging.exception('Failed to set embedding to redis cache')
+
+    def clear(self):
+        with self._lock:
+            if self._local is not None:
+                self._local.clear()
+            self.local_hits = self.redis_hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._local) if self._local is not None else 0,
+                'maxsize': self._local.maxsize if self._local is not None else 0,
+                'local_hits': self.local_hits,
+                'redis_hits': self.redis_hits,
+                'misses': self.misses,
+                'redis_enabled': self.redis_enabled
+            }
+
+    def _set_local(self, key: tuple, embedding: List[float]):
+        if self._local is not None:
+            embedding = tuple(embedding)
+            with self._lock:
+                self._local[key] = embedding
+
+    @staticmethod
+    def _redis_key(model_name: str, text_hash: str) -> str:
+        return f'embedding_cache:{model_name}:{text_hash}'
+
+
+embedding_cache = EmbeddingCache()
+
+
+def init_app(app: Flask):
+    embedding_cache.configure(
+        maxsize=app.config.get('EMBEDDING_CACHE_LRU_SIZE'),
+        redis_enabled=app.config.get('EMBEDDING_CACHE_REDIS_ENABLED'),
+        redis_ttl=app.config.get('EMBEDDING_CACHE_REDIS_TTL')
+    )
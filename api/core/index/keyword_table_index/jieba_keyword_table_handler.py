@@ -1,5 +1,5 @@
 import re
-from typing import Set
+from typing import List, Set
 
 import jieba
 from jieba.analyse import default_tfidf
@@ -21,6 +21,21 @@ class JiebaKeywordTableHandler:
 
         return set(self._expand_tokens_with_subtokens(keywords))
 
+    def tokenize(self, text: str) -> List[str]:
+        """Split text into the word tokens keywords are extracted from, each followed by its subtokens."""
+        tokens = []
+        for token in jieba.cut(text):
+            # whitespace and punctuation are never keywords
+            if not re.search(r"\w", token):
+                continue
+
+            tokens.append(token)
+            sub_tokens = re.findall(r"\w+", token)
+            if len(sub_tokens) > 1:
+                tokens.extend(sub_tokens)
+
+        return tokens
+
     def _expand_tokens_with_subtokens(self, tokens: Set[str]) -> Set[str]:
         """Get subtokens from a list of tokens., filtering for stopwords."""
         results = set()
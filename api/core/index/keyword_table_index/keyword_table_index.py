@@ -1,85 +1,89 @@
-import json
-from collections import defaultdict
-from typing import Any, List, Optional, Dict
+from collections import defaultdict, Counter
+from typing import Any, List, Dict, Tuple, Optional
 
+import numpy as np
 from langchain.schema import Document, BaseRetriever
 from pydantic import BaseModel, Field, Extra
+from sqlalchemy import func, delete, and_
+from sqlalchemy.dialects.postgresql import insert
 
 from core.index.base import BaseIndex
 from core.index.keyword_table_index.jieba_keyword_table_handler import JiebaKeywordTableHandler
 from extensions.ext_database import db
-from models.dataset import Dataset, DocumentSegment, DatasetKeywordTable
+from models.dataset import Dataset, DocumentSegment, DatasetKeywordTable, DatasetKeywordPosting, \
+    DatasetKeywordFrequency, DatasetKeywordIndexStat
 
 
 class KeywordTableConfig(BaseModel):
     max_keywords_per_chunk: int = 10
+    scoring_mode: str = 'bm25'
+    """Ranking of keyword hits, `bm25` or `keyword_count` (number of matching keywords)."""
+    bm25_k1: float = 1.2
+    bm25_b: float = 0.75
 
 
 class KeywordTableIndex(BaseIndex):
+    """
+    Keyword index stored as one posting row per (dataset, keyword, index node),
+    so writes are incremental and searches only fetch the query's keywords.
+
+    Datasets indexed before postings keep their legacy JSON keyword table until
+    `flask migrate-keyword-tables` moves it to postings, searches read both meanwhile.
+    """
+
+    # max number of posting rows written by a single insert
+    insert_batch_size = 1000
+
+    # max number of index node ids in a single `IN (...)` lookup
+    lookup_batch_size = 1000
+
     def __init__(self, dataset: Dataset, config: KeywordTableConfig = KeywordTableConfig()):
         super().__init__(dataset)
         self._config = config
 
     def create(self, texts: list[Document], **kwargs) -> BaseIndex:
-        keyword_table_handler = JiebaKeywordTableHandler()
-        keyword_table = {}
-        for text in texts:
-            keywords = keyword_table_handler.extract_keywords(text.page_content, self._config.max_keywords_per_chunk)
-            self._update_segment_keywords(self.dataset.id, text.metadata['doc_id'], list(keywords))
-            keyword_table = self._add_text_to_keyword_table(keyword_table, text.metadata['doc_id'], list(keywords))
-
-        dataset_keyword_table = DatasetKeywordTable(
-            dataset_id=self.dataset.id,
-            keyword_table=json.dumps({
-                '__type__': 'keyword_table',
-                '__data__': {
-                    "index_id": self.dataset.id,
-                    "summary": None,
-                    "table": {}
-                }
-            }, cls=SetEncoder)
-        )
-        db.session.add(dataset_keyword_table)
-        db.session.commit()
-
-        self._save_dataset_keyword_table(keyword_table)
+        self.add_texts(texts)
 
         return self
 
     def add_texts(self, texts: list[Document], **kwargs):
         keyword_table_handler = JiebaKeywordTableHandler()
 
-        keyword_table = self._get_dataset_keyword_table()
+        node_keywords = {}
+        node_contents = {}
         for text in texts:
             keywords = keyword_table_handler.extract_keywords(text.page_content, self._config.max_keywords_per_chunk)
-            self._update_segment_keywords(self.dataset.id, text.metadata['doc_id'], list(keywords))
-            keyword_table = self._add_text_to_keyword_table(keyword_table, text.metadata['doc_id'], list(keywords))
+            node_keywords[text.metadata['doc_id']] = list(keywords)
+            node_contents[text.metadata['doc_id']] = text.page_content
 
-        self._save_dataset_keyword_table(keyword_table)
+        self._update_segments_keywords(node_keywords)
+        self._add_postings(node_keywords, node_contents)
+        db.session.commit()
 
     def text_exists(self, id: str) -> bool:
-        keyword_table = self._get_dataset_keyword_table()
-        return id in set.union(*keyword_table.values())
+        posting = db.session.query(DatasetKeywordPosting.id).filter(
+            DatasetKeywordPosting.dataset_id == self.dataset.id,
+            DatasetKeywordPosting.index_node_id == id
+        ).first()
+
+        return posting is not None
 
     def delete_by_ids(self, ids: list[str]) -> None:
-        keyword_table = self._get_dataset_keyword_table()
-        keyword_table = self._delete_ids_from_keyword_table(keyword_table, ids)
+        if ids:
+            self._delete_postings(ids)
 
-        self._save_dataset_keyword_table(keyword_table)
+        db.session.commit()
 
     def delete_by_document_id(self, document_id: str):
         # get segment ids by document_id
-        segments = db.session.query(DocumentSegment).filter(
+        segments = db.session.query(DocumentSegment.index_node_id).filter(
             DocumentSegment.dataset_id == self.dataset.id,
             DocumentSegment.document_id == document_id
         ).all()
 
         ids = [segment.index_node_id for segment in segments]
 
-        keyword_table = self._get_dataset_keyword_table()
-        keyword_table = self._delete_ids_from_keyword_table(keyword_table, ids)
-
-        self._save_dataset_keyword_table(keyword_table)
+        self.delete_by_ids(ids)
 
     def get_retriever(self, **kwargs: Any) -> BaseRetriever:
         return KeywordTableRetriever(index=self, **kwargs)
@@ -88,136 +92,418 @@ class KeywordTableIndex(BaseIndex):
             self, query: str,
             **kwargs: Any
     ) -> List[Document]:
-        keyword_table = self._get_dataset_keyword_table()
-
         search_kwargs = kwargs.get('search_kwargs') if kwargs.get('search_kwargs') else {}
         k = search_kwargs.get('k') if search_kwargs.get('k') else 4
 
-        sorted_chunk_indices = self._retrieve_ids_by_query(keyword_table, query, k)
+        sorted_chunk_indices = self._retrieve_ids_by_query(query, k)
 
+        # disabled or not completed segments are skipped, go down the ranking until k segments are found
         documents = []
-        for chunk_index in sorted_chunk_indices:
-            segment = db.session.query(DocumentSegment).filter(
+        for i in range(0, len(sorted_chunk_indices), self.lookup_batch_size):
+            batch_chunk_indices = sorted_chunk_indices[i:i + self.lookup_batch_size]
+            segments = db.session.query(DocumentSegment).filter(
                 DocumentSegment.dataset_id == self.dataset.id,
-                DocumentSegment.index_node_id == chunk_index
-            ).first()
-
-            if segment:
-                documents.append(Document(
-                    page_content=segment.content,
-                    metadata={
-                        "doc_id": chunk_index,
-                        "document_id": segment.document_id,
-                        "dataset_id": segment.dataset_id,
-                    }
-                ))
+                DocumentSegment.index_node_id.in_(batch_chunk_indices),
+                DocumentSegment.enabled == True,
+                DocumentSegment.status == 'completed'
+            ).all()
+            segment_map = {segment.index_node_id: segment for segment in segments}
+
+            for chunk_index in batch_chunk_indices:
+                segment = segment_map.get(chunk_index)
+
+                if segment:
+                    documents.append(Document(
+                        page_content=segment.content,
+                        metadata={
+                            "doc_id": chunk_index,
+                            "document_id": segment.document_id,
+                            "dataset_id": segment.dataset_id,
+                        }
+                    ))
+
+                    if len(documents) >= k:
+                        return documents
 
         return documents
 
     def delete(self) -> None:
-        dataset_keyword_table = self.dataset.dataset_keyword_table
-        if dataset_keyword_table:
-            db.session.delete(dataset_keyword_table)
-            db.session.commit()
-
-    def _save_dataset_keyword_table(self, keyword_table):
-        keyword_table_dict = {
-            '__type__': 'keyword_table',
-            '__data__': {
-                "index_id": self.dataset.id,
-                "summary": None,
-                "table": keyword_table
-            }
-        }
-        self.dataset.dataset_keyword_table.keyword_table = json.dumps(keyword_table_dict, cls=SetEncoder)
+        db.session.query(DatasetKeywordPosting).filter(
+            DatasetKeywordPosting.dataset_id == self.dataset.id
+        ).delete(synchronize_session=False)
+        db.session.query(DatasetKeywordFrequency).filter(
+            DatasetKeywordFrequency.dataset_id == self.dataset.id
+        ).delete(synchronize_session=False)
+        db.session.query(DatasetKeywordIndexStat).filter(
+            DatasetKeywordIndexStat.dataset_id == self.dataset.id
+        ).delete(synchronize_session=False)
+        db.session.query(DatasetKeywordTable).filter(
+            DatasetKeywordTable.dataset_id == self.dataset.id
+        ).delete(synchronize_session=False)
         db.session.commit()
 
-    def _get_dataset_keyword_table(self) -> Optional[dict]:
-        dataset_keyword_table = self.dataset.dataset_keyword_table
-        if dataset_keyword_table:
-            if dataset_keyword_table.keyword_table_dict:
-                return dataset_keyword_table.keyword_table_dict['__data__']['table']
-        else:
-            dataset_keyword_table = DatasetKeywordTable(
-                dataset_id=self.dataset.id,
-                keyword_table=json.dumps({
-                    '__type__': 'keyword_table',
-                    '__data__': {
-                        "index_id": self.dataset.id,
-                        "summary": None,
-                        "table": {}
-                    }
-                }, cls=SetEncoder)
-            )
-            db.session.add(dataset_keyword_table)
-            db.session.commit()
-
-        return {}
-
-    def _add_text_to_keyword_table(self, keyword_table: dict, id: str, keywords: list[str]) -> dict:
-        for keyword in keywords:
-            if keyword not in keyword_table:
-                keyword_table[keyword] = set()
-            keyword_table[keyword].add(id)
-        return keyword_table
-
-    def _delete_ids_from_keyword_table(self, keyword_table: dict, ids: list[str]) -> dict:
-        # get set of ids that correspond to node
-        node_idxs_to_delete = set(ids)
-
-        # delete node_idxs from keyword to node idxs mapping
-        keywords_to_delete = set()
-        for keyword, node_idxs in keyword_table.items():
-            if node_idxs_to_delete.intersection(node_idxs):
-                keyword_table[keyword] = node_idxs.difference(
-                    node_idxs_to_delete
-                )
-                if not keyword_table[keyword]:
-                    keywords_to_delete.add(keyword)
-
-        for keyword in keywords_to_delete:
-            del keyword_table[keyword]
-
-        return keyword_table
-
-    def _retrieve_ids_by_query(self, keyword_table: dict, query: str, k: int = 4):
+    def _retrieve_ids_by_query(self, query: str, k: int = 4):
+        """
+        Rank the nodes matching the query keywords. The ranking may hold nodes whose segment is not searchable,
+        so it is not cut at k unless those are already filtered out.
+        """
         keyword_table_handler = JiebaKeywordTableHandler()
         keywords = keyword_table_handler.extract_keywords(query)
+        if not keywords:
+            return []
+
+        legacy_keyword_table = self._get_legacy_keyword_table()
+        if legacy_keyword_table is not None:
+            return self._retrieve_ids_by_legacy_keyword_table(legacy_keyword_table, list(keywords))
+
+        if self._config.scoring_mode == 'keyword_count':
+            return self._retrieve_ids_by_keyword_count(list(keywords), k)
+
+        return self._retrieve_ids_by_bm25(list(keywords))
+
+    def _retrieve_ids_by_keyword_count(self, keywords: List[str], k: int):
+        # go through searchable text chunks in order of most matching keywords
+        match_count = func.count(DatasetKeywordPosting.id).label('match_count')
+        chunk_indices = db.session.query(DatasetKeywordPosting.index_node_id, match_count).join(
+            DocumentSegment, and_(
+                DocumentSegment.dataset_id == DatasetKeywordPosting.dataset_id,
+                DocumentSegment.index_node_id == DatasetKeywordPosting.index_node_id
+            )
+        ).filter(
+            DatasetKeywordPosting.dataset_id == self.dataset.id,
+            DatasetKeywordPosting.keyword.in_(keywords),
+            DocumentSegment.enabled == True,
+            DocumentSegment.status == 'completed'
+        ).group_by(DatasetKeywordPosting.index_node_id) \
+            .order_by(match_count.desc()) \
+            .limit(k).all()
+
+        return [chunk_index.index_node_id for chunk_index in chunk_indices]
+
+    def _retrieve_ids_by_legacy_keyword_table(self, keyword_table: Dict[str, set], keywords: List[str]):
+        """
+        Rank by number of matching keywords until the legacy keyword table of the dataset is migrated,
+        its nodes are in the legacy table and the nodes indexed since in the postings.
+        """
+        matches = {(keyword, node_id) for keyword in keywords for node_id in keyword_table.get(keyword, [])}
+        postings = db.session.query(DatasetKeywordPosting.keyword, DatasetKeywordPosting.index_node_id).filter(
+            DatasetKeywordPosting.dataset_id == self.dataset.id,
+            DatasetKeywordPosting.keyword.in_(keywords)
+        ).all()
+        matches.update((posting.keyword, posting.index_node_id) for posting in postings)
+
+        match_counts = defaultdict(int)
+        for _, node_id in matches:
+            match_counts[node_id] += 1
+
+        return sorted(match_counts.keys(), key=lambda node_id: match_counts[node_id], reverse=True)
+
+    def _retrieve_ids_by_bm25(self, keywords: List[str]):
+        document_frequencies = dict(db.session.query(
+            DatasetKeywordFrequency.keyword, DatasetKeywordFrequency.document_frequency
+        ).filter(
+            DatasetKeywordFrequency.dataset_id == self.dataset.id,
+            DatasetKeywordFrequency.keyword.in_(keywords)
+        ).all())
+
+        # keywords that are not indexed in the dataset have no postings to fetch
+        keywords = [keyword for keyword in keywords if document_frequencies.get(keyword, 0) > 0]
+        if not keywords:
+            return []
+
+        postings = db.session.query(
+            DatasetKeywordPosting.index_node_id,
+            DatasetKeywordPosting.keyword,
+            DatasetKeywordPosting.term_frequency,
+            DatasetKeywordPosting.segment_length
+        ).filter(
+            DatasetKeywordPosting.dataset_id == self.dataset.id,
+            DatasetKeywordPosting.keyword.in_(keywords)
+        ).all()
+        if not postings:
+            return []
+
+        index_stat = db.session.query(DatasetKeywordIndexStat).filter(
+            DatasetKeywordIndexStat.dataset_id == self.dataset.id
+        ).first()
+
+        node_ids, scores = self.bm25_scores(
+            node_ids=[posting.index_node_id for posting in postings],
+            document_frequencies=np.array(
+                [document_frequencies[posting.keyword] for posting in postings], dtype=np.float64),
+            term_frequencies=np.array([posting.term_frequency for posting in postings], dtype=np.float64),
+            segment_lengths=np.array([posting.segment_length for posting in postings], dtype=np.float64),
+            segment_count=index_stat.segment_count if index_stat else 0,
+            average_segment_length=index_stat.average_segment_length if index_stat else 0.0,
+            k1=self._config.bm25_k1,
+            b=self._config.bm25_b
+        )
+
+        return [node_ids[i] for i in np.argsort(-scores, kind='stable')]
+
+    @staticmethod
+    def bm25_scores(node_ids: List[str], document_frequencies: np.ndarray, term_frequencies: np.ndarray,
+                    segment_lengths: np.ndarray, segment_count: int, average_segment_length: float,
+                    k1: float = 1.2, b: float = 0.75) -> Tuple[List[str], np.ndarray]:
+        """
+        Score segments with BM25 over the postings of the query keywords.
+        Each array holds one entry per posting; the returned scores hold one entry per unique node id.
+        Term frequencies and segment lengths count the tokens keywords are extracted from.
+        """
+        unique_node_ids, node_positions = np.unique(np.array(node_ids, dtype=object), return_inverse=True)
+
+        # fall back to the fetched postings when the dataset statistics are missing
+        if segment_count <= 0:
+            segment_count = len(unique_node_ids)
+        if average_segment_length <= 0:
+            average_segment_length = float(segment_lengths.mean()) if segment_lengths.mean() > 0 else 1.0
+        segment_count = max(segment_count, int(document_frequencies.max()))
+
+        idf = np.log1p((segment_count - document_frequencies + 0.5) / (document_frequencies + 0.5))
+        length_norm = 1 - b + b * segment_lengths / average_segment_length
+        posting_scores = idf * term_frequencies * (k1 + 1) / (term_frequencies + k1 * length_norm)
+
+        scores = np.bincount(node_positions, weights=posting_scores, minlength=len(unique_node_ids))
+
+        return unique_node_ids.tolist(), scores
+
+    def _add_postings(self, node_keywords: Dict[str, List[str]], node_contents: Dict[str, str]):
+        node_keywords = {node_id: set(keywords) for node_id, keywords in node_keywords.items() if keywords}
+        if not node_keywords:
+            return
+
+        indexed_node_ids = self._get_indexed_node_ids(list(node_keywords.keys()))
+
+        rows = []
+        segment_lengths = {}
+        for node_id, keywords in node_keywords.items():
+            term_counts, segment_lengths[node_id] = self._count_terms(node_contents.get(node_id) or '')
+            for keyword in keywords:
+                rows.append({
+                    'dataset_id': self.dataset.id,
+                    'keyword': keyword,
+                    'index_node_id': node_id,
+                    'term_frequency': max(term_counts[keyword], 1),
+                    'segment_length': segment_lengths[node_id]
+                })
+
+        keyword_deltas = defaultdict(int)
+        for i in range(0, len(rows), self.insert_batch_size):
+            stmt = insert(DatasetKeywordPosting).values(rows[i:i + self.insert_batch_size]) \
+                .on_conflict_do_nothing(index_elements=['dataset_id', 'keyword', 'index_node_id']) \
+                .returning(DatasetKeywordPosting.keyword)
+            for posting in db.session.execute(stmt):
+                keyword_deltas[posting.keyword] += 1
+
+        new_node_ids = [node_id for node_id in node_keywords.keys() if node_id not in indexed_node_ids]
+        self._update_statistics(
+            keyword_deltas=keyword_deltas,
+            segment_count_delta=len(new_node_ids),
+            segment_length_delta=sum(segment_lengths[node_id] for node_id in new_node_ids)
+        )
+
+    @staticmethod
+    def _count_terms(content: str) -> Tuple[Counter, int]:
+        """Count the keyword occurrences and the length of a segment in the tokens keywords are extracted from."""
+        tokens = JiebaKeywordTableHandler().tokenize(content)
+        # postings are only written for keywords of the segment, so a segment spans one token at least,
+        # which also tells it apart from the postings written before lengths were counted
+        return Counter(tokens), max(len(tokens), 1)
+
+    def _delete_postings(self, ids: List[str]):
+        keyword_deltas = defaultdict(int)
+        segment_lengths = {}
+        for i in range(0, len(ids), self.lookup_batch_size):
+            stmt = delete(DatasetKeywordPosting).where(
+                DatasetKeywordPosting.dataset_id == self.dataset.id,
+                DatasetKeywordPosting.index_node_id.in_(ids[i:i + self.lookup_batch_size])
+            ).returning(
+                DatasetKeywordPosting.keyword,
+                DatasetKeywordPosting.index_node_id,
+                DatasetKeywordPosting.segment_length
+            )
 
-        # go through text chunks in order of most matching keywords
-        chunk_indices_count: Dict[str, int] = defaultdict(int)
-        keywords = [keyword for keyword in keywords if keyword in set(keyword_table.keys())]
-        for keyword in keywords:
-            for node_id in keyword_table[keyword]:
-                chunk_indices_count[node_id] += 1
-
-        sorted_chunk_indices = sorted(
-            list(chunk_indices_count.keys()),
-            key=lambda x: chunk_indices_count[x],
-            reverse=True,
+            for posting in db.session.execute(stmt):
+                keyword_deltas[posting.keyword] -= 1
+                # segments of postings not counted yet are not in the segment statistics
+                if posting.segment_length > 0:
+                    segment_lengths[posting.index_node_id] = posting.segment_length
+
+        self._update_statistics(
+            keyword_deltas=keyword_deltas,
+            segment_count_delta=-len(segment_lengths),
+            segment_length_delta=-sum(segment_lengths.values())
         )
 
-        return sorted_chunk_indices[: k]
+    def _update_statistics(self, keyword_deltas: Dict[str, int], segment_count_delta: int, segment_length_delta: int):
+        """Apply incremental changes to the stored document frequencies and segment statistics."""
+        # keep a stable row order so concurrent writers lock rows in the same order
+        rows = [
+            {'dataset_id': self.dataset.id, 'keyword': keyword, 'document_frequency': delta}
+            for keyword, delta in sorted(keyword_deltas.items()) if delta != 0
+        ]
+        for i in range(0, len(rows), self.insert_batch_size):
+            stmt = insert(DatasetKeywordFrequency).values(rows[i:i + self.insert_batch_size])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['dataset_id', 'keyword'],
+                set_={'document_frequency': DatasetKeywordFrequency.document_frequency
+                      + stmt.excluded.document_frequency}
+            )
+            db.session.execute(stmt)
+
+        if any(row['document_frequency'] < 0 for row in rows):
+            db.session.query(DatasetKeywordFrequency).filter(
+                DatasetKeywordFrequency.dataset_id == self.dataset.id,
+                DatasetKeywordFrequency.document_frequency <= 0
+            ).delete(synchronize_session=False)
+
+        if segment_count_delta != 0 or segment_length_delta != 0:
+            stmt = insert(DatasetKeywordIndexStat).values(
+                dataset_id=self.dataset.id,
+                segment_count=segment_count_delta,
+                total_segment_length=segment_length_delta
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['dataset_id'],
+                set_={
+                    'segment_count': DatasetKeywordIndexStat.segment_count + stmt.excluded.segment_count,
+                    'total_segment_length': DatasetKeywordIndexStat.total_segment_length
+                    + stmt.excluded.total_segment_length
+                }
+            )
+            db.session.execute(stmt)
+
+    def _get_indexed_node_ids(self, node_ids: List[str]) -> set[str]:
+        indexed_node_ids = set()
+        for i in range(0, len(node_ids), self.lookup_batch_size):
+            postings = db.session.query(DatasetKeywordPosting.index_node_id).filter(
+                DatasetKeywordPosting.dataset_id == self.dataset.id,
+                DatasetKeywordPosting.index_node_id.in_(node_ids[i:i + self.lookup_batch_size])
+            ).distinct().all()
+            indexed_node_ids.update(posting.index_node_id for posting in postings)
+
+        return indexed_node_ids
+
+    def _get_segment_contents(self, node_ids: List[str]) -> Dict[str, str]:
+        node_contents = {}
+        for i in range(0, len(node_ids), self.lookup_batch_size):
+            segments = db.session.query(DocumentSegment.index_node_id, DocumentSegment.content).filter(
+                DocumentSegment.dataset_id == self.dataset.id,
+                DocumentSegment.index_node_id.in_(node_ids[i:i + self.lookup_batch_size])
+            ).all()
+            node_contents.update({segment.index_node_id: segment.content for segment in segments})
+
+        return node_contents
+
+    def _update_segments_keywords(self, node_keywords: Dict[str, List[str]]):
+        if not node_keywords:
+            return
+
+        node_ids = list(node_keywords.keys())
+        for i in range(0, len(node_ids), self.lookup_batch_size):
+            document_segments = db.session.query(DocumentSegment).filter(
+                DocumentSegment.dataset_id == self.dataset.id,
+                DocumentSegment.index_node_id.in_(node_ids[i:i + self.lookup_batch_size])
+            ).all()
+
+            for document_segment in document_segments:
+                document_segment.keywords = node_keywords[document_segment.index_node_id]
 
-    def _update_segment_keywords(self, dataset_id: str, node_id: str, keywords: List[str]):
-        document_segment = db.session.query(DocumentSegment).filter(
-            DocumentSegment.dataset_id == dataset_id,
-            DocumentSegment.index_node_id == node_id
+    def _get_legacy_keyword_table(self) -> Optional[Dict[str, set]]:
+        dataset_keyword_table = db.session.query(DatasetKeywordTable).filter(
+            DatasetKeywordTable.dataset_id == self.dataset.id
         ).first()
-        if document_segment:
-            document_segment.keywords = keywords
-            db.session.commit()
+        if not dataset_keyword_table:
+            return None
+
+        keyword_table_dict = dataset_keyword_table.keyword_table_dict
+        return keyword_table_dict['__data__']['table'] if keyword_table_dict else {}
+
+    def migrate_legacy_keyword_table(self) -> int:
+        """
+        Move the dataset's legacy JSON keyword table, if any, into posting rows, see `flask migrate-keyword-tables`.
+        Nodes whose segment no longer exists are dropped. Returns the number of migrated nodes.
+        """
+        # lock the legacy row so that concurrent runs migrate it once, a run that waited on the lock
+        # finds the row already deleted by the run that held it
+        dataset_keyword_table = db.session.query(DatasetKeywordTable).filter(
+            DatasetKeywordTable.dataset_id == self.dataset.id
+        ).with_for_update().populate_existing().first()
+        if not dataset_keyword_table:
+            return 0
+
+        keyword_table_dict = dataset_keyword_table.keyword_table_dict
+        keyword_table = keyword_table_dict['__data__']['table'] if keyword_table_dict else {}
+
+        node_keywords = defaultdict(list)
+        for keyword, node_ids in keyword_table.items():
+            for node_id in node_ids:
+                node_keywords[node_id].append(keyword)
+
+        node_contents = self._get_segment_contents(list(node_keywords.keys()))
+        node_keywords = {node_id: keywords for node_id, keywords in node_keywords.items() if node_id in node_contents}
+
+        self._add_postings(node_keywords, node_contents)
+        db.session.query(DatasetKeywordTable).filter(
+            DatasetKeywordTable.id == dataset_keyword_table.id
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+        return len(node_keywords)
+
+    def count_uncounted_postings(self) -> int:
+        """
+        Count the term frequencies and segment lengths of the postings written before they were stored,
+        see `flask migrate-keyword-tables`. Returns the number of counted nodes.
+        """
+        # lock the postings so that concurrent runs count them once, a run that waited on the lock
+        # skips the postings counted by the run that held it
+        postings = db.session.query(
+            DatasetKeywordPosting.id,
+            DatasetKeywordPosting.keyword,
+            DatasetKeywordPosting.index_node_id
+        ).filter(
+            DatasetKeywordPosting.dataset_id == self.dataset.id,
+            DatasetKeywordPosting.segment_length == 0
+        ).with_for_update().all()
+        if not postings:
+            return 0
+
+        node_contents = self._get_segment_contents(list({posting.index_node_id for posting in postings}))
+        node_terms = {}
+        mappings = []
+        for posting in postings:
+            if posting.index_node_id not in node_terms:
+                node_terms[posting.index_node_id] = self._count_terms(node_contents.get(posting.index_node_id) or '')
+
+            term_counts, segment_length = node_terms[posting.index_node_id]
+            mappings.append({
+                'id': posting.id,
+                'term_frequency': max(term_counts[posting.keyword], 1),
+                'segment_length': segment_length
+            })
+
+        for i in range(0, len(mappings), self.insert_batch_size):
+            db.session.bulk_update_mappings(DatasetKeywordPosting, mappings[i:i + self.insert_batch_size])
+
+        self._update_statistics(
+            keyword_deltas={},
+            segment_count_delta=len(node_terms),
+            segment_length_delta=sum(segment_length for _, segment_length in node_terms.values())
+        )
+        db.session.commit()
+
+        return len(node_terms)
 
     def create_segment_keywords(self, node_id: str, keywords: List[str]):
-        keyword_table = self._get_dataset_keyword_table()
-        self._update_segment_keywords(self.dataset.id, node_id, keywords)
-        keyword_table = self._add_text_to_keyword_table(keyword_table, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
+        self._update_segments_keywords({node_id: keywords})
+        self._add_postings({node_id: keywords}, self._get_segment_contents([node_id]))
+        db.session.commit()
 
     def update_segment_keywords_index(self, node_id: str, keywords: List[str]):
-        keyword_table = self._get_dataset_keyword_table()
-        keyword_table = self._add_text_to_keyword_table(keyword_table, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
+        self._add_postings({node_id: keywords}, self._get_segment_contents([node_id]))
+        db.session.commit()
+
 
 class KeywordTableRetriever(BaseRetriever, BaseModel):
     index: KeywordTableIndex
@@ -242,10 +528,3 @@ class KeywordTableRetriever(BaseRetriever, BaseModel):
 
     async def aget_relevant_documents(self, query: str) -> List[Document]:
         raise NotImplementedError("KeywordTableRetriever does not support async")
-
-
-class SetEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, set):
-            return list(obj)
-        return super().default(obj)
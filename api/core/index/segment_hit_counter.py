@@ -0,0 +1,93 @@
+import logging
+from typing import List
+
+from flask import current_app, Flask
+from sqlalchemy import text
+
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from libs.periodic_flusher import PeriodicFlusher, iter_flushing_keys
+
+
+class SegmentHitCounter:
+    """
+    Aggregates hit counts of retrieved segments in a redis hash and adds them to document_segments
+    in the background, with one bulk update every SEGMENT_HIT_COUNT_FLUSH_INTERVAL seconds.
+    """
+
+    hit_count_key = 'segment_hit_counts'
+    flush_batch_size = 1000
+
+    _flusher = PeriodicFlusher(
+        interval=lambda: current_app.config.get('SEGMENT_HIT_COUNT_FLUSH_INTERVAL', 10),
+        flush=lambda flask_app: SegmentHitCounter.flush(flask_app)
+    )
+
+    @classmethod
+    def add(cls, dataset_id: str, index_node_ids: List[str]):
+        if not index_node_ids:
+            return
+
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for index_node_id in index_node_ids:
+                pipeline.hincrby(cls.hit_count_key, f'{dataset_id}:{index_node_id}', 1)
+            pipeline.execute()
+        except Exception:
+            logging.exception('Failed to add segment hit counts')
+            return
+
+        cls._flusher.schedule()
+
+    @classmethod
+    def flush(cls, flask_app: Flask):
+        with flask_app.app_context():
+            for flushing_key in iter_flushing_keys(cls.hit_count_key):
+                cls._flush_hit_counts(flushing_key)
+
+    @classmethod
+    def _flush_hit_counts(cls, flushing_key: str):
+        hit_counts = redis_client.hgetall(flushing_key)
+        items = list(hit_counts.items())
+
+        for i in range(0, len(items), cls.flush_batch_size):
+            batch_items = items[i:i + cls.flush_batch_size]
+            batch_fields = [field for field, _ in batch_items]
+            try:
+                cls._update_hit_counts(batch_items)
+            except Exception:
+                db.session.rollback()
+                logging.exception('Failed to flush segment hit counts')
+
+                # give the counts back, they are flushed again next time
+                pipeline = redis_client.pipeline()
+                for field, hits in batch_items:
+                    pipeline.hincrby(cls.hit_count_key, field, int(hits))
+                pipeline.hdel(flushing_key, *batch_fields)
+                pipeline.execute()
+                continue
+
+            # the written counts are not flushed again if this flush stops before the end
+            redis_client.hdel(flushing_key, *batch_fields)
+
+        redis_client.delete(flushing_key)
+
+    @classmethod
+    def _update_hit_counts(cls, items: list):
+        dataset_ids = []
+        index_node_ids = []
+        hits = []
+        for field, count in items:
+            dataset_id, index_node_id = field.decode('utf-8').split(':', 1)
+            dataset_ids.append(dataset_id)
+            index_node_ids.append(index_node_id)
+            hits.append(int(count))
+
+        db.session.execute(text(
+            "UPDATE document_segments AS s SET hit_count = s.hit_count + v.hits "
+            "FROM (SELECT unnest(CAST(:dataset_ids AS uuid[])) AS dataset_id, "
+            "unnest(CAST(:index_node_ids AS varchar[])) AS index_node_id, "
+            "unnest(CAST(:hits AS integer[])) AS hits) AS v "
+            "WHERE s.dataset_id = v.dataset_id AND s.index_node_id = v.index_node_id"
+        ), {'dataset_ids': dataset_ids, 'index_node_ids': index_node_ids, 'hits': hits})
+        db.session.commit()
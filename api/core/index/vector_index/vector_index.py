@@ -14,6 +14,10 @@ class VectorIndex:
         self._embeddings = embeddings
         self._vector_index = self._init_vector_index(dataset, config, embeddings)
 
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embeddings
+
     def _init_vector_index(self, dataset: Dataset, config: dict, embeddings: Embeddings) -> BaseVectorIndex:
         vector_type = config.get('VECTOR_STORE')
 
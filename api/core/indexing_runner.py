@@ -1,12 +1,15 @@
 import datetime
 import json
 import logging
+import random
 import re
 import threading
 import time
 import uuid
-from typing import Optional, List, cast
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Dict, cast
 
+import numpy as np
 from flask import current_app, Flask
 from flask_login import current_user
 from langchain.schema import Document
@@ -15,10 +18,12 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter, TextSplitter
 from core.data_loader.file_extractor import FileExtractor
 from core.data_loader.loader.notion import NotionLoader
 from core.docstore.dataset_docstore import DatesetDocumentStore
+from core.embedding.cached_embedding import CacheEmbedding
 from core.generator.llm_generator import LLMGenerator
 from core.index.index import IndexBuilder
-from core.model_providers.error import ProviderTokenNotInitError
+from core.model_providers.error import ProviderTokenNotInitError, LLMRateLimitError
 from core.model_providers.model_factory import ModelFactory
+from core.model_providers.models.embedding.base import BaseEmbedding
 from core.model_providers.models.entity.message import MessageType
 from core.spiltter.fixed_text_splitter import FixedRecursiveCharacterTextSplitter
 from extensions.ext_database import db
@@ -673,19 +678,25 @@ class IndexingRunner:
                 model_name=dataset.embedding_model
             )
 
-        # chunk nodes by chunk size
         indexing_start_at = time.perf_counter()
         tokens = 0
+        if embedding_model:
+            document_tokens = [embedding_model.get_num_tokens(document.page_content) for document in documents]
+            tokens = sum(document_tokens)
+
+            # embed documents with concurrent provider calls ahead of time,
+            # and hand the embeddings to the vector index below instead of reading them back from db
+            if vector_index:
+                vector_index.embeddings.add_precomputed_embeddings(
+                    self._embed_documents(embedding_model, dataset_document.id, documents, document_tokens)
+                )
+
+        # chunk nodes by chunk size
         chunk_size = 100
         for i in range(0, len(documents), chunk_size):
             # check document is paused
             self._check_document_paused_status(dataset_document.id)
             chunk_documents = documents[i:i + chunk_size]
-            if dataset.indexing_technique == 'high_quality' or embedding_model:
-                tokens += sum(
-                    embedding_model.get_num_tokens(document.page_content)
-                    for document in chunk_documents
-                )
 
             # save vector index
             if vector_index:
@@ -720,6 +731,86 @@ class IndexingRunner:
             }
         )
 
+    def _embed_documents(self, embedding_model: BaseEmbedding, document_id: str,
+                         documents: List[Document], document_tokens: List[int]) -> Dict[str, np.ndarray]:
+        """
+        Embed the documents and store them in the embedding cache,
+        sending multiple token-sized batches to the provider concurrently.
+        Returns the embeddings by text hash.
+        """
+        batches = self._split_batches_by_tokens(
+            [document.page_content for document in documents],
+            document_tokens,
+            max_tokens=current_app.config['INDEXING_EMBEDDING_BATCH_MAX_TOKENS']
+        )
+
+        flask_app = current_app._get_current_object()
+        max_workers = max(1, min(current_app.config['INDEXING_EMBEDDING_CONCURRENCY'], len(batches)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self._embed_batch, flask_app, embedding_model, batch)
+                for batch in batches
+            ]
+
+            embeddings = {}
+            try:
+                for future in as_completed(futures):
+                    embeddings.update(future.result())
+                    # check document is paused
+                    self._check_document_paused_status(document_id)
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        return embeddings
+
+    def _embed_batch(self, flask_app: Flask, embedding_model: BaseEmbedding,
+                     texts: List[str]) -> Dict[str, np.ndarray]:
+        with flask_app.app_context():
+            embeddings = CacheEmbedding(embedding_model)
+            max_retries = flask_app.config['INDEXING_EMBEDDING_MAX_RETRIES']
+            for attempt in range(max_retries + 1):
+                try:
+                    text_embeddings = embeddings.embed_documents(texts)
+                    # float32 arrays keep the embeddings of a large document compact until they are indexed
+                    return {
+                        helper.generate_text_hash(text): np.asarray(text_embedding, dtype=np.float32)
+                        for text, text_embedding in zip(texts, text_embeddings)
+                    }
+                except LLMRateLimitError:
+                    if attempt >= max_retries:
+                        raise
+
+                    # exponential backoff with jitter on provider rate limit
+                    wait_time = min(2 ** attempt, 60) + random.uniform(0, 1)
+                    logging.warning('Embedding rate limited, retry in {:.1f}s'.format(wait_time))
+                    time.sleep(wait_time)
+
+    @staticmethod
+    def _split_batches_by_tokens(texts: List[str], text_tokens: List[int], max_tokens: int,
+                                 max_size: int = 2048) -> List[List[str]]:
+        """
+        Split texts into batches whose total tokens do not exceed max_tokens.
+        A single text longer than max_tokens is sent as its own batch.
+        """
+        batches = []
+        batch = []
+        batch_tokens = 0
+        for text, tokens in zip(texts, text_tokens):
+            if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_size):
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+
+            batch.append(text)
+            batch_tokens += tokens
+
+        if batch:
+            batches.append(batch)
+
+        return batches
+
     def _check_document_paused_status(self, document_id: str):
         indexing_cache_key = 'document_{}_is_paused'.format(document_id)
         result = redis_client.get(indexing_cache_key)
@@ -1,13 +1,26 @@
-from typing import Any, List, Dict
+import bisect
+import itertools
+import logging
+import threading
+from typing import Any, List, Dict, Tuple
 
+from cachetools import LRUCache
 from langchain.memory.chat_memory import BaseChatMemory
 from langchain.schema import get_buffer_string, BaseMessage
+from sqlalchemy import update
 
 from core.model_providers.models.entity.message import PromptMessage, MessageType, to_lc_messages
 from core.model_providers.models.llm.base import BaseLLM
 from extensions.ext_database import db
 from models.model import Conversation, Message
 
+# token counts of (query, answer) per message, keyed by (tokenizer, message id)
+_message_tokens_cache = LRUCache(maxsize=10000)
+_message_tokens_cache_lock = threading.Lock()
+
+# tokens counted once per prompt rather than per message (e.g. the reply priming of chat models), keyed by tokenizer
+_prompt_overhead_tokens_cache = LRUCache(maxsize=1000)
+
 
 class ReadOnlyConversationTokenDBBufferSharedMemory(BaseChatMemory):
     conversation: Conversation
@@ -17,6 +30,8 @@ class ReadOnlyConversationTokenDBBufferSharedMemory(BaseChatMemory):
     memory_key: str = "chat_history"
     max_token_limit: int = 2000
     message_limit: int = 10
+    use_persisted_tokens: bool = True
+    """Read and backfill the token counts persisted on messages instead of only the in-process cache."""
 
     @property
     def buffer(self) -> List[BaseMessage]:
@@ -30,23 +45,106 @@ class ReadOnlyConversationTokenDBBufferSharedMemory(BaseChatMemory):
         messages = list(reversed(messages))
 
         chat_messages: List[PromptMessage] = []
+        chat_message_tokens: List[int] = []
+        backfill_messages: List[Tuple[str, int, int]] = []
         for message in messages:
+            query_tokens, answer_tokens, should_backfill = self._get_message_tokens(message)
+            if should_backfill:
+                backfill_messages.append((message.id, query_tokens, answer_tokens))
+
             chat_messages.append(PromptMessage(content=message.query, type=MessageType.HUMAN))
+            chat_message_tokens.append(query_tokens)
             chat_messages.append(PromptMessage(content=message.answer, type=MessageType.ASSISTANT))
+            chat_message_tokens.append(answer_tokens)
+
+        if backfill_messages:
+            self._backfill_message_tokens(backfill_messages)
 
         if not chat_messages:
             return []
 
-        # prune the chat message if it exceeds the max token limit
-        curr_buffer_length = self.model_instance.get_num_tokens(chat_messages)
+        # each count tokenizes its message alone, so it includes the per prompt overhead once,
+        # take it off every message and count it once for the whole buffer, like get_num_tokens(chat_messages)
+        prompt_overhead_tokens = self._get_prompt_overhead_tokens()
+        chat_message_tokens = [max(tokens - prompt_overhead_tokens, 0) for tokens in chat_message_tokens]
+
+        # prune the oldest chat messages if they exceed the max token limit,
+        # the cut point is the first prefix whose removal leaves at most max_token_limit tokens
+        prefix_tokens = list(itertools.accumulate(chat_message_tokens, initial=0))
+        curr_buffer_length = prefix_tokens[-1] + prompt_overhead_tokens
         if curr_buffer_length > self.max_token_limit:
-            pruned_memory = []
-            while curr_buffer_length > self.max_token_limit and chat_messages:
-                pruned_memory.append(chat_messages.pop(0))
-                curr_buffer_length = self.model_instance.get_num_tokens(chat_messages)
+            cut_index = bisect.bisect_left(prefix_tokens, curr_buffer_length - self.max_token_limit)
+            chat_messages = chat_messages[cut_index:]
 
         return to_lc_messages(chat_messages)
 
+    def _get_message_tokens(self, message: Message) -> Tuple[int, int, bool]:
+        """
+        Get token counts of the message query and answer, each tokenized alone, once per tokenizer and message.
+        The last element tells whether the counts should be persisted on the message.
+        """
+        tokenizer_key = self.model_instance.tokenizer_key
+        cache_key = (tokenizer_key, message.id)
+        with _message_tokens_cache_lock:
+            message_tokens = _message_tokens_cache.get(cache_key)
+
+        if message_tokens is not None:
+            return message_tokens[0], message_tokens[1], False
+
+        should_backfill = False
+        if self.use_persisted_tokens and message.memory_tokenizer == tokenizer_key \
+                and message.memory_query_tokens is not None and message.memory_answer_tokens is not None:
+            message_tokens = (message.memory_query_tokens, message.memory_answer_tokens)
+        else:
+            query_tokens = self.model_instance.get_num_tokens(
+                [PromptMessage(content=message.query, type=MessageType.HUMAN)])
+            answer_tokens = self.model_instance.get_num_tokens(
+                [PromptMessage(content=message.answer, type=MessageType.ASSISTANT)])
+
+            message_tokens = (query_tokens, answer_tokens)
+            should_backfill = self.use_persisted_tokens
+
+        with _message_tokens_cache_lock:
+            _message_tokens_cache[cache_key] = message_tokens
+
+        return message_tokens[0], message_tokens[1], should_backfill
+
+    def _backfill_message_tokens(self, backfill_messages: List[Tuple[str, int, int]]):
+        """
+        Persist lazily computed token counts on their messages.
+        Use a separate connection so the request session is neither committed nor expired.
+        """
+        try:
+            with db.engine.begin() as connection:
+                for message_id, query_tokens, answer_tokens in backfill_messages:
+                    connection.execute(
+                        update(Message).where(Message.id == message_id).values(
+                            memory_tokenizer=self.model_instance.tokenizer_key,
+                            memory_query_tokens=query_tokens,
+                            memory_answer_tokens=answer_tokens
+                        )
+                    )
+        except Exception:
+            logging.exception("Failed to backfill message memory tokens.")
+
+    def _get_prompt_overhead_tokens(self) -> int:
+        """
+        Tokens that get_num_tokens counts once per prompt whatever the number of messages,
+        measured as the difference between tokenizing two empty messages apart and together.
+        """
+        tokenizer_key = self.model_instance.tokenizer_key
+        with _message_tokens_cache_lock:
+            overhead_tokens = _prompt_overhead_tokens_cache.get(tokenizer_key)
+
+        if overhead_tokens is None:
+            empty_message = PromptMessage(content='', type=MessageType.HUMAN)
+            overhead_tokens = max(2 * self.model_instance.get_num_tokens([empty_message])
+                                  - self.model_instance.get_num_tokens([empty_message, empty_message]), 0)
+            with _message_tokens_cache_lock:
+                _prompt_overhead_tokens_cache[tokenizer_key] = overhead_tokens
+
+        return overhead_tokens
+
     @property
     def memory_variables(self) -> List[str]:
         """Will always return list of memory variables.
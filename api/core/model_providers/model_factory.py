@@ -211,6 +211,11 @@ class ModelFactory:
         :param model_type:
         :return:
         """
+        tenant_cache = ModelProviderFactory.get_tenant_cache(tenant_id)
+        cache_key = ('default_model', model_type.value)
+        if tenant_cache is not None and tenant_cache.get(cache_key):
+            return tenant_cache[cache_key]
+
         # get default model
         default_model = db.session.query(TenantDefaultModel) \
             .filter(
@@ -238,6 +243,9 @@ class ModelFactory:
                     db.session.commit()
                     break
 
+        if tenant_cache is not None and default_model:
+            tenant_cache[cache_key] = default_model
+
         return default_model
 
     @classmethod
@@ -292,4 +300,6 @@ class ModelFactory:
             db.session.add(default_model)
             db.session.commit()
 
+        ModelProviderFactory.clear_tenant_cache(tenant_id)
+
         return default_model
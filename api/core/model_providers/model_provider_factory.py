@@ -1,5 +1,6 @@
-from typing import Type
+from typing import Type, Optional
 
+from flask import g, has_app_context
 from sqlalchemy.exc import IntegrityError
 
 from core.model_providers.models.entity.model_params import ModelType
@@ -101,14 +102,54 @@ class ModelProviderFactory:
         :param model_provider_name:
         :return:
         """
+        tenant_cache = cls.get_tenant_cache(tenant_id)
+        cache_key = ('preferred_model_provider', model_provider_name)
+        if tenant_cache is not None and cache_key in tenant_cache:
+            return tenant_cache[cache_key]
+
         # get preferred provider
         preferred_provider = cls._get_preferred_provider(tenant_id, model_provider_name)
         if not preferred_provider or not preferred_provider.is_valid:
+            model_provider = None
+        else:
+            # init model provider
+            model_provider_class = ModelProviderFactory.get_model_provider_class(model_provider_name)
+            model_provider = model_provider_class(provider=preferred_provider)
+
+        if tenant_cache is not None:
+            tenant_cache[cache_key] = model_provider
+
+        return model_provider
+
+    @classmethod
+    def get_tenant_cache(cls, tenant_id: str) -> Optional[dict]:
+        """
+        get the cache of resolved model providers of tenant.
+
+        The cache lives as long as the current app context (a request or a generate worker),
+        so the provider rows it holds always belong to the current session.
+
+        :param tenant_id:
+        :return:
+        """
+        if not has_app_context():
             return None
 
-        # init model provider
-        model_provider_class = ModelProviderFactory.get_model_provider_class(model_provider_name)
-        return model_provider_class(provider=preferred_provider)
+        if 'model_provider_caches' not in g:
+            g.model_provider_caches = {}
+
+        return g.model_provider_caches.setdefault(str(tenant_id), {})
+
+    @classmethod
+    def clear_tenant_cache(cls, tenant_id: str):
+        """
+        clear the resolved model providers of tenant, must be called after provider settings of tenant are changed.
+
+        :param tenant_id:
+        :return:
+        """
+        if has_app_context() and 'model_provider_caches' in g:
+            g.model_provider_caches.pop(str(tenant_id), None)
 
     @classmethod
     def get_preferred_type_by_preferred_model_provider(cls,
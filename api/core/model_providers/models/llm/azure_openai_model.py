@@ -92,7 +92,7 @@ class AzureOpenAIModel(BaseLLM):
         """
         return self.credentials.get("base_model_name")
 
-    def get_num_tokens(self, messages: List[PromptMessage]) -> int:
+    def _get_num_tokens(self, messages: List[PromptMessage]) -> int:
         """
         get num tokens of prompt messages.
 
@@ -1,10 +1,13 @@
 import json
 import os
 import re
+import threading
 from abc import abstractmethod
+from hashlib import sha256
 from typing import List, Optional, Any, Union, Tuple
 import decimal
 
+from cachetools import LRUCache
 from langchain.callbacks.manager import Callbacks
 from langchain.memory.chat_memory import BaseChatMemory
 from langchain.schema import LLMResult, SystemMessage, AIMessage, HumanMessage, BaseMessage, ChatGeneration
@@ -21,6 +24,10 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# token counts of prompt messages, keyed by (tokenizer key, content hash)
+_num_tokens_cache = LRUCache(maxsize=10000)
+_num_tokens_cache_lock = threading.Lock()
+
 
 class BaseLLM(BaseProviderModel):
     model_mode: ModelMode = ModelMode.COMPLETION
@@ -196,16 +203,45 @@ class BaseLLM(BaseProviderModel):
         """
         raise NotImplementedError
 
-    @abstractmethod
     def get_num_tokens(self, messages: List[PromptMessage]) -> int:
         """
         get num tokens of prompt messages.
+        results are memoized per tokenizer and content hash, shared by all model instances in the process.
+
+        :param messages:
+        :return:
+        """
+        hash_text = '\x00'.join(f"{message.type.value}:{message.content}" for message in messages)
+        cache_key = (self.tokenizer_key, sha256(hash_text.encode()).hexdigest())
+        with _num_tokens_cache_lock:
+            num_tokens = _num_tokens_cache.get(cache_key)
+
+        if num_tokens is None:
+            num_tokens = self._get_num_tokens(messages)
+            with _num_tokens_cache_lock:
+                _num_tokens_cache[cache_key] = num_tokens
+
+        return num_tokens
+
+    @abstractmethod
+    def _get_num_tokens(self, messages: List[PromptMessage]) -> int:
+        """
+        get num tokens of prompt messages without cache.
 
         :param messages:
         :return:
         """
         raise NotImplementedError
 
+    @property
+    def tokenizer_key(self) -> str:
+        """
+        identity of the tokenizer used by get_num_tokens.
+
+        :return:
+        """
+        return f"{self.__class__.__name__}:{self.model_provider.provider_name}:{self.name}"
+
     def calc_tokens_price(self, tokens: int, message_type: MessageType) -> decimal.Decimal:
         """
         calc tokens total price.
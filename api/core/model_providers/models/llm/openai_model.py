@@ -105,7 +105,7 @@ class OpenAIModel(BaseLLM):
         prompts = self._get_prompt_from_messages(messages)
         return self._client.generate([prompts], stop, callbacks)
 
-    def get_num_tokens(self, messages: List[PromptMessage]) -> int:
+    def _get_num_tokens(self, messages: List[PromptMessage]) -> int:
         """
         get num tokens of prompt messages.
 
@@ -68,7 +68,7 @@ class ReplicateModel(BaseLLM):
 
         return self._client.generate([prompts], stop, callbacks, **extra_kwargs)
 
-    def get_num_tokens(self, messages: List[PromptMessage]) -> int:
+    def _get_num_tokens(self, messages: List[PromptMessage]) -> int:
         """
         get num tokens of prompt messages.
 
@@ -1,5 +1,4 @@
 from abc import ABC, abstractmethod
-from datetime import datetime
 from typing import Type, Optional
 
 from flask import current_app
@@ -9,6 +8,7 @@ from core.model_providers.error import QuotaExceededError, LLMBadRequestError
 from extensions.ext_database import db
 from core.model_providers.models.entity.model_params import ModelType, ModelKwargsRules
 from core.model_providers.models.entity.provider import ProviderQuotaUnit
+from core.model_providers.quota_accounting import ProviderQuotaAccounting
 from core.model_providers.rules import provider_rules
 from models.provider import Provider, ProviderType, ProviderModel
 
@@ -185,15 +185,7 @@ class BaseModelProvider(BaseModel, ABC):
         if 'system' not in rules['support_provider_types']:
             return
 
-        provider = db.session.query(Provider).filter(
-            db.and_(
-                Provider.id == self.provider.id,
-                Provider.is_valid == True,
-                Provider.quota_limit > Provider.quota_used
-            )
-        ).first()
-
-        if not provider:
+        if not self.provider.is_valid or ProviderQuotaAccounting.is_over_limit(self.provider):
             raise QuotaExceededError()
 
     def deduct_quota(self, used_tokens: int = 0) -> None:
@@ -224,14 +216,7 @@ class BaseModelProvider(BaseModel, ABC):
         else:
             used_quota = 1
 
-        db.session.query(Provider).filter(
-            Provider.tenant_id == self.provider.tenant_id,
-            Provider.provider_name == self.provider.provider_name,
-            Provider.provider_type == self.provider.provider_type,
-            Provider.quota_type == self.provider.quota_type,
-            Provider.quota_limit > Provider.quota_used
-        ).update({'quota_used': Provider.quota_used + used_quota})
-        db.session.commit()
+        ProviderQuotaAccounting.consume(self.provider, used_quota)
 
     def should_deduct_quota(self):
         return False
@@ -242,11 +227,7 @@ class BaseModelProvider(BaseModel, ABC):
 
         :return:
         """
-        db.session.query(Provider).filter(
-            Provider.tenant_id == self.provider.tenant_id,
-            Provider.provider_name == self.provider.provider_name
-        ).update({'last_used': datetime.utcnow()})
-        db.session.commit()
+        ProviderQuotaAccounting.record_last_used(self.provider.tenant_id, self.provider.provider_name)
 
     def get_payment_info(self) -> Optional[dict]:
         """
@@ -0,0 +1,256 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+
+from cachetools import TTLCache
+from flask import current_app, Flask
+from redis.commands.core import Script
+from sqlalchemy import bindparam
+
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from libs.periodic_flusher import PeriodicFlusher
+from models.provider import Provider
+
+# initialize the quota of a provider if it is not in redis yet.
+# KEYS[1]: quota key, ARGV: quota_limit, quota_used, idle ttl
+_INIT_SCRIPT = redis_client.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('HSET', KEYS[1], 'limit', ARGV[1], 'used', ARGV[2], 'pending', 0)
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return redis.call('HMGET', KEYS[1], 'limit', 'used')
+""")
+
+# consume quota while the provider is not over limit, the consumed amount stays pending until flushed.
+# KEYS[1]: quota key, KEYS[2]: dirty set key, ARGV: amount, provider id
+# returns -1 if the quota is not in redis, 0 if over limit, 1 if consumed
+_CONSUME_SCRIPT = redis_client.register_script("""
+local quota = redis.call('HMGET', KEYS[1], 'limit', 'used')
+if not quota[1] then
+    return -1
+end
+if tonumber(quota[2]) >= tonumber(quota[1]) then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'used', ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'pending', ARGV[1])
+redis.call('PERSIST', KEYS[1])
+redis.call('SADD', KEYS[2], ARGV[2])
+return 1
+""")
+
+# take the pending amount for flushing, an idle quota expires so that it is reloaded from db later.
+# KEYS[1]: quota key, ARGV: idle ttl
+_TAKE_PENDING_SCRIPT = redis_client.register_script("""
+local pending = tonumber(redis.call('HGET', KEYS[1], 'pending') or '0')
+if pending > 0 then
+    redis.call('HINCRBY', KEYS[1], 'pending', -pending)
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return pending
+""")
+
+# give back a pending amount whose flush failed.
+# KEYS[1]: quota key, KEYS[2]: dirty set key, ARGV: amount, provider id
+_RESTORE_PENDING_SCRIPT = redis_client.register_script("""
+redis.call('HINCRBY', KEYS[1], 'pending', ARGV[1])
+redis.call('PERSIST', KEYS[1])
+redis.call('SADD', KEYS[2], ARGV[2])
+return 1
+""")
+
+# update the limit of a quota in redis, if any.
+# KEYS[1]: quota key, ARGV: quota_limit
+_SET_LIMIT_SCRIPT = redis_client.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HSET', KEYS[1], 'limit', ARGV[1])
+end
+return 1
+""")
+
+# remove a quota from redis and return its pending amount.
+# KEYS[1]: quota key
+_EVICT_SCRIPT = redis_client.register_script("""
+local pending = tonumber(redis.call('HGET', KEYS[1], 'pending') or '0')
+redis.call('DEL', KEYS[1])
+return pending
+""")
+
+
+class ProviderQuotaAccounting:
+    """
+    Accounts the quota of system providers in redis and writes it to the providers table in the background.
+
+    Redis holds the limit, the used and the not yet flushed (pending) quota of each provider row,
+    so checking and consuming quota is one atomic script call instead of a row update and commit per LLM call.
+    Pending quota is flushed by any process every PROVIDER_QUOTA_FLUSH_INTERVAL seconds.
+    `last_used` is written at most once per provider per PROVIDER_LAST_USED_UPDATE_INTERVAL seconds.
+    """
+
+    quota_key_prefix = 'provider_quota:'
+    dirty_set_key = 'provider_quota_dirty'
+    idle_ttl = 600
+
+    _lock = threading.Lock()
+    _flusher = PeriodicFlusher(
+        interval=lambda: current_app.config.get('PROVIDER_QUOTA_FLUSH_INTERVAL', 5),
+        flush=lambda flask_app: ProviderQuotaAccounting.flush(flask_app)
+    )
+    _recently_used_providers: Optional[TTLCache] = None
+    _pending_last_used: dict[tuple[str, str], datetime] = {}
+
+    @classmethod
+    def is_over_limit(cls, provider: Provider) -> bool:
+        try:
+            quota_limit, quota_used = cls._get_quota(provider)
+        except Exception:
+            logging.exception('Failed to get provider quota from redis, fallback to db')
+            return db.session.query(Provider).filter(
+                Provider.id == provider.id,
+                Provider.quota_limit > Provider.quota_used
+            ).first() is None
+
+        return quota_used >= quota_limit
+
+    @classmethod
+    def consume(cls, provider: Provider, amount: int):
+        if amount <= 0:
+            return
+
+        try:
+            result = cls._run_script(_CONSUME_SCRIPT, [cls._quota_key(provider.id), cls.dirty_set_key],
+                                     [amount, provider.id])
+            if result == -1:
+                cls._get_quota(provider)
+                cls._run_script(_CONSUME_SCRIPT, [cls._quota_key(provider.id), cls.dirty_set_key],
+                                [amount, provider.id])
+        except Exception:
+            logging.exception('Failed to consume provider quota in redis, fallback to db')
+            db.session.query(Provider).filter(
+                Provider.id == provider.id,
+                Provider.quota_limit > Provider.quota_used
+            ).update({'quota_used': Provider.quota_used + amount})
+            db.session.commit()
+            return
+
+        cls._flusher.schedule()
+
+    @classmethod
+    def sync_quota_limit(cls, provider: Provider):
+        """Apply a changed quota_limit of the provider row to redis, must be called after the change is committed."""
+        cls._run_script(_SET_LIMIT_SCRIPT, [cls._quota_key(provider.id)], [provider.quota_limit])
+
+    @classmethod
+    def evict(cls, provider: Provider) -> int:
+        """
+        Remove the quota of the provider row from redis, so that it is reloaded from db next time.
+        Returns the consumed quota not flushed to db yet, which the caller must add to quota_used.
+        """
+        return cls._run_script(_EVICT_SCRIPT, [cls._quota_key(provider.id)], [])
+
+    @classmethod
+    def record_last_used(cls, tenant_id: str, provider_name: str):
+        interval = current_app.config.get('PROVIDER_LAST_USED_UPDATE_INTERVAL', 60)
+        key = (tenant_id, provider_name)
+        with cls._lock:
+            if cls._recently_used_providers is None or cls._recently_used_providers.ttl != interval:
+                cls._recently_used_providers = TTLCache(maxsize=10000, ttl=interval) if interval > 0 else None
+
+            if cls._recently_used_providers is not None:
+                if key in cls._recently_used_providers:
+                    return
+
+                cls._recently_used_providers[key] = True
+
+            cls._pending_last_used[key] = datetime.utcnow()
+
+        cls._flusher.schedule()
+
+    @classmethod
+    def flush(cls, flask_app: Flask):
+        with cls._lock:
+            pending_last_used = cls._pending_last_used
+            cls._pending_last_used = {}
+
+        with flask_app.app_context():
+            cls._flush_quota()
+            cls._flush_last_used(pending_last_used)
+
+    @classmethod
+    def _flush_quota(cls):
+        failed_flushes = []
+        try:
+            while True:
+                provider_ids = redis_client.spop(cls.dirty_set_key, 1000)
+                if not provider_ids:
+                    break
+
+                for provider_id in provider_ids:
+                    provider_id = provider_id.decode('utf-8')
+                    pending = cls._run_script(_TAKE_PENDING_SCRIPT, [cls._quota_key(provider_id)], [cls.idle_ttl])
+                    if not pending:
+                        continue
+
+                    try:
+                        db.session.query(Provider).filter(Provider.id == provider_id) \
+                            .update({'quota_used': Provider.quota_used + pending}, synchronize_session=False)
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
+                        logging.exception('Failed to flush provider quota, provider id: %s', provider_id)
+                        failed_flushes.append((provider_id, pending))
+        except Exception:
+            logging.exception('Failed to flush provider quotas')
+
+        # give the pending quota back, it is flushed again next time
+        for provider_id, pending in failed_flushes:
+            cls._run_script(_RESTORE_PENDING_SCRIPT, [cls._quota_key(provider_id), cls.dirty_set_key],
+                            [pending, provider_id])
+
+    @classmethod
+    def _flush_last_used(cls, pending_last_used: dict[tuple[str, str], datetime]):
+        if not pending_last_used:
+            return
+
+        try:
+            db.session.execute(
+                Provider.__table__.update()
+                .where(Provider.__table__.c.tenant_id == bindparam('provider_tenant_id'))
+                .where(Provider.__table__.c.provider_name == bindparam('provider_provider_name'))
+                .values(last_used=bindparam('provider_last_used')),
+                [{
+                    'provider_tenant_id': tenant_id,
+                    'provider_provider_name': provider_name,
+                    'provider_last_used': last_used
+                } for (tenant_id, provider_name), last_used in pending_last_used.items()]
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logging.exception('Failed to update last_used of providers')
+
+    @classmethod
+    def _get_quota(cls, provider: Provider) -> tuple[int, int]:
+        quota = redis_client.hmget(cls._quota_key(provider.id), 'limit', 'used')
+        if quota[0] is None:
+            # load the committed quota from db
+            provider = db.session.query(Provider).filter(Provider.id == provider.id).first()
+            if not provider:
+                return 0, 0
+
+            quota = cls._run_script(_INIT_SCRIPT, [cls._quota_key(provider.id)],
+                                    [provider.quota_limit or 0, provider.quota_used or 0, cls.idle_ttl])
+
+        return int(quota[0]), int(quota[1])
+
+    @classmethod
+    def _quota_key(cls, provider_id: str) -> str:
+        return f'{cls.quota_key_prefix}{provider_id}'
+
+    @staticmethod
+    def _run_script(script: Script, keys: list, args: list):
+        return script(keys=keys, args=args)
@@ -0,0 +1,133 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Optional, Union
+
+
+class _ScheduledTask:
+    def __init__(self, worker_thread: threading.Thread, on_ping: Callable[[], None],
+                 on_timeout: Callable[[], None], deadline: float, next_ping_at: float):
+        self.worker_thread = worker_thread
+        self.on_ping = on_ping
+        self.on_timeout = on_timeout
+        self.deadline = deadline
+        self.next_ping_at = next_ping_at
+
+    @property
+    def due_at(self) -> float:
+        return min(self.deadline, self.next_ping_at)
+
+
+class ScheduledCall:
+    """A one-shot callback of the scheduler, skipped if cancelled before it is due."""
+
+    def __init__(self, callback: Callable[[], None], due_at: float):
+        self.callback = callback
+        self.due_at = due_at
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class GenerateTaskScheduler:
+    """
+    Keeps the deadlines and keep-alive pings of all running generate workers of the process
+    on a single timer thread, instead of one countdown thread per request.
+    Short one-shot callbacks of the workers, such as delayed stream flushes, run on the same thread.
+    """
+
+    def __init__(self, timeout: int = 600, ping_interval: int = 10):
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+
+        self._condition = threading.Condition()
+        self._heap = []
+        self._counter = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, worker_thread: threading.Thread, on_ping: Callable[[], None], on_timeout: Callable[[], None]):
+        now = time.monotonic()
+        task = _ScheduledTask(
+            worker_thread=worker_thread,
+            on_ping=on_ping,
+            on_timeout=on_timeout,
+            deadline=now + self.timeout,
+            next_ping_at=now + self.ping_interval
+        )
+
+        with self._condition:
+            self._push(task)
+            self._ensure_started()
+            self._condition.notify()
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> ScheduledCall:
+        """Run a callback once on the scheduler thread after the delay, it must return quickly."""
+        call = ScheduledCall(callback=callback, due_at=time.monotonic() + delay)
+
+        with self._condition:
+            self._push(call)
+            self._ensure_started()
+            self._condition.notify()
+
+        return call
+
+    def pending_count(self) -> int:
+        """Number of running generate workers."""
+        with self._condition:
+            return sum(1 for _, _, task in self._heap if isinstance(task, _ScheduledTask))
+
+    def run_pending(self, now: Optional[float] = None):
+        """Run the ping or timeout callbacks of the tasks and the calls that are due."""
+        now = now if now is not None else time.monotonic()
+        due_tasks = []
+        with self._condition:
+            while self._heap and self._heap[0][0] <= now:
+                due_tasks.append(heapq.heappop(self._heap)[2])
+
+        for task in due_tasks:
+            if isinstance(task, ScheduledCall):
+                if not task.cancelled:
+                    self._run_callback(task.callback)
+                continue
+
+            if not task.worker_thread.is_alive():
+                continue
+
+            if now >= task.deadline:
+                self._run_callback(task.on_timeout)
+                continue
+
+            self._run_callback(task.on_ping)
+            task.next_ping_at += self.ping_interval
+
+            with self._condition:
+                self._push(task)
+
+    def _push(self, task: Union[_ScheduledTask, ScheduledCall]):
+        heapq.heappush(self._heap, (task.due_at, next(self._counter), task))
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='generate-task-scheduler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.run_pending()
+            with self._condition:
+                timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                if timeout is None or timeout > 0:
+                    self._condition.wait(timeout)
+
+    @staticmethod
+    def _run_callback(callback: Callable[[], None]):
+        try:
+            callback()
+        except Exception:
+            logging.exception('Failed to run generate task scheduler callback')
+
+
+generate_task_scheduler = GenerateTaskScheduler()
@@ -0,0 +1,125 @@
+import json
+import queue
+import threading
+from abc import ABC, abstractmethod
+from typing import Generator
+
+from flask import Flask
+
+from extensions.ext_redis import redis_client
+
+
+class StreamSubscription(ABC):
+    def __init__(self, channel: str):
+        self.channel = channel
+
+    @abstractmethod
+    def listen(self) -> Generator[dict, None, None]:
+        """Yield decoded stream contents until the subscription is closed."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self):
+        """Abort a pending `listen`, used when the generation times out."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def unsubscribe(self):
+        raise NotImplementedError
+
+
+class RedisStreamSubscription(StreamSubscription):
+    def __init__(self, channel: str):
+        super().__init__(channel)
+        self._pubsub = redis_client.pubsub()
+        self._pubsub.subscribe(channel)
+
+    def listen(self) -> Generator[dict, None, None]:
+        for message in self._pubsub.listen():
+            if message["type"] == "message":
+                yield json.loads(message["data"].decode('utf-8'))
+
+    def close(self):
+        try:
+            self._pubsub.close()
+        except:
+            pass
+
+    def unsubscribe(self):
+        try:
+            self._pubsub.unsubscribe(self.channel)
+        except ConnectionError:
+            pass
+
+
+class InMemoryStreamSubscription(StreamSubscription):
+    _CLOSED = object()
+
+    def __init__(self, channel: str, transport: 'StreamTransport'):
+        super().__init__(channel)
+        self._transport = transport
+        self._queue = queue.Queue()
+
+    def put(self, content: dict):
+        self._queue.put(content)
+
+    def listen(self) -> Generator[dict, None, None]:
+        while True:
+            content = self._queue.get()
+            if content is self._CLOSED:
+                break
+
+            yield content
+
+    def close(self):
+        self._queue.put(self._CLOSED)
+
+    def unsubscribe(self):
+        self._transport.remove_subscription(self)
+
+
+class StreamTransport:
+    """
+    Delivers generation events from the worker thread to the request that consumes them.
+
+    In memory mode, contents published to a channel subscribed in this process are handed over
+    through a queue without touching redis; contents for channels without a local subscriber
+    still go through redis pub/sub so that other processes can receive them.
+    """
+
+    def __init__(self, in_memory: bool = True):
+        self.in_memory = in_memory
+        self._lock = threading.Lock()
+        self._subscriptions: dict[str, InMemoryStreamSubscription] = {}
+
+    def configure(self, in_memory: bool):
+        self.in_memory = in_memory
+
+    def subscribe(self, channel: str) -> StreamSubscription:
+        if not self.in_memory:
+            return RedisStreamSubscription(channel)
+
+        subscription = InMemoryStreamSubscription(channel, self)
+        with self._lock:
+            self._subscriptions[channel] = subscription
+
+        return subscription
+
+    def publish(self, channel: str, content: dict):
+        subscription = self._subscriptions.get(channel)
+        if subscription is not None:
+            subscription.put(content)
+        else:
+            redis_client.publish(channel, json.dumps(content))
+
+    def remove_subscription(self, subscription: InMemoryStreamSubscription):
+        with self._lock:
+            if self._subscriptions.get(subscription.channel) is subscription:
+                del self._subscriptions[subscription.channel]
+
+
+stream_transport = StreamTransport()
+
+
+def init_app(app: Flask):
+    stream_transport.configure(in_memory=app.config.get('STREAM_TRANSPORT') == 'memory')
@@ -1,5 +1,5 @@
 import json
-from typing import Type
+from typing import Type, Optional
 
 from flask import current_app
 from langchain.tools import BaseTool
@@ -32,7 +32,8 @@ class DatasetRetrieverTool(BaseTool):
     conversation_message_task: ConversationMessageTask
     return_resource: str
     retriever_from: str
-
+    # dataset loaded by the orchestrator, reused instead of querying it again on each run
+    dataset: Optional[Dataset] = None
 
     @classmethod
     def from_dataset(cls, dataset: Dataset, **kwargs):
@@ -46,14 +47,17 @@ class DatasetRetrieverTool(BaseTool):
             tenant_id=dataset.tenant_id,
             dataset_id=dataset.id,
             description=description,
+            dataset=dataset,
             **kwargs
         )
 
     def _run(self, query: str) -> str:
-        dataset = db.session.query(Dataset).filter(
-            Dataset.tenant_id == self.tenant_id,
-            Dataset.id == self.dataset_id
-        ).first()
+        dataset = self.dataset
+        if not dataset:
+            dataset = db.session.query(Dataset).filter(
+                Dataset.tenant_id == self.tenant_id,
+                Dataset.id == self.dataset_id
+            ).first()
 
         if not dataset:
             return f'[{self.name} failed to find dataset with id {self.dataset_id}.]'
@@ -108,12 +112,19 @@ class DatasetRetrieverTool(BaseTool):
                     document_score_list[item.metadata['doc_id']] = item.metadata['score']
             document_context_list = []
             index_node_ids = [document.metadata['doc_id'] for document in documents]
-            segments = DocumentSegment.query.filter(DocumentSegment.dataset_id == self.dataset_id,
-                                                    DocumentSegment.completed_at.isnot(None),
-                                                    DocumentSegment.status == 'completed',
-                                                    DocumentSegment.enabled == True,
-                                                    DocumentSegment.index_node_id.in_(index_node_ids)
-                                                    ).all()
+            # load segments together with their documents, a document is None if it is disabled or archived
+            segment_documents = db.session.query(DocumentSegment, Document) \
+                .outerjoin(Document, db.and_(Document.id == DocumentSegment.document_id,
+                                             Document.enabled == True,
+                                             Document.archived == False)) \
+                .filter(DocumentSegment.dataset_id == self.dataset_id,
+                        DocumentSegment.completed_at.isnot(None),
+                        DocumentSegment.status == 'completed',
+                        DocumentSegment.enabled == True,
+                        DocumentSegment.index_node_id.in_(index_node_ids)
+                        ).all()
+            segments = [segment for segment, _ in segment_documents]
+            segment_id_to_document = {segment.id: document for segment, document in segment_documents}
 
             if segments:
                 index_node_id_to_position = {id: position for position, id in enumerate(index_node_ids)}
@@ -130,10 +141,7 @@ class DatasetRetrieverTool(BaseTool):
                     resource_number = 1
                     for segment in sorted_segments:
                         context = {}
-                        document = Document.query.filter(Document.id == segment.document_id,
-                                                         Document.enabled == True,
-                                                         Document.archived == False,
-                                                         ).first()
+                        document = segment_id_to_document.get(segment.id)
                         if dataset and document:
                             source = {
                                 'position': resource_number,
@@ -0,0 +1,9 @@
+from events.app_event import app_was_deleted, app_model_config_was_updated
+from services.api_token_service import ApiTokenService
+
+
+@app_was_deleted.connect
+@app_model_config_was_updated.connect
+def handle(sender, **kwargs):
+    app = sender
+    ApiTokenService.invalidate_app(app.id)
@@ -0,0 +1,10 @@
+from events.message_event import message_was_created
+from services.app_statistics_service import AppStatisticsService
+
+
+@message_was_created.connect
+def handle(sender, **kwargs):
+    message = sender
+    conversation = kwargs.get('conversation')
+
+    AppStatisticsService.record_message(message, conversation)
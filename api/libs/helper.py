@@ -153,3 +153,8 @@ def get_remote_ip(request):
 def generate_text_hash(text: str) -> str:
     hash_text = str(text) + 'None'
     return sha256(hash_text.encode()).hexdigest()
+
+
+def escape_like_pattern(value: str, escape: str = '\\') -> str:
+    """Escape the LIKE wildcards in value so that it is matched literally, use with the same escape character."""
+    return value.replace(escape, escape * 2).replace('%', escape + '%').replace('_', escape + '_')
@@ -1,7 +1,40 @@
 # -*- coding:utf-8 -*-
+from typing import Optional, Type
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
 
 class InfiniteScrollPagination:
     def __init__(self, data, limit, has_more):
         self.data = data
         self.limit = limit
         self.has_more = has_more
+
+    @classmethod
+    def paginate_by_keyset(cls, query: Query, model, last_id: Optional[str], limit: int,
+                           last_not_exists_error: Type[Exception]) -> 'InfiniteScrollPagination':
+        """
+        Paginate the rows of the query in (created_at, id) descending order, starting after the row of last_id.
+
+        The row of last_id is compared by value in the page query itself, and one extra row is fetched
+        to tell whether there are more, so a page takes one query backed by a (..., created_at, id) index.
+        """
+        page_query = query
+        if last_id:
+            last_key = query.filter(model.id == last_id) \
+                .with_entities(model.created_at, model.id) \
+                .scalar_subquery()
+            page_query = page_query.filter(tuple_(model.created_at, model.id) < last_key)
+
+        rows = page_query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+
+        # an unknown last_id compares to NULL and matches nothing, only then tell it from the end of the list
+        if last_id and not rows and not query.filter(model.id == last_id).first():
+            raise last_not_exists_error()
+
+        return cls(
+            data=rows[:limit],
+            limit=limit,
+            has_more=len(rows) > limit
+        )
@@ -0,0 +1,83 @@
+import logging
+import threading
+from typing import Callable, Generator, Optional
+
+from flask import current_app, Flask
+from redis.exceptions import LockError, ResponseError
+
+from extensions.ext_redis import redis_client
+
+
+class PeriodicFlusher:
+    """
+    Calls a flush function in the background, once per interval while there are changes to flush.
+
+    Writers aggregate their changes (in process or in redis) and call `schedule` after each change,
+    which arms a timer unless one is pending already. When it fires, the timer is cleared first,
+    so changes recorded during the flush arm the next one.
+    """
+
+    def __init__(self, interval: Callable[[], float], flush: Callable[[Flask], None]):
+        """
+        :param interval: returns the seconds to wait before flushing, read in the app context of `schedule`
+        :param flush: writes the aggregated changes, called with the flask app that armed the timer
+        """
+        self._interval = interval
+        self._flush = flush
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def schedule(self):
+        """Arm a flush after the interval if none is pending, must be called in an app context."""
+        with self._lock:
+            if self._timer is not None:
+                return
+
+            self._timer = threading.Timer(
+                self._interval(),
+                self._run,
+                kwargs={'flask_app': current_app._get_current_object()}
+            )
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self, flask_app: Flask):
+        with self._lock:
+            self._timer = None
+
+        try:
+            self._flush(flask_app)
+        except Exception:
+            logging.exception('Failed to flush in background')
+
+
+def iter_flushing_keys(key: str, lock_timeout: int = 600) -> Generator[str, None, None]:
+    """
+    Move the changes aggregated in a redis key away for flushing, changes made meanwhile go to a new key.
+
+    Yields the flushing key once for the changes left over by a flush that stopped before deleting them,
+    if any, and once for the current changes. The caller must delete the flushing key once its changes are
+    written, before the next one is yielded. One process flushes the key at a time, others yield nothing.
+    """
+    flushing_key = f'{key}:flushing'
+    lock = redis_client.lock(f'{key}:flush_lock', timeout=lock_timeout)
+    if not lock.acquire(blocking=False):
+        return
+
+    try:
+        if redis_client.exists(flushing_key):
+            yield flushing_key
+
+        try:
+            redis_client.rename(key, flushing_key)
+        except ResponseError:
+            # no change to flush
+            return
+
+        yield flushing_key
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # held longer than the timeout, another process may have flushed meanwhile
+            pass
@@ -1,6 +1,8 @@
 # -*- coding:utf-8 -*-
 import hashlib
+import threading
 
+from cachetools import TTLCache
 from Crypto.Cipher import PKCS1_OAEP, AES
 from Crypto.PublicKey import RSA
 from Crypto.Random import get_random_bytes
@@ -20,6 +22,8 @@ def generate_key_pair(tenant_id):
 
     storage.save(filepath, pem_private)
 
+    clear_cache(tenant_id)
+
     return pem_public.decode()
 
 
@@ -45,11 +49,60 @@ def encrypt(text, public_key):
     return prefix_hybrid + encrypted_data
 
 
+# parsed private keys and decrypted texts are kept in process for a short time,
+# decrypted texts are keyed by the hash of their ciphertext, so changed credentials never hit a stale entry
+_cache_lock = threading.Lock()
+_private_key_cache = TTLCache(maxsize=1000, ttl=300)
+_decrypted_text_cache = TTLCache(maxsize=10000, ttl=300)
+
+
 def decrypt(encrypted_text, tenant_id):
+    decrypted_text_cache_key = (tenant_id, hashlib.sha256(encrypted_text).hexdigest())
+    with _cache_lock:
+        decrypted_text = _decrypted_text_cache.get(decrypted_text_cache_key)
+
+    if decrypted_text is not None:
+        return decrypted_text
+
+    rsa_key, from_cache = _get_private_key(tenant_id)
+    try:
+        decrypted_text = _decrypt(encrypted_text, rsa_key)
+    except ValueError:
+        if not from_cache:
+            raise
+
+        # the key pair may have been reset by another process, retry with the key from storage
+        rsa_key, _ = _get_private_key(tenant_id, refresh=True)
+        decrypted_text = _decrypt(encrypted_text, rsa_key)
+
+    with _cache_lock:
+        _decrypted_text_cache[decrypted_text_cache_key] = decrypted_text
+
+    return decrypted_text
+
+
+def clear_cache(tenant_id):
+    """Drop the cached private key and decrypted texts of the tenant, must be called after its key pair is reset."""
+    with _cache_lock:
+        _private_key_cache.pop(tenant_id, None)
+        for key in [key for key in _decrypted_text_cache.keys() if key[0] == tenant_id]:
+            _decrypted_text_cache.pop(key, None)
+
+    redis_client.delete(_get_private_key_redis_cache_key(tenant_id))
+
+
+def _get_private_key(tenant_id, refresh: bool = False):
+    if not refresh:
+        with _cache_lock:
+            rsa_key = _private_key_cache.get(tenant_id)
+
+        if rsa_key is not None:
+            return rsa_key, True
+
     filepath = "privkeys/{tenant_id}".format(tenant_id=tenant_id) + "/private.pem"
 
-    cache_key = 'tenant_privkey:{hash}'.format(hash=hashlib.sha3_256(filepath.encode()).hexdigest())
-    private_key = redis_client.get(cache_key)
+    cache_key = _get_private_key_redis_cache_key(tenant_id)
+    private_key = redis_client.get(cache_key) if not refresh else None
     if not private_key:
         try:
             private_key = storage.load(filepath)
@@ -59,6 +112,19 @@ def decrypt(encrypted_text, tenant_id):
         redis_client.setex(cache_key, 120, private_key)
 
     rsa_key = RSA.import_key(private_key)
+
+    with _cache_lock:
+        _private_key_cache[tenant_id] = rsa_key
+
+    return rsa_key, False
+
+
+def _get_private_key_redis_cache_key(tenant_id):
+    filepath = "privkeys/{tenant_id}".format(tenant_id=tenant_id) + "/private.pem"
+    return 'tenant_privkey:{hash}'.format(hash=hashlib.sha3_256(filepath.encode()).hexdigest())
+
+
+def _decrypt(encrypted_text, rsa_key):
     cipher_rsa = PKCS1_OAEP.new(rsa_key)
 
     if encrypted_text.startswith(prefix_hybrid):
@@ -0,0 +1,39 @@
+"""add keyset pagination indexes
+
+Revision ID: 2d6b7c4e1f58
+Revises: 9b2f31a7c0d4
+Create Date: 2023-09-20 14:05:33.271940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d6b7c4e1f58'
+down_revision = '9b2f31a7c0d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the new indexes cover the replaced ones as prefixes, build them first without blocking writes
+    with op.get_context().autocommit_block():
+        op.create_index('message_conversation_created_idx', 'messages', ['conversation_id', 'created_at', 'id'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('conversation_app_from_user_created_idx', 'conversations',
+                        ['app_id', 'from_source', 'from_end_user_id', 'created_at', 'id'],
+                        unique=False, postgresql_concurrently=True)
+        op.drop_index('message_conversation_id_idx', table_name='messages', postgresql_concurrently=True)
+        op.drop_index('conversation_app_from_user_idx', table_name='conversations', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('conversation_app_from_user_idx', 'conversations',
+                        ['app_id', 'from_source', 'from_end_user_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('message_conversation_id_idx', 'messages', ['conversation_id'],
+                        unique=False, postgresql_concurrently=True)
+        op.drop_index('conversation_app_from_user_created_idx', table_name='conversations',
+                      postgresql_concurrently=True)
+        op.drop_index('message_conversation_created_idx', table_name='messages', postgresql_concurrently=True)
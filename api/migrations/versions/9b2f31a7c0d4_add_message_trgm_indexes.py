@@ -0,0 +1,37 @@
+"""add message trgm indexes
+
+Revision ID: 9b2f31a7c0d4
+Revises: 5fda94355fce
+Create Date: 2023-09-19 10:42:16.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2f31a7c0d4'
+down_revision = '5fda94355fce'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+
+    # the indexes serve ILIKE '%keyword%' on query and answer for keywords of at least 3 characters,
+    # shorter keywords have no trigram to look up and still scan the messages of the app.
+    # build the indexes without blocking writes to messages, which can take a while on large tables
+    with op.get_context().autocommit_block():
+        op.create_index('message_query_trgm_idx', 'messages', ['query'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'query': 'gin_trgm_ops'},
+                        postgresql_concurrently=True)
+        op.create_index('message_answer_trgm_idx', 'messages', ['answer'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'answer': 'gin_trgm_ops'},
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('message_answer_trgm_idx', table_name='messages', postgresql_concurrently=True)
+        op.drop_index('message_query_trgm_idx', table_name='messages', postgresql_concurrently=True)
@@ -2,6 +2,7 @@ import json
 import pickle
 from json import JSONDecodeError
 
+import numpy as np
 from sqlalchemy import func
 from sqlalchemy.dialects.postgresql import UUID
 
@@ -426,6 +427,53 @@ class DatasetKeywordTable(db.Model):
         return json.loads(self.keyword_table, cls=SetDecoder) if self.keyword_table else None
 
 
+class DatasetKeywordPosting(db.Model):
+    __tablename__ = 'dataset_keyword_postings'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('id', name='dataset_keyword_posting_pkey'),
+        db.UniqueConstraint('dataset_id', 'keyword', 'index_node_id', name='dataset_keyword_posting_unique_idx'),
+        db.Index('dataset_keyword_posting_node_idx', 'dataset_id', 'index_node_id'),
+    )
+
+    id = db.Column(UUID, primary_key=True, server_default=db.text('uuid_generate_v4()'))
+    dataset_id = db.Column(UUID, nullable=False)
+    keyword = db.Column(db.String(255), nullable=False)
+    index_node_id = db.Column(db.String(255), nullable=False)
+    term_frequency = db.Column(db.Integer, nullable=False, server_default=db.text('1'))
+    segment_length = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
+
+
+class DatasetKeywordFrequency(db.Model):
+    __tablename__ = 'dataset_keyword_frequencies'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('id', name='dataset_keyword_frequency_pkey'),
+        db.UniqueConstraint('dataset_id', 'keyword', name='dataset_keyword_frequency_unique_idx'),
+    )
+
+    id = db.Column(UUID, primary_key=True, server_default=db.text('uuid_generate_v4()'))
+    dataset_id = db.Column(UUID, nullable=False)
+    keyword = db.Column(db.String(255), nullable=False)
+    document_frequency = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+
+
+class DatasetKeywordIndexStat(db.Model):
+    __tablename__ = 'dataset_keyword_index_stats'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('id', name='dataset_keyword_index_stat_pkey'),
+        db.UniqueConstraint('dataset_id', name='dataset_keyword_index_stat_dataset_idx'),
+    )
+
+    id = db.Column(UUID, primary_key=True, server_default=db.text('uuid_generate_v4()'))
+    dataset_id = db.Column(UUID, nullable=False)
+    segment_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    total_segment_length = db.Column(db.BigInteger, nullable=False, server_default=db.text('0'))
+
+    @property
+    def average_segment_length(self) -> float:
+        return self.total_segment_length / self.segment_count if self.segment_count > 0 else 0.0
+
+
 class Embedding(db.Model):
     __tablename__ = 'embeddings'
     __table_args__ = (
@@ -440,8 +488,54 @@ class Embedding(db.Model):
     embedding = db.Column(db.LargeBinary, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
 
-    def set_embedding(self, embedding_data: list[float]):
-        self.embedding = pickle.dumps(embedding_data, protocol=pickle.HIGHEST_PROTOCOL)
+    # compact format: magic (2 bytes) + format version (1 byte) + dtype code (1 byte) + little-endian floats.
+    # legacy rows hold a pickled list, which always starts with the pickle PROTO opcode (0x80).
+    ENCODING_MAGIC = b'EB'
+    ENCODING_VERSION = 1
+    ENCODING_HEADER_SIZE = 4
+    ENCODING_DTYPES = {
+        'float32': (b'f', np.dtype('<f4')),
+        'float16': (b'e', np.dtype('<f2')),
+    }
+
+    def set_embedding(self, embedding_data: list[float], dtype: str = 'float32'):
+        self.embedding = self.encode_embedding(embedding_data, dtype)
 
     def get_embedding(self) -> list[float]:
-        return pickle.loads(self.embedding)
+        return self.decode_embedding(self.embedding).tolist()
+
+    def get_embedding_array(self) -> np.ndarray:
+        return self.decode_embedding(self.embedding)
+
+    def is_legacy_format(self) -> bool:
+        return self.is_legacy_embedding(self.embedding)
+
+    @classmethod
+    def encode_embedding(cls, embedding_data, dtype: str = 'float32') -> bytes:
+        if dtype not in cls.ENCODING_DTYPES:
+            raise ValueError(f'Unsupported embedding dtype: {dtype}')
+
+        dtype_code, np_dtype = cls.ENCODING_DTYPES[dtype]
+        header = cls.ENCODING_MAGIC + bytes([cls.ENCODING_VERSION]) + dtype_code
+        return header + np.asarray(embedding_data, dtype=np_dtype).tobytes()
+
+    @classmethod
+    def decode_embedding(cls, data: bytes) -> np.ndarray:
+        if cls.is_legacy_embedding(data):
+            # legacy rows were pickled python floats, keep their full precision when reading them
+            return np.asarray(pickle.loads(data), dtype=np.float64)
+
+        version = data[2]
+        if version != cls.ENCODING_VERSION:
+            raise ValueError(f'Unsupported embedding format version: {version}')
+
+        dtype_code = data[3:4]
+        for code, np_dtype in cls.ENCODING_DTYPES.values():
+            if code == dtype_code:
+                return np.frombuffer(data, dtype=np_dtype, offset=cls.ENCODING_HEADER_SIZE)
+
+        raise ValueError(f'Unsupported embedding dtype code: {dtype_code}')
+
+    @classmethod
+    def is_legacy_embedding(cls, data: bytes) -> bool:
+        return data[:2] != cls.ENCODING_MAGIC
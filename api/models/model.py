@@ -254,11 +254,26 @@ class InstalledApp(db.Model):
         return tenant
 
 
-class Conversation(db.Model):
+class PreloadedPropertiesMixin:
+    """
+    Properties that query on access return the values loaded in bulk for a list of instances instead,
+    see ConversationService.load_properties.
+    """
+
+    @property
+    def preloaded_properties(self) -> dict:
+        return self.__dict__.get('_preloaded_properties', {})
+
+    def preload(self, **values):
+        self.__dict__.setdefault('_preloaded_properties', {}).update(values)
+
+
+class Conversation(PreloadedPropertiesMixin, db.Model):
     __tablename__ = 'conversations'
     __table_args__ = (
         db.PrimaryKeyConstraint('id', name='conversation_pkey'),
-        db.Index('conversation_app_from_user_idx', 'app_id', 'from_source', 'from_end_user_id')
+        db.Index('conversation_app_from_user_created_idx', 'app_id', 'from_source', 'from_end_user_id',
+                 'created_at', 'id')
     )
 
     id = db.Column(UUID, server_default=db.text('uuid_generate_v4()'))
@@ -316,8 +331,11 @@ class Conversation(db.Model):
             else:
                 model_config['configs'] = override_model_configs
         else:
-            app_model_config = db.session.query(AppModelConfig).filter(
-                AppModelConfig.id == self.app_model_config_id).first()
+            if 'app_model_config' in self.preloaded_properties:
+                app_model_config = self.preloaded_properties['app_model_config']
+            else:
+                app_model_config = db.session.query(AppModelConfig).filter(
+                    AppModelConfig.id == self.app_model_config_id).first()
 
             model_config['configs'] = app_model_config.configs
             model_config['model'] = app_model_config.model_dict
@@ -350,18 +368,30 @@ class Conversation(db.Model):
 
     @property
     def annotated(self):
+        if 'annotation' in self.preloaded_properties:
+            return self.preloaded_properties['annotation'] is not None
+
         return db.session.query(MessageAnnotation).filter(MessageAnnotation.conversation_id == self.id).count() > 0
 
     @property
     def annotation(self):
+        if 'annotation' in self.preloaded_properties:
+            return self.preloaded_properties['annotation']
+
         return db.session.query(MessageAnnotation).filter(MessageAnnotation.conversation_id == self.id).first()
 
     @property
     def message_count(self):
+        if 'message_count' in self.preloaded_properties:
+            return self.preloaded_properties['message_count']
+
         return db.session.query(Message).filter(Message.conversation_id == self.id).count()
 
     @property
     def user_feedback_stats(self):
+        if 'user_feedback_stats' in self.preloaded_properties:
+            return self.preloaded_properties['user_feedback_stats']
+
         like = db.session.query(MessageFeedback) \
             .filter(MessageFeedback.conversation_id == self.id,
                     MessageFeedback.from_source == 'user',
@@ -376,6 +406,9 @@ class Conversation(db.Model):
 
     @property
     def admin_feedback_stats(self):
+        if 'admin_feedback_stats' in self.preloaded_properties:
+            return self.preloaded_properties['admin_feedback_stats']
+
         like = db.session.query(MessageFeedback) \
             .filter(MessageFeedback.conversation_id == self.id,
                     MessageFeedback.from_source == 'admin',
@@ -390,6 +423,9 @@ class Conversation(db.Model):
 
     @property
     def first_message(self):
+        if 'first_message' in self.preloaded_properties:
+            return self.preloaded_properties['first_message']
+
         return db.session.query(Message).filter(Message.conversation_id == self.id).first()
 
     @property
@@ -398,6 +434,9 @@ class Conversation(db.Model):
 
     @property
     def from_end_user_session_id(self):
+        if 'from_end_user_session_id' in self.preloaded_properties:
+            return self.preloaded_properties['from_end_user_session_id']
+
         if self.from_end_user_id:
             end_user = db.session.query(EndUser).filter(EndUser.id == self.from_end_user_id).first()
             if end_user:
@@ -415,9 +454,14 @@ class Message(db.Model):
     __table_args__ = (
         db.PrimaryKeyConstraint('id', name='message_pkey'),
         db.Index('message_app_id_idx', 'app_id', 'created_at'),
-        db.Index('message_conversation_id_idx', 'conversation_id'),
+        db.Index('message_conversation_created_idx', 'conversation_id', 'created_at', 'id'),
         db.Index('message_end_user_idx', 'app_id', 'from_source', 'from_end_user_id'),
         db.Index('message_account_idx', 'app_id', 'from_source', 'from_account_id'),
+        # trigram indexes for the keyword search of conversation logs
+        db.Index('message_query_trgm_idx', 'query', postgresql_using='gin',
+                 postgresql_ops={'query': 'gin_trgm_ops'}),
+        db.Index('message_answer_trgm_idx', 'answer', postgresql_using='gin',
+                 postgresql_ops={'answer': 'gin_trgm_ops'}),
     )
 
     id = db.Column(UUID, server_default=db.text('uuid_generate_v4()'))
@@ -445,6 +489,9 @@ class Message(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
     updated_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
     agent_based = db.Column(db.Boolean, nullable=False, server_default=db.text('false'))
+    memory_tokenizer = db.Column(db.String(255), nullable=True)
+    memory_query_tokens = db.Column(db.Integer, nullable=True)
+    memory_answer_tokens = db.Column(db.Integer, nullable=True)
 
     @property
     def user_feedback(self):
@@ -519,7 +566,7 @@ class MessageFeedback(db.Model):
         return account
 
 
-class MessageAnnotation(db.Model):
+class MessageAnnotation(PreloadedPropertiesMixin, db.Model):
     __tablename__ = 'message_annotations'
     __table_args__ = (
         db.PrimaryKeyConstraint('id', name='message_annotation_pkey'),
@@ -539,6 +586,9 @@ class MessageAnnotation(db.Model):
 
     @property
     def account(self):
+        if 'account' in self.preloaded_properties:
+            return self.preloaded_properties['account']
+
         account = db.session.query(Account).filter(Account.id == self.account_id).first()
         return account
 
@@ -762,3 +812,47 @@ class DatasetRetrieverResource(db.Model):
     created_by = db.Column(UUID, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.current_timestamp())
 
+
+
+class AppStatisticsHourly(db.Model):
+    __tablename__ = 'app_statistics_hourly'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('id', name='app_statistics_hourly_pkey'),
+        db.UniqueConstraint('app_id', 'hour', name='unique_app_statistics_hourly')
+    )
+
+    id = db.Column(UUID, nullable=False, server_default=db.text('uuid_generate_v4()'))
+    app_id = db.Column(UUID, nullable=False)
+    # start of the hour, utc
+    hour = db.Column(db.DateTime, nullable=False)
+    # of the messages created in the hour
+    message_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    message_tokens = db.Column(db.BigInteger, nullable=False, server_default=db.text('0'))
+    answer_tokens = db.Column(db.BigInteger, nullable=False, server_default=db.text('0'))
+    total_price = db.Column(db.Numeric(20, 7), nullable=False, server_default=db.text('0'))
+    total_latency = db.Column(db.Float, nullable=False, server_default=db.text('0'))
+    feedback_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    # of the messages in the chat conversations created in the hour
+    session_message_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
+
+
+class AppStatisticsHourlyMember(db.Model):
+    """
+    Distinct conversations and end users with messages in an hour, and chat conversations (sessions) created in it,
+    so that they can be counted distinctly over any range of hours.
+    """
+    __tablename__ = 'app_statistics_hourly_members'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('id', name='app_statistics_hourly_member_pkey'),
+        db.UniqueConstraint('app_id', 'member_type', 'hour', 'member_id', name='unique_app_statistics_hourly_member')
+    )
+
+    id = db.Column(UUID, nullable=False, server_default=db.text('uuid_generate_v4()'))
+    app_id = db.Column(UUID, nullable=False)
+    hour = db.Column(db.DateTime, nullable=False)
+    # conversation, end_user or session
+    member_type = db.Column(db.String(32), nullable=False)
+    member_id = db.Column(UUID, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
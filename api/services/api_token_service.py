@@ -0,0 +1,160 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+
+from cachetools import TTLCache
+from flask import Flask
+from sqlalchemy import bindparam
+from sqlalchemy.orm import make_transient_to_detached
+
+from extensions.ext_database import db
+from libs.periodic_flusher import PeriodicFlusher
+from models.model import ApiToken, App
+
+
+class CachedApiToken:
+    def __init__(self, id: str, type: str, app_id: Optional[str], dataset_id: Optional[str]):
+        self.id = id
+        self.type = type
+        self.app_id = app_id
+        self.dataset_id = dataset_id
+
+
+class ApiTokenService:
+    """
+    Resolves service API tokens and their apps through a short-lived per-process cache,
+    and writes `last_used_at` of the tokens in the background at most once per interval.
+
+    Revoked tokens and app changes made in another process take up to API_TOKEN_CACHE_TTL seconds to apply.
+    """
+
+    _lock = threading.Lock()
+    _token_cache = TTLCache(maxsize=10000, ttl=10)
+    _app_cache = TTLCache(maxsize=10000, ttl=10)
+
+    # tokens whose usage has been recorded in the current interval
+    _recently_used_tokens = TTLCache(maxsize=10000, ttl=60)
+    _pending_last_used: dict[str, datetime] = {}
+    _flusher = PeriodicFlusher(
+        interval=lambda: ApiTokenService._recently_used_tokens.ttl,
+        flush=lambda flask_app: ApiTokenService.flush_last_used(flask_app)
+    )
+
+    @classmethod
+    def configure(cls, cache_ttl: int, last_used_update_interval: int):
+        with cls._lock:
+            cls._token_cache = TTLCache(maxsize=10000, ttl=cache_ttl) if cache_ttl > 0 else None
+            cls._app_cache = TTLCache(maxsize=10000, ttl=cache_ttl) if cache_ttl > 0 else None
+            cls._recently_used_tokens = TTLCache(maxsize=10000, ttl=last_used_update_interval) \
+                if last_used_update_interval > 0 else None
+
+    @classmethod
+    def get_api_token(cls, token: str, scope: str) -> Optional[CachedApiToken]:
+        key = (token, scope)
+        if cls._token_cache is not None:
+            with cls._lock:
+                cached_api_token = cls._token_cache.get(key)
+            if cached_api_token is not None:
+                return cached_api_token
+
+        api_token = db.session.query(ApiToken).filter(
+            ApiToken.token == token,
+            ApiToken.type == scope,
+        ).first()
+
+        if not api_token:
+            return None
+
+        cached_api_token = CachedApiToken(
+            id=api_token.id,
+            type=api_token.type,
+            app_id=api_token.app_id,
+            dataset_id=api_token.dataset_id
+        )
+
+        if cls._token_cache is not None:
+            with cls._lock:
+                cls._token_cache[key] = cached_api_token
+
+        return cached_api_token
+
+    @classmethod
+    def get_app(cls, app_id: str) -> Optional[App]:
+        """Get the app attached to the current session, without a query when its snapshot is cached."""
+        if cls._app_cache is not None:
+            with cls._lock:
+                cached_app = cls._app_cache.get(app_id)
+            if cached_app is not None:
+                return db.session.merge(cached_app, load=False)
+
+        app_model = db.session.query(App).filter(App.id == app_id).first()
+        if not app_model:
+            return None
+
+        if cls._app_cache is not None:
+            cached_app = App(**{column.key: getattr(app_model, column.key) for column in App.__table__.columns})
+            make_transient_to_detached(cached_app)
+            with cls._lock:
+                cls._app_cache[app_id] = cached_app
+
+        return app_model
+
+    @classmethod
+    def invalidate_token(cls, token: str):
+        if cls._token_cache is not None:
+            with cls._lock:
+                for key in [key for key in cls._token_cache.keys() if key[0] == token]:
+                    cls._token_cache.pop(key, None)
+
+    @classmethod
+    def invalidate_app(cls, app_id: str):
+        if cls._app_cache is not None:
+            with cls._lock:
+                cls._app_cache.pop(str(app_id), None)
+
+    @classmethod
+    def record_last_used(cls, api_token: CachedApiToken):
+        if cls._recently_used_tokens is None:
+            db.session.query(ApiToken).filter(ApiToken.id == api_token.id) \
+                .update({'last_used_at': datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+            return
+
+        with cls._lock:
+            if api_token.id in cls._recently_used_tokens:
+                return
+
+            cls._recently_used_tokens[api_token.id] = True
+            cls._pending_last_used[api_token.id] = datetime.utcnow()
+
+        cls._flusher.schedule()
+
+    @classmethod
+    def flush_last_used(cls, flask_app: Flask):
+        with cls._lock:
+            pending_last_used = cls._pending_last_used
+            cls._pending_last_used = {}
+
+        if not pending_last_used:
+            return
+
+        with flask_app.app_context():
+            try:
+                db.session.execute(
+                    ApiToken.__table__.update()
+                    .where(ApiToken.__table__.c.id == bindparam('token_id'))
+                    .values(last_used_at=bindparam('used_at')),
+                    [{'token_id': token_id, 'used_at': used_at} for token_id, used_at in pending_last_used.items()]
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logging.exception('Failed to update last_used_at of api tokens')
+
+
+def init_app(app: Flask):
+    ApiTokenService.configure(
+        cache_ttl=app.config.get('API_TOKEN_CACHE_TTL'),
+        last_used_update_interval=app.config.get('API_TOKEN_LAST_USED_UPDATE_INTERVAL')
+    )
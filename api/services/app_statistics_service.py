@@ -0,0 +1,261 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from flask import current_app, Flask
+from sqlalchemy import text
+
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from libs.periodic_flusher import PeriodicFlusher, iter_flushing_keys
+from models.model import Message, Conversation
+
+# counters of app_statistics_hourly, total_price is counted in 1e-7 units to stay an integer in redis
+_INTEGER_METRICS = ['message_count', 'message_tokens', 'answer_tokens', 'total_price', 'feedback_count',
+                    'session_message_count']
+_FLOAT_METRICS = ['total_latency']
+_PRICE_SCALE = 7
+
+_FLUSH_COUNTERS_SQL = """
+INSERT INTO app_statistics_hourly (app_id, hour, message_count, message_tokens, answer_tokens, total_price,
+    total_latency, feedback_count, session_message_count)
+SELECT * FROM unnest(CAST(:app_ids AS uuid[]), CAST(:hours AS timestamp[]), CAST(:message_count AS integer[]),
+    CAST(:message_tokens AS bigint[]), CAST(:answer_tokens AS bigint[]), CAST(:total_price AS numeric[]),
+    CAST(:total_latency AS float8[]), CAST(:feedback_count AS integer[]), CAST(:session_message_count AS integer[]))
+ON CONFLICT (app_id, hour) DO UPDATE SET
+    message_count = app_statistics_hourly.message_count + EXCLUDED.message_count,
+    message_tokens = app_statistics_hourly.message_tokens + EXCLUDED.message_tokens,
+    answer_tokens = app_statistics_hourly.answer_tokens + EXCLUDED.answer_tokens,
+    total_price = app_statistics_hourly.total_price + EXCLUDED.total_price,
+    total_latency = app_statistics_hourly.total_latency + EXCLUDED.total_latency,
+    feedback_count = app_statistics_hourly.feedback_count + EXCLUDED.feedback_count,
+    session_message_count = app_statistics_hourly.session_message_count + EXCLUDED.session_message_count,
+    updated_at = CURRENT_TIMESTAMP(0)
+"""
+
+_FLUSH_MEMBERS_SQL = """
+INSERT INTO app_statistics_hourly_members (app_id, hour, member_type, member_id)
+SELECT * FROM unnest(CAST(:app_ids AS uuid[]), CAST(:hours AS timestamp[]), CAST(:member_types AS varchar[]),
+    CAST(:member_ids AS uuid[]))
+ON CONFLICT DO NOTHING
+"""
+
+# messages are inserted with an empty message when generating starts, the statistics only count the messages
+# saved with their prompt, which are the ones recorded live when message_was_created is sent
+_SAVED_MESSAGE_CONDITION = "CAST({alias}message AS text) <> '\"\"'"
+
+_REBUILD_SQLS = [
+    "DELETE FROM app_statistics_hourly WHERE app_id = :app_id AND hour < :cutoff",
+    "DELETE FROM app_statistics_hourly_members WHERE app_id = :app_id AND hour < :cutoff",
+    """
+    INSERT INTO app_statistics_hourly (app_id, hour, message_count, message_tokens, answer_tokens, total_price,
+        total_latency, feedback_count, session_message_count)
+    SELECT CAST(:app_id AS uuid), hour, sum(message_count), sum(message_tokens), sum(answer_tokens), sum(total_price),
+        sum(total_latency), sum(feedback_count), sum(session_message_count)
+    FROM (
+        SELECT date_trunc('hour', created_at) AS hour, count(*) AS message_count,
+            sum(message_tokens) AS message_tokens, sum(answer_tokens) AS answer_tokens,
+            coalesce(sum(total_price), 0) AS total_price, sum(provider_response_latency) AS total_latency,
+            0 AS feedback_count, 0 AS session_message_count
+        FROM messages WHERE app_id = :app_id AND created_at < :cutoff AND {saved_message} GROUP BY 1
+        UNION ALL
+        SELECT date_trunc('hour', m.created_at), 0, 0, 0, 0, 0, count(*), 0
+        FROM message_feedbacks mf JOIN messages m ON m.id = mf.message_id
+        WHERE mf.app_id = :app_id AND m.created_at < :cutoff GROUP BY 1
+        UNION ALL
+        SELECT date_trunc('hour', c.created_at), 0, 0, 0, 0, 0, 0, count(*)
+        FROM conversations c JOIN messages m ON m.conversation_id = c.id
+        WHERE c.app_id = :app_id AND c.override_model_configs IS NULL
+            AND c.created_at < :cutoff AND {saved_m} GROUP BY 1
+    ) AS t
+    GROUP BY hour
+    """,
+    """
+    INSERT INTO app_statistics_hourly_members (app_id, hour, member_type, member_id)
+    SELECT DISTINCT CAST(:app_id AS uuid), date_trunc('hour', created_at), 'conversation', conversation_id
+        FROM messages WHERE app_id = :app_id AND created_at < :cutoff AND {saved_message}
+    UNION
+    SELECT DISTINCT CAST(:app_id AS uuid), date_trunc('hour', created_at), 'end_user', from_end_user_id
+        FROM messages WHERE app_id = :app_id AND created_at < :cutoff AND from_end_user_id IS NOT NULL
+            AND {saved_message}
+    UNION
+    SELECT CAST(:app_id AS uuid), date_trunc('hour', c.created_at), 'session', c.id
+        FROM conversations c
+        WHERE c.app_id = :app_id AND c.override_model_configs IS NULL AND c.created_at < :cutoff
+            AND EXISTS (SELECT 1 FROM messages m WHERE m.conversation_id = c.id AND {saved_m})
+    """
+]
+_REBUILD_SQLS = [
+    sql.format(saved_message=_SAVED_MESSAGE_CONDITION.format(alias=''),
+               saved_m=_SAVED_MESSAGE_CONDITION.format(alias='m.'))
+    for sql in _REBUILD_SQLS
+]
+
+
+class AppStatisticsService:
+    """
+    Maintains the hourly statistics of apps (app_statistics_hourly and app_statistics_hourly_members)
+    that the console statistic dashboards read, instead of scanning the messages of the app on each page load.
+
+    Changes are aggregated in redis and upserted in bulk every APP_STATISTICS_FLUSH_INTERVAL seconds.
+    """
+
+    counters_key = 'app_statistics_counters'
+    members_key = 'app_statistics_members'
+    flush_batch_size = 1000
+
+    _flusher = PeriodicFlusher(
+        interval=lambda: current_app.config.get('APP_STATISTICS_FLUSH_INTERVAL', 10),
+        flush=lambda flask_app: AppStatisticsService.flush(flask_app)
+    )
+
+    @classmethod
+    def record_message(cls, message: Message, conversation: Conversation):
+        if message.message == '':
+            # not saved with its prompt, not counted by the rebuild either, see _SAVED_MESSAGE_CONDITION
+            return
+
+        hour = cls._hour_of(message.created_at)
+        total_price = int(Decimal(message.total_price or 0).scaleb(_PRICE_SCALE).to_integral_value())
+
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            pipeline.hincrby(cls.counters_key, f'{message.app_id}:{hour}:message_count', 1)
+            pipeline.hincrby(cls.counters_key, f'{message.app_id}:{hour}:message_tokens', message.message_tokens or 0)
+            pipeline.hincrby(cls.counters_key, f'{message.app_id}:{hour}:answer_tokens', message.answer_tokens or 0)
+            pipeline.hincrby(cls.counters_key, f'{message.app_id}:{hour}:total_price', total_price)
+            pipeline.hincrbyfloat(cls.counters_key, f'{message.app_id}:{hour}:total_latency',
+                                  message.provider_response_latency or 0)
+            pipeline.sadd(cls.members_key, f'{message.app_id}:{hour}:conversation:{message.conversation_id}')
+            if message.from_end_user_id:
+                pipeline.sadd(cls.members_key, f'{message.app_id}:{hour}:end_user:{message.from_end_user_id}')
+
+            if conversation.override_model_configs is None:
+                conversation_hour = cls._hour_of(conversation.created_at)
+                pipeline.hincrby(cls.counters_key, f'{message.app_id}:{conversation_hour}:session_message_count', 1)
+                pipeline.sadd(cls.members_key, f'{message.app_id}:{conversation_hour}:session:{conversation.id}')
+
+            pipeline.execute()
+        except Exception:
+            logging.exception('Failed to record app statistics of message, message id: %s', message.id)
+            return
+
+        cls._flusher.schedule()
+
+    @classmethod
+    def record_feedback(cls, message: Message, delta: int):
+        """Count a feedback created (1) or deleted (-1) on the message."""
+        try:
+            redis_client.hincrby(cls.counters_key,
+                                 f'{message.app_id}:{cls._hour_of(message.created_at)}:feedback_count', delta)
+        except Exception:
+            logging.exception('Failed to record app statistics of feedback, message id: %s', message.id)
+            return
+
+        cls._flusher.schedule()
+
+    @classmethod
+    def flush(cls, flask_app: Flask):
+        with flask_app.app_context():
+            cls._flush_counters()
+            cls._flush_members()
+
+    @classmethod
+    def rebuild(cls, app_id: str, cutoff: datetime):
+        """
+        Recompute the statistics of the hours before cutoff from the messages of the app.
+        The hours after cutoff are left to the live updates, so that in-flight messages are not counted twice.
+        """
+        try:
+            for sql in _REBUILD_SQLS:
+                db.session.execute(text(sql), {'app_id': app_id, 'cutoff': cutoff})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @classmethod
+    def _flush_counters(cls):
+        for flushing_key in iter_flushing_keys(cls.counters_key):
+            counters = redis_client.hgetall(flushing_key)
+
+            rows = defaultdict(lambda: {metric: 0 for metric in _INTEGER_METRICS + _FLOAT_METRICS})
+            fields = defaultdict(list)
+            for field, value in counters.items():
+                app_id, hour, metric = field.decode('utf-8').split(':')
+                rows[(app_id, hour)][metric] = float(value) if metric in _FLOAT_METRICS else int(value)
+                fields[(app_id, hour)].append(field)
+
+            items = list(rows.items())
+            for i in range(0, len(items), cls.flush_batch_size):
+                batch_items = items[i:i + cls.flush_batch_size]
+                batch_fields = [field for key, _ in batch_items for field in fields[key]]
+                params = {
+                    'app_ids': [app_id for (app_id, _), _ in batch_items],
+                    'hours': [cls._parse_hour(hour) for (_, hour), _ in batch_items]
+                }
+                for metric in _INTEGER_METRICS + _FLOAT_METRICS:
+                    params[metric] = [values[metric] for _, values in batch_items]
+                params['total_price'] = [Decimal(total_price).scaleb(-_PRICE_SCALE)
+                                         for total_price in params['total_price']]
+
+                try:
+                    db.session.execute(text(_FLUSH_COUNTERS_SQL), params)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    logging.exception('Failed to flush app statistics')
+
+                    # give the counts back, they are flushed again next time
+                    pipeline = redis_client.pipeline()
+                    for (app_id, hour), values in batch_items:
+                        for metric in _INTEGER_METRICS:
+                            if values[metric]:
+                                pipeline.hincrby(cls.counters_key, f'{app_id}:{hour}:{metric}', values[metric])
+                        for metric in _FLOAT_METRICS:
+                            if values[metric]:
+                                pipeline.hincrbyfloat(cls.counters_key, f'{app_id}:{hour}:{metric}', values[metric])
+                    pipeline.hdel(flushing_key, *batch_fields)
+                    pipeline.execute()
+                    continue
+
+                # the written counts are not flushed again if this flush stops before the end
+                redis_client.hdel(flushing_key, *batch_fields)
+
+            redis_client.delete(flushing_key)
+
+    @classmethod
+    def _flush_members(cls):
+        for flushing_key in iter_flushing_keys(cls.members_key):
+            members = list(redis_client.smembers(flushing_key))
+
+            for i in range(0, len(members), cls.flush_batch_size):
+                batch_members = members[i:i + cls.flush_batch_size]
+                params = {'app_ids': [], 'hours': [], 'member_types': [], 'member_ids': []}
+                for member in batch_members:
+                    app_id, hour, member_type, member_id = member.decode('utf-8').split(':')
+                    params['app_ids'].append(app_id)
+                    params['hours'].append(cls._parse_hour(hour))
+                    params['member_types'].append(member_type)
+                    params['member_ids'].append(member_id)
+
+                try:
+                    db.session.execute(text(_FLUSH_MEMBERS_SQL), params)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    logging.exception('Failed to flush app statistics members')
+                    redis_client.sadd(cls.members_key, *batch_members)
+
+                redis_client.srem(flushing_key, *batch_members)
+
+            redis_client.delete(flushing_key)
+
+    @staticmethod
+    def _hour_of(created_at: datetime) -> str:
+        return created_at.strftime('%Y%m%d%H')
+
+    @staticmethod
+    def _parse_hour(hour: str) -> datetime:
+        return datetime.strptime(hour, '%Y%m%d%H')
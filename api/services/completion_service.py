@@ -6,7 +6,6 @@ import uuid
 from typing import Generator, Union, Any
 
 from flask import current_app, Flask
-from redis.client import PubSub
 from sqlalchemy import and_
 
 from core.completion import Completion
@@ -14,8 +13,9 @@ from core.conversation_message_task import PubHandler, ConversationTaskStoppedEx
 from core.model_providers.error import LLMBadRequestError, LLMAPIConnectionError, LLMAPIUnavailableError, \
     LLMRateLimitError, \
     LLMAuthorizationError, ProviderTokenNotInitError, QuotaExceededError, ModelCurrentlyNotSupportError
+from core.stream.generate_task_scheduler import generate_task_scheduler
+from core.stream.stream_transport import stream_transport, StreamSubscription
 from extensions.ext_database import db
-from extensions.ext_redis import redis_client
 from models.model import Conversation, AppModelConfig, App, Account, EndUser, Message
 from services.app_model_config_service import AppModelConfigService
 from services.errors.app import MoreLikeThisDisabledError
@@ -132,8 +132,7 @@ class CompletionService:
 
         generate_task_id = str(uuid.uuid4())
 
-        pubsub = redis_client.pubsub()
-        pubsub.subscribe(PubHandler.generate_channel_name(user, generate_task_id))
+        subscription = stream_transport.subscribe(PubHandler.generate_channel_name(user, generate_task_id))
 
         user = cls.get_real_user_instead_of_proxy_obj(user)
 
@@ -154,9 +153,9 @@ class CompletionService:
         generate_worker_thread.start()
 
         # wait for 10 minutes to close the thread
-        cls.countdown_and_close(generate_worker_thread, pubsub, user, generate_task_id)
+        cls.countdown_and_close(generate_worker_thread, subscription, user, generate_task_id)
 
-        return cls.compact_response(pubsub, streaming)
+        return cls.compact_response(subscription, streaming)
 
     @classmethod
     def get_real_user_instead_of_proxy_obj(cls, user: Union[Account, EndUser]):
@@ -210,30 +209,17 @@ class CompletionService:
                 PubHandler.pub_error(user, generate_task_id, e)
 
     @classmethod
-    def countdown_and_close(cls, worker_thread, pubsub, user, generate_task_id) -> threading.Thread:
-        # wait for 10 minutes to close the thread
-        timeout = 600
-
-        def close_pubsub():
-            sleep_iterations = 0
-            while sleep_iterations < timeout and worker_thread.is_alive():
-                if sleep_iterations > 0 and sleep_iterations % 10 == 0:
-                    PubHandler.ping(user, generate_task_id)
-
-                time.sleep(1)
-                sleep_iterations += 1
-
-            if worker_thread.is_alive():
-                PubHandler.stop(user, generate_task_id)
-                try:
-                    pubsub.close()
-                except:
-                    pass
-
-        countdown_thread = threading.Thread(target=close_pubsub)
-        countdown_thread.start()
-
-        return countdown_thread
+    def countdown_and_close(cls, worker_thread, subscription: StreamSubscription, user, generate_task_id):
+        # keep the stream alive with pings and stop the worker after 10 minutes
+        def close_subscription():
+            PubHandler.stop(user, generate_task_id)
+            subscription.close()
+
+        generate_task_scheduler.add(
+            worker_thread=worker_thread,
+            on_ping=lambda: PubHandler.ping(user, generate_task_id),
+            on_timeout=close_subscription
+        )
 
     @classmethod
     def generate_more_like_this(cls, app_model: App, user: Union[Account | EndUser],
@@ -270,8 +256,7 @@ class CompletionService:
 
         generate_task_id = str(uuid.uuid4())
 
-        pubsub = redis_client.pubsub()
-        pubsub.subscribe(PubHandler.generate_channel_name(user, generate_task_id))
+        subscription = stream_transport.subscribe(PubHandler.generate_channel_name(user, generate_task_id))
 
         user = cls.get_real_user_instead_of_proxy_obj(user)
 
@@ -288,9 +273,9 @@ class CompletionService:
 
         generate_worker_thread.start()
 
-        cls.countdown_and_close(generate_worker_thread, pubsub, user, generate_task_id)
+        cls.countdown_and_close(generate_worker_thread, subscription, user, generate_task_id)
 
-        return cls.compact_response(pubsub, streaming)
+        return cls.compact_response(subscription, streaming)
 
     @classmethod
     def generate_more_like_this_worker(cls, flask_app: Flask, generate_task_id: str, app_model: App,
@@ -362,18 +347,15 @@ class CompletionService:
         return filtered_inputs
 
     @classmethod
-    def compact_response(cls, pubsub: PubSub, streaming: bool = False) -> Union[dict | Generator]:
-        generate_channel = list(pubsub.channels.keys())[0].decode('utf-8')
+    def compact_response(cls, subscription: StreamSubscription, streaming: bool = False) -> Union[dict | Generator]:
+        generate_channel = subscription.channel
         if not streaming:
             try:
-                for message in pubsub.listen():
-                    if message["type"] == "message":
-                        result = message["data"].decode('utf-8')
-                        result = json.loads(result)
-                        if result.get('error'):
-                            cls.handle_error(result)
-                        if result['event'] == 'message' and 'data' in result:
-                            return cls.get_message_response_data(result.get('data'))
+                for result in subscription.listen():
+                    if result.get('error'):
+                        cls.handle_error(result)
+                    if result['event'] == 'message' and 'data' in result:
+                        return cls.get_message_response_data(result.get('data'))
             except ValueError as e:
                 if e.args[0] != "I/O operation on closed file.":  # ignore this error
                     raise CompletionStoppedError()
@@ -381,48 +363,42 @@ class CompletionService:
                     logging.exception(e)
                     raise
             finally:
-                try:
-                    pubsub.unsubscribe(generate_channel)
-                except ConnectionError:
-                    pass
+                subscription.unsubscribe()
+
+            # the subscription was closed before any answer arrived
+            raise CompletionStoppedError()
         else:
             def generate() -> Generator:
                 try:
-                    for message in pubsub.listen():
-                        if message["type"] == "message":
-                            result = message["data"].decode('utf-8')
-                            result = json.loads(result)
-                            if result.get('error'):
-                                cls.handle_error(result)
-
-                            event = result.get('event')
-                            if event == "end":
-                                logging.debug("{} finished".format(generate_channel))
-                                break
-
-                            if event == 'message':
-                                yield "data: " + json.dumps(cls.get_message_response_data(result.get('data'))) + "\n\n"
-                            elif event == 'chain':
-                                yield "data: " + json.dumps(cls.get_chain_response_data(result.get('data'))) + "\n\n"
-                            elif event == 'agent_thought':
-                                yield "data: " + json.dumps(
-                                    cls.get_agent_thought_response_data(result.get('data'))) + "\n\n"
-                            elif event == 'message_end':
-                                yield "data: " + json.dumps(
-                                    cls.get_message_end_data(result.get('data'))) + "\n\n"
-                            elif event == 'ping':
-                                yield "event: ping\n\n"
-                            else:
-                                yield "data: " + json.dumps(result) + "\n\n"
+                    for result in subscription.listen():
+                        if result.get('error'):
+                            cls.handle_error(result)
+
+                        event = result.get('event')
+                        if event == "end":
+                            logging.debug("{} finished".format(generate_channel))
+                            break
+
+                        if event == 'message':
+                            yield "data: " + json.dumps(cls.get_message_response_data(result.get('data'))) + "\n\n"
+                        elif event == 'chain':
+                            yield "data: " + json.dumps(cls.get_chain_response_data(result.get('data'))) + "\n\n"
+                        elif event == 'agent_thought':
+                            yield "data: " + json.dumps(
+                                cls.get_agent_thought_response_data(result.get('data'))) + "\n\n"
+                        elif event == 'message_end':
+                            yield "data: " + json.dumps(
+                                cls.get_message_end_data(result.get('data'))) + "\n\n"
+                        elif event == 'ping':
+                            yield "event: ping\n\n"
+                        else:
+                            yield "data: " + json.dumps(result) + "\n\n"
                 except ValueError as e:
                     if e.args[0] != "I/O operation on closed file.":  # ignore this error
                         logging.exception(e)
                         raise
                 finally:
-                    try:
-                        pubsub.unsubscribe(generate_channel)
-                    except ConnectionError:
-                        pass
+                    subscription.unsubscribe()
 
             return generate()
 
@@ -1,9 +1,11 @@
-from typing import Union, Optional
+from typing import Union, Optional, List
+
+from sqlalchemy import func
 
 from libs.infinite_scroll_pagination import InfiniteScrollPagination
 from extensions.ext_database import db
 from models.account import Account
-from models.model import Conversation, App, EndUser
+from models.model import Conversation, App, EndUser, Message, MessageFeedback, MessageAnnotation, AppModelConfig
 from services.errors.conversation import ConversationNotExistsError, LastConversationNotExistsError
 
 
@@ -29,38 +31,117 @@ class ConversationService:
         if exclude_ids is not None:
             base_query = base_query.filter(~Conversation.id.in_(exclude_ids))
 
-        if last_id:
-            last_conversation = base_query.filter(
-                Conversation.id == last_id,
-            ).first()
-
-            if not last_conversation:
-                raise LastConversationNotExistsError()
-
-            conversations = base_query.filter(
-                Conversation.created_at < last_conversation.created_at,
-                Conversation.id != last_conversation.id
-            ).order_by(Conversation.created_at.desc()).limit(limit).all()
-        else:
-            conversations = base_query.order_by(Conversation.created_at.desc()).limit(limit).all()
-
-        has_more = False
-        if len(conversations) == limit:
-            current_page_first_conversation = conversations[-1]
-            rest_count = base_query.filter(
-                Conversation.created_at < current_page_first_conversation.created_at,
-                Conversation.id != current_page_first_conversation.id
-            ).count()
-
-            if rest_count > 0:
-                has_more = True
-
-        return InfiniteScrollPagination(
-            data=conversations,
+        return InfiniteScrollPagination.paginate_by_keyset(
+            query=base_query,
+            model=Conversation,
+            last_id=last_id,
             limit=limit,
-            has_more=has_more
+            last_not_exists_error=LastConversationNotExistsError
         )
 
+    @classmethod
+    def load_properties(cls, conversations: List[Conversation], properties: List[str]):
+        """
+        Load the given properties of a page of conversations with one grouped query per property
+        and attach them to the conversations, instead of querying per conversation while marshalling.
+        Supported properties: message_count, user_feedback_stats, admin_feedback_stats, first_message,
+        annotation (also serves annotated), from_end_user_session_id and model_config.
+        """
+        if not conversations:
+            return
+
+        conversation_ids = [conversation.id for conversation in conversations]
+
+        if 'message_count' in properties:
+            message_counts = dict(
+                db.session.query(Message.conversation_id, func.count(Message.id))
+                .filter(Message.conversation_id.in_(conversation_ids))
+                .group_by(Message.conversation_id)
+                .all()
+            )
+
+            for conversation in conversations:
+                conversation.preload(message_count=message_counts.get(conversation.id, 0))
+
+        if 'user_feedback_stats' in properties or 'admin_feedback_stats' in properties:
+            feedback_stats = {}
+            rows = db.session.query(
+                MessageFeedback.conversation_id, MessageFeedback.from_source, MessageFeedback.rating,
+                func.count(MessageFeedback.id)
+            ).filter(
+                MessageFeedback.conversation_id.in_(conversation_ids),
+                MessageFeedback.rating.in_(['like', 'dislike'])
+            ).group_by(
+                MessageFeedback.conversation_id, MessageFeedback.from_source, MessageFeedback.rating
+            ).all()
+
+            for conversation_id, from_source, rating, count in rows:
+                feedback_stats.setdefault((conversation_id, from_source), {'like': 0, 'dislike': 0})[rating] = count
+
+            for conversation in conversations:
+                conversation.preload(
+                    user_feedback_stats=feedback_stats.get((conversation.id, 'user'), {'like': 0, 'dislike': 0}),
+                    admin_feedback_stats=feedback_stats.get((conversation.id, 'admin'), {'like': 0, 'dislike': 0})
+                )
+
+        if 'first_message' in properties:
+            first_messages = db.session.query(Message) \
+                .filter(Message.conversation_id.in_(conversation_ids)) \
+                .distinct(Message.conversation_id) \
+                .order_by(Message.conversation_id, Message.created_at.asc()) \
+                .all()
+            first_messages = {message.conversation_id: message for message in first_messages}
+
+            for conversation in conversations:
+                conversation.preload(first_message=first_messages.get(conversation.id))
+
+        if 'annotation' in properties:
+            annotations = db.session.query(MessageAnnotation) \
+                .filter(MessageAnnotation.conversation_id.in_(conversation_ids)) \
+                .distinct(MessageAnnotation.conversation_id) \
+                .order_by(MessageAnnotation.conversation_id, MessageAnnotation.created_at.asc()) \
+                .all()
+
+            account_ids = {annotation.account_id for annotation in annotations}
+            accounts = {}
+            if account_ids:
+                accounts = {account.id: account
+                            for account in db.session.query(Account).filter(Account.id.in_(account_ids)).all()}
+
+            for annotation in annotations:
+                annotation.preload(account=accounts.get(annotation.account_id))
+
+            annotations = {annotation.conversation_id: annotation for annotation in annotations}
+            for conversation in conversations:
+                conversation.preload(annotation=annotations.get(conversation.id))
+
+        if 'from_end_user_session_id' in properties:
+            end_user_ids = {conversation.from_end_user_id for conversation in conversations
+                            if conversation.from_end_user_id}
+            session_ids = {}
+            if end_user_ids:
+                session_ids = dict(
+                    db.session.query(EndUser.id, EndUser.session_id).filter(EndUser.id.in_(end_user_ids)).all()
+                )
+
+            for conversation in conversations:
+                conversation.preload(from_end_user_session_id=session_ids.get(conversation.from_end_user_id))
+
+        if 'model_config' in properties:
+            app_model_config_ids = {conversation.app_model_config_id for conversation in conversations
+                                    if conversation.override_model_configs is None}
+            app_model_configs = {}
+            if app_model_config_ids:
+                app_model_configs = {
+                    app_model_config.id: app_model_config
+                    for app_model_config in db.session.query(AppModelConfig)
+                    .filter(AppModelConfig.id.in_(app_model_config_ids)).all()
+                }
+
+            for conversation in conversations:
+                if conversation.override_model_configs is None:
+                    conversation.preload(app_model_config=app_model_configs.get(conversation.app_model_config_id))
+
     @classmethod
     def rename(cls, app_model: App, conversation_id: str,
                user: Optional[Union[Account | EndUser]], name: str):
@@ -7,6 +7,7 @@ from libs.infinite_scroll_pagination import InfiniteScrollPagination
 from extensions.ext_database import db
 from models.account import Account
 from models.model import App, EndUser, Message, MessageFeedback, AppModelConfig
+from services.app_statistics_service import AppStatisticsService
 from services.conversation_service import ConversationService
 from services.errors.app_model_config import AppModelConfigBrokenError
 from services.errors.conversation import ConversationNotExistsError, ConversationCompletedError
@@ -30,43 +31,18 @@ class MessageService:
             conversation_id=conversation_id
         )
 
-        if first_id:
-            first_message = db.session.query(Message) \
-                .filter(Message.conversation_id == conversation.id, Message.id == first_id).first()
-
-            if not first_message:
-                raise FirstMessageNotExistsError()
-
-            history_messages = db.session.query(Message).filter(
-                Message.conversation_id == conversation.id,
-                Message.created_at < first_message.created_at,
-                Message.id != first_message.id
-            ) \
-                .order_by(Message.created_at.desc()).limit(limit).all()
-        else:
-            history_messages = db.session.query(Message).filter(Message.conversation_id == conversation.id) \
-                .order_by(Message.created_at.desc()).limit(limit).all()
-
-        has_more = False
-        if len(history_messages) == limit:
-            current_page_first_message = history_messages[-1]
-            rest_count = db.session.query(Message).filter(
-                Message.conversation_id == conversation.id,
-                Message.created_at < current_page_first_message.created_at,
-                Message.id != current_page_first_message.id
-            ).count()
-
-            if rest_count > 0:
-                has_more = True
-
-        history_messages = list(reversed(history_messages))
-
-        return InfiniteScrollPagination(
-            data=history_messages,
+        pagination = InfiniteScrollPagination.paginate_by_keyset(
+            query=db.session.query(Message).filter(Message.conversation_id == conversation.id),
+            model=Message,
+            last_id=first_id,
             limit=limit,
-            has_more=has_more
+            last_not_exists_error=FirstMessageNotExistsError
         )
 
+        pagination.data = list(reversed(pagination.data))
+
+        return pagination
+
     @classmethod
     def pagination_by_last_id(cls, app_model: App, user: Optional[Union[Account | EndUser]],
                               last_id: Optional[str], limit: int, conversation_id: Optional[str] = None,
@@ -88,34 +64,12 @@ class MessageService:
         if include_ids is not None:
             base_query = base_query.filter(Message.id.in_(include_ids))
 
-        if last_id:
-            last_message = base_query.filter(Message.id == last_id).first()
-
-            if not last_message:
-                raise LastMessageNotExistsError()
-
-            history_messages = base_query.filter(
-                Message.created_at < last_message.created_at,
-                Message.id != last_message.id
-            ).order_by(Message.created_at.desc()).limit(limit).all()
-        else:
-            history_messages = base_query.order_by(Message.created_at.desc()).limit(limit).all()
-
-        has_more = False
-        if len(history_messages) == limit:
-            current_page_first_message = history_messages[-1]
-            rest_count = base_query.filter(
-                Message.created_at < current_page_first_message.created_at,
-                Message.id != current_page_first_message.id
-            ).count()
-
-            if rest_count > 0:
-                has_more = True
-
-        return InfiniteScrollPagination(
-            data=history_messages,
+        return InfiniteScrollPagination.paginate_by_keyset(
+            query=base_query,
+            model=Message,
+            last_id=last_id,
             limit=limit,
-            has_more=has_more
+            last_not_exists_error=LastMessageNotExistsError
         )
 
     @classmethod
@@ -132,8 +86,10 @@ class MessageService:
 
         feedback = message.user_feedback if isinstance(user, EndUser) else message.admin_feedback
 
+        feedback_count_delta = 0
         if not rating and feedback:
             db.session.delete(feedback)
+            feedback_count_delta = -1
         elif rating and feedback:
             feedback.rating = rating
         elif not rating and not feedback:
@@ -149,9 +105,13 @@ class MessageService:
                 from_account_id=(user.id if isinstance(user, Account) else None),
             )
             db.session.add(feedback)
+            feedback_count_delta = 1
 
         db.session.commit()
 
+        if feedback_count_delta:
+            AppStatisticsService.record_feedback(message, feedback_count_delta)
+
         return feedback
 
     @classmethod
@@ -5,6 +5,7 @@ import stripe
 from flask import current_app
 
 from core.model_providers.model_provider_factory import ModelProviderFactory
+from core.model_providers.quota_accounting import ProviderQuotaAccounting
 from extensions.ext_database import db
 from models.account import Account
 from models.provider import ProviderOrder, ProviderOrderPaymentStatus, ProviderType, Provider, ProviderQuotaType
@@ -137,6 +138,8 @@ class ProviderCheckoutService:
 
         db.session.commit()
 
+        ProviderQuotaAccounting.sync_quota_limit(provider)
+
     def _check_provider_payable(self, provider_name: str, model_provider_rule: dict):
         if ProviderType.SYSTEM.value not in model_provider_rule['support_provider_types']:
             raise ValueError(f'provider name {provider_name} not support payment')
@@ -229,6 +229,8 @@ class ProviderService:
             db.session.add(provider)
             db.session.commit()
 
+        ModelProviderFactory.clear_tenant_cache(tenant_id)
+
     def delete_custom_provider(self, tenant_id: str, provider_name: str) -> None:
         """
         delete custom provider.
@@ -254,6 +256,8 @@ class ProviderService:
             db.session.delete(provider)
             db.session.commit()
 
+        ModelProviderFactory.clear_tenant_cache(tenant_id)
+
     def custom_provider_model_config_validate(self,
                                               provider_name: str,
                                               model_name: str,
@@ -358,6 +362,8 @@ class ProviderService:
             db.session.add(provider_model)
             db.session.commit()
 
+        ModelProviderFactory.clear_tenant_cache(tenant_id)
+
     def delete_custom_provider_model(self,
                                      tenant_id: str,
                                      provider_name: str,
@@ -385,6 +391,8 @@ class ProviderService:
             db.session.delete(provider_model)
             db.session.commit()
 
+        ModelProviderFactory.clear_tenant_cache(tenant_id)
+
     def switch_preferred_provider(self, tenant_id: str, provider_name: str, preferred_provider_type: str) -> None:
         """
         switch preferred provider.
@@ -425,6 +433,8 @@ class ProviderService:
 
         db.session.commit()
 
+        ModelProviderFactory.clear_tenant_cache(tenant_id)
+
     def get_default_model_of_model_type(self, tenant_id: str, model_type: str) -> Optional[TenantDefaultModel]:
         """
         get default model of model type.
@@ -0,0 +1,61 @@
+import logging
+import time
+
+import click
+from celery import shared_task
+from werkzeug.exceptions import NotFound
+
+from core.generator.llm_generator import LLMGenerator
+from core.model_providers.error import LLMAPIConnectionError, LLMAPIUnavailableError, LLMRateLimitError
+from extensions.ext_database import db
+from models.model import Conversation, Message
+
+
+@shared_task(bind=True, queue='generation', max_retries=3, default_retry_delay=5)
+def generate_conversation_name_task(self, conversation_id: str, message_id: str):
+    """
+    Async Generate conversation name from its first message
+    :param conversation_id:
+    :param message_id: first message id
+
+    Usage: generate_conversation_name_task.delay(conversation_id, message_id)
+    """
+    logging.info(click.style('Start generate conversation name: {}'.format(conversation_id), fg='green'))
+    start_at = time.perf_counter()
+
+    conversation = db.session.query(Conversation).filter(Conversation.id == conversation_id).first()
+    if not conversation:
+        raise NotFound('Conversation not found')
+
+    message = db.session.query(Message).filter(Message.id == message_id).first()
+    if not message:
+        raise NotFound('Message not found')
+
+    app_model = conversation.app
+    if not app_model:
+        return
+
+    try:
+        name = LLMGenerator.generate_conversation_name(app_model.tenant_id, message.query, message.answer)
+
+        if len(name) > 75:
+            name = name[:75] + '...'
+    except (LLMAPIConnectionError, LLMAPIUnavailableError, LLMRateLimitError) as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+
+        name = 'New conversation'
+    except Exception:
+        name = 'New conversation'
+
+    # the user may have renamed the conversation while the name was generated, keep their name
+    db.session.query(Conversation).filter(
+        Conversation.id == conversation_id,
+        Conversation.name == 'New conversation'
+    ).update({'name': name}, synchronize_session=False)
+    db.session.commit()
+
+    end_at = time.perf_counter()
+    logging.info(
+        click.style('Conversation name generated: {} latency: {}'.format(conversation_id, end_at - start_at),
+                    fg='green'))
@@ -0,0 +1,86 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from core.embedding.cached_embedding import CacheEmbedding
+from libs import helper
+
+
+def test_precomputed_embeddings_skip_db_lookup(mocker):
+    mock_session = mocker.patch('core.embedding.cached_embedding.db.session')
+    cache_embedding = CacheEmbedding(MagicMock())
+    cache_embedding.add_precomputed_embeddings({
+        helper.generate_text_hash('foo'): np.array([0.6, 0.8], dtype=np.float32)
+    })
+
+    embeddings = cache_embedding.embed_documents(['foo'])
+
+    assert np.allclose(embeddings[0], [0.6, 0.8])
+    mock_session.query.assert_not_called()
+
+    # precomputed embeddings are consumed once
+    mock_session.query.return_value.filter.return_value.all.return_value = []
+    cache_embedding._embeddings.client.embed_documents.return_value = [[3.0, 4.0]]
+    mocker.patch.object(cache_embedding, '_save_embeddings')
+
+    embeddings = cache_embedding.embed_documents(['foo'])
+
+    mock_session.query.assert_called_once()
+    assert np.allclose(embeddings[0], [0.6, 0.8])
+
+
+def _cache_embedding(mocker, cached: dict = None, vectors: dict = None):
+    mock_session = mocker.patch('core.embedding.cached_embedding.db.session')
+    cached_rows = [MagicMock(hash=helper.generate_text_hash(text), get_embedding=MagicMock(return_value=vector))
+                   for text, vector in (cached or {}).items()]
+    mock_session.query.return_value.filter.return_value.all.return_value = cached_rows
+
+    cache_embedding = CacheEmbedding(MagicMock())
+    cache_embedding._embeddings.client.embed_documents.side_effect = \
+        lambda texts: [vectors[text] for text in texts]
+    return cache_embedding, mock_session
+
+
+def test_duplicate_texts_are_embedded_once_in_input_order(mocker):
+    cache_embedding, _ = _cache_embedding(mocker, vectors={'a': [3.0, 4.0], 'b': [0.0, 2.0]})
+    mock_save = mocker.patch.object(cache_embedding, '_save_embeddings')
+
+    embeddings = cache_embedding.embed_documents(['a', 'b', 'a'])
+
+    cache_embedding._embeddings.client.embed_documents.assert_called_once_with(['a', 'b'])
+    assert np.allclose(embeddings, [[0.6, 0.8], [0.0, 1.0], [0.6, 0.8]])
+    assert len(mock_save.call_args.args[0]) == 2
+
+
+def test_cached_and_uncached_texts(mocker):
+    cache_embedding, _ = _cache_embedding(mocker, cached={'b': [1.0, 0.0]}, vectors={'a': [3.0, 4.0]})
+    mock_save = mocker.patch.object(cache_embedding, '_save_embeddings')
+
+    embeddings = cache_embedding.embed_documents(['a', 'b'])
+
+    cache_embedding._embeddings.client.embed_documents.assert_called_once_with(['a'])
+    assert np.allclose(embeddings, [[0.6, 0.8], [1.0, 0.0]])
+    assert list(mock_save.call_args.args[0].keys()) == [helper.generate_text_hash('a')]
+
+
+def test_cached_embeddings_lookup_is_batched(mocker):
+    mocker.patch.object(CacheEmbedding, 'lookup_batch_size', 2)
+    cache_embedding, mock_session = _cache_embedding(
+        mocker, cached={'a': [1.0, 0.0], 'b': [0.0, 1.0], 'c': [1.0, 0.0]})
+
+    cache_embedding.embed_documents(['a', 'b', 'c'])
+
+    assert mock_session.query.return_value.filter.call_count == 2
+    cache_embedding._embeddings.client.embed_documents.assert_not_called()
+
+
+def test_failed_insert_keeps_returned_embeddings(mocker):
+    mocker.patch.object(CacheEmbedding, '_storage_dtype', new='float32')
+    cache_embedding, mock_session = _cache_embedding(mocker, vectors={'a': [3.0, 4.0]})
+    mock_session.execute.side_effect = Exception('db is down')
+
+    embeddings = cache_embedding.embed_documents(['a'])
+
+    mock_session.rollback.assert_called_once()
+    mock_session.commit.assert_not_called()
+    assert np.allclose(embeddings, [[0.6, 0.8]])
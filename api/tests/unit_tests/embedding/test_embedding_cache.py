@@ -0,0 +1,54 @@
+from core.embedding.embedding_cache import EmbeddingCache
+
+
+def test_local_hit_and_miss():
+    cache = EmbeddingCache(maxsize=2)
+
+    assert cache.get('model', 'hash1') is None
+
+    cache.set('model', 'hash1', [0.1, 0.2])
+    assert cache.get('model', 'hash1') == [0.1, 0.2]
+    assert cache.get('other_model', 'hash1') is None
+
+    stats = cache.stats()
+    assert stats['local_hits'] == 1
+    assert stats['misses'] == 2
+
+
+def test_lru_eviction():
+    cache = EmbeddingCache(maxsize=2)
+    cache.set('model', 'hash1', [1.0])
+    cache.set('model', 'hash2', [2.0])
+    cache.get('model', 'hash1')
+    cache.set('model', 'hash3', [3.0])
+
+    assert cache.get('model', 'hash2') is None
+    assert cache.get('model', 'hash1') == [1.0]
+    assert cache.get('model', 'hash3') == [3.0]
+
+
+def test_redis_tier_populates_local(mocker):
+    cache = EmbeddingCache(maxsize=10, redis_enabled=True, redis_ttl=60)
+    mock_setex = mocker.patch('extensions.ext_redis.redis_client.setex')
+    cache.set('model', 'hash1', [1.0])
+    mock_setex.assert_called_once()
+
+    cache.clear()
+    mocker.patch('extensions.ext_redis.redis_client.get', return_value=mock_setex.call_args[0][2])
+
+    assert cache.get('model', 'hash1') == [1.0]
+    assert cache.get('model', 'hash1') == [1.0]
+    assert cache.stats()['redis_hits'] == 1
+    assert cache.stats()['local_hits'] == 1
+
+
+def test_cached_embedding_is_not_shared_with_callers():
+    cache = EmbeddingCache(maxsize=2)
+    embedding = [0.1, 0.2]
+    cache.set('model', 'hash1', embedding)
+    embedding[0] = 1.0
+
+    cached_embedding = cache.get('model', 'hash1')
+    cached_embedding[1] = 1.0
+
+    assert cache.get('model', 'hash1') == [0.1, 0.2]
@@ -0,0 +1,237 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from core.index.keyword_table_index.keyword_table_index import KeywordTableIndex
+
+
+def test_bm25_scores_prefers_rare_keywords():
+    # node_a matches a rare keyword, node_b matches a keyword that appears in most segments
+    node_ids, scores = KeywordTableIndex.bm25_scores(
+        node_ids=['node_a', 'node_b'],
+        document_frequencies=np.array([1, 9], dtype=np.float64),
+        term_frequencies=np.array([1, 1], dtype=np.float64),
+        segment_lengths=np.array([100, 100], dtype=np.float64),
+        segment_count=10,
+        average_segment_length=100.0
+    )
+
+    scores = dict(zip(node_ids, scores))
+    assert scores['node_a'] > scores['node_b']
+
+
+def test_bm25_scores_sums_keywords_per_node():
+    node_ids, scores = KeywordTableIndex.bm25_scores(
+        node_ids=['node_a', 'node_b', 'node_a'],
+        document_frequencies=np.array([2, 2, 3], dtype=np.float64),
+        term_frequencies=np.array([1, 1, 1], dtype=np.float64),
+        segment_lengths=np.array([100, 100, 100], dtype=np.float64),
+        segment_count=10,
+        average_segment_length=100.0
+    )
+
+    assert node_ids == ['node_a', 'node_b']
+    assert scores[0] > scores[1]
+
+
+def test_bm25_scores_penalizes_long_segments():
+    node_ids, scores = KeywordTableIndex.bm25_scores(
+        node_ids=['short', 'long'],
+        document_frequencies=np.array([2, 2], dtype=np.float64),
+        term_frequencies=np.array([2, 2], dtype=np.float64),
+        segment_lengths=np.array([50, 500], dtype=np.float64),
+        segment_count=0,
+        average_segment_length=0.0
+    )
+
+    scores = dict(zip(node_ids, scores))
+    assert scores['short'] > scores['long']
+
+
+def _index(dataset_id='dataset-id'):
+    dataset = MagicMock()
+    dataset.id = dataset_id
+    return KeywordTableIndex(dataset)
+
+
+def test_migrate_legacy_keyword_table_locks_the_row(mocker):
+    mock_session = mocker.patch('core.index.keyword_table_index.keyword_table_index.db.session')
+    legacy_query = mock_session.query.return_value.filter.return_value.with_for_update.return_value
+    legacy_query.populate_existing.return_value.first.return_value = None
+    mock_add_postings = mocker.patch.object(KeywordTableIndex, '_add_postings')
+
+    # another run migrated and deleted the row while this one waited on the lock
+    assert _index().migrate_legacy_keyword_table() == 0
+    mock_add_postings.assert_not_called()
+
+
+def test_migrate_legacy_keyword_table(mocker):
+    mock_session = mocker.patch('core.index.keyword_table_index.keyword_table_index.db.session')
+    legacy_table = MagicMock()
+    legacy_table.keyword_table_dict = {'__data__': {'table': {
+        'apple': {'node_a', 'node_b', 'node_deleted'}, 'pear': {'node_a'}
+    }}}
+    legacy_query = mock_session.query.return_value.filter.return_value.with_for_update.return_value
+    legacy_query.populate_existing.return_value.first.return_value = legacy_table
+    mocker.patch.object(KeywordTableIndex, '_get_segment_contents',
+                        return_value={'node_a': 'apple pear', 'node_b': 'apple'})
+    mock_add_postings = mocker.patch.object(KeywordTableIndex, '_add_postings')
+
+    assert _index().migrate_legacy_keyword_table() == 2
+
+    # nodes whose segment was deleted since are not migrated
+    node_keywords = mock_add_postings.call_args.args[0]
+    assert sorted(node_keywords['node_a']) == ['apple', 'pear']
+    assert node_keywords['node_b'] == ['apple']
+    assert 'node_deleted' not in node_keywords
+    mock_session.query.return_value.filter.return_value.delete.assert_called_once()
+    mock_session.commit.assert_called_once()
+
+
+def test_search_reads_legacy_keyword_table_until_migrated(mocker):
+    mocker.patch('core.index.keyword_table_index.keyword_table_index.JiebaKeywordTableHandler') \
+        .return_value.extract_keywords.return_value = {'apple', 'pear'}
+    mocker.patch.object(KeywordTableIndex, '_get_legacy_keyword_table', return_value={
+        'apple': {'node_a', 'node_b'}, 'pear': {'node_a'}
+    })
+    mock_session = mocker.patch('core.index.keyword_table_index.keyword_table_index.db.session')
+    # node_c was indexed to postings after the upgrade
+    mock_session.query.return_value.filter.return_value.all.return_value = [
+        MagicMock(keyword='apple', index_node_id='node_c'),
+        MagicMock(keyword='pear', index_node_id='node_c'),
+        MagicMock(keyword='apple', index_node_id='node_a'),
+    ]
+
+    node_ids = _index()._retrieve_ids_by_query('apple pear', k=4)
+
+    assert set(node_ids[:2]) == {'node_a', 'node_c'}
+    assert node_ids[2] == 'node_b'
+
+
+def test_segment_lookups_are_batched(mocker):
+    mocker.patch.object(KeywordTableIndex, 'lookup_batch_size', 2)
+    mock_session = mocker.patch('core.index.keyword_table_index.keyword_table_index.db.session')
+    mock_session.query.return_value.filter.return_value.all.return_value = []
+
+    _index()._get_segment_contents(['node_a', 'node_b', 'node_c'])
+
+    assert mock_session.query.return_value.filter.call_count == 2
+
+
+def test_add_postings(mocker):
+    mock_insert = mocker.patch('core.index.keyword_table_index.keyword_table_index.insert')
+    mock_session = mocker.patch('core.index.keyword_table_index.keyword_table_index.db.session')
+    mock_session.execute.return_value = [MagicMock(keyword='art'), MagicMock(keyword='pear')]
+    mocker.patch.object(KeywordTableIndex, '_get_indexed_node_ids', return_value={'node_b'})
+    mock_update_statistics = mocker.patch.object(KeywordTableIndex, '_update_statistics')
+
+    _index()._add_postings(
+        {'node_a': ['art', 'pear'], 'node_b': ['art'], 'node_c': []},
+        {'node_a': 'start the art show, art-deco art', 'node_b': 'an art'}
+    )
+
+    rows = mock_insert.return_value.values.call_args.args[0]
+    postings = {(row['index_node_id'], row['keyword']): row for row in rows}
+    assert set(postings.keys()) == {('node_a', 'art'), ('node_a', 'pear'), ('node_b', 'art')}
+    # counted in tokens, so the "art" of "start" is not an occurrence
+    assert postings[('node_a', 'art')]['term_frequency'] == 3
+    # keywords that do not occur in the content still count once
+    assert postings[('node_a', 'pear')]['term_frequency'] == 1
+    # start, the, art, show, art, deco, art without punctuation
+    assert postings[('node_a', 'art')]['segment_length'] == 7
+
+    # only the postings actually inserted and the segments not indexed yet are counted
+    mock_update_statistics.assert_called_once_with(
+        keyword_deltas={'art': 1, 'pear': 1},
+        segment_count_delta=1,
+        segment_length_delta=7
+    )
+
+
+def test_count_uncounted_postings(mocker):
+    mock_session = mocker.patch('core.index.keyword_table_index.keyword_table_index.db.session')
+    mock_session.query.return_value.filter.return_value.with_for_update.return_value.all.return_value = [
+        MagicMock(id='posting_1', keyword='art', index_node_id='node_a'),
+        MagicMock(id='posting_2', keyword='show', index_node_id='node_a'),
+        MagicMock(id='posting_3', keyword='art', index_node_id='node_deleted'),
+    ]
+    mocker.patch.object(KeywordTableIndex, '_get_segment_contents', return_value={'node_a': 'the art of art'})
+    mock_update_statistics = mocker.patch.object(KeywordTableIndex, '_update_statistics')
+
+    assert _index().count_uncounted_postings() == 2
+
+    mappings = mock_session.bulk_update_mappings.call_args.args[1]
+    assert mappings == [
+        {'id': 'posting_1', 'term_frequency': 2, 'segment_length': 4},
+        {'id': 'posting_2', 'term_frequency': 1, 'segment_length': 4},
+        {'id': 'posting_3', 'term_frequency': 1, 'segment_length': 1},
+    ]
+    mock_update_statistics.assert_called_once_with(keyword_deltas={}, segment_count_delta=2, segment_length_delta=5)
+    mock_session.commit.assert_called_once()
+
+
+def _segment(index_node_id, content):
+    segment = MagicMock()
+    segment.index_node_id = index_node_id
+    segment.content = content
+    return segment
+
+
+def test_search_keeps_ranking_order(mocker):
+    mock_retrieve = mocker.patch.object(KeywordTableIndex, '_retrieve_ids_by_query',
+                                        return_value=['node_b', 'node_disabled', 'node_a'])
+    mock_session = mocker.patch('core.index.keyword_table_index.keyword_table_index.db.session')
+    mock_session.query.return_value.filter.return_value.all.return_value = [
+        _segment('node_a', 'apple pie'), _segment('node_b', 'apple')
+    ]
+
+    documents = _index().search('apple', search_kwargs={'k': 3})
+
+    mock_retrieve.assert_called_once_with('apple', 3)
+    assert [document.metadata['doc_id'] for document in documents] == ['node_b', 'node_a']
+    assert documents[0].page_content == 'apple'
+
+
+def test_search_skips_unsearchable_segments_before_truncating(mocker):
+    mocker.patch.object(KeywordTableIndex, 'lookup_batch_size', 2)
+    mocker.patch.object(KeywordTableIndex, '_retrieve_ids_by_query',
+                        return_value=['node_disabled', 'node_indexing', 'node_a', 'node_b', 'node_c'])
+    mock_session = mocker.patch('core.index.keyword_table_index.keyword_table_index.db.session')
+    mock_session.query.return_value.filter.return_value.all.side_effect = [
+        [],
+        [_segment('node_a', 'apple'), _segment('node_b', 'apple pie')],
+    ]
+
+    documents = _index().search('apple', search_kwargs={'k': 2})
+
+    assert [document.metadata['doc_id'] for document in documents] == ['node_a', 'node_b']
+    # the ranking is not looked up further once k segments are found
+    assert mock_session.query.return_value.filter.call_count == 2
+
+
+def test_retrieve_ids_by_bm25(mocker):
+    mock_session = mocker.patch('core.index.keyword_table_index.keyword_table_index.db.session')
+    frequency_query, posting_query, stat_query = MagicMock(), MagicMock(), MagicMock()
+    frequency_query.filter.return_value.all.return_value = [('apple', 3), ('durian', 1)]
+    posting_query.filter.return_value.all.return_value = [
+        MagicMock(index_node_id='node_a', keyword='apple', term_frequency=1, segment_length=100),
+        MagicMock(index_node_id='node_b', keyword='apple', term_frequency=1, segment_length=100),
+        MagicMock(index_node_id='node_b', keyword='durian', term_frequency=1, segment_length=100),
+        MagicMock(index_node_id='node_c', keyword='apple', term_frequency=3, segment_length=100),
+    ]
+    stat_query.filter.return_value.first.return_value = MagicMock(segment_count=10, average_segment_length=100.0)
+    mock_session.query.side_effect = [frequency_query, posting_query, stat_query]
+
+    node_ids = _index()._retrieve_ids_by_bm25(['apple', 'durian', 'unknown'])
+
+    assert node_ids == ['node_b', 'node_c', 'node_a']
+    # keywords missing from the dataset are not looked up in the postings
+    assert posting_query.filter.call_count == 1
+
+
+def test_retrieve_ids_by_bm25_without_indexed_keywords(mocker):
+    mock_session = mocker.patch('core.index.keyword_table_index.keyword_table_index.db.session')
+    mock_session.query.return_value.filter.return_value.all.return_value = []
+
+    assert _index()._retrieve_ids_by_bm25(['unknown']) == []
+    assert mock_session.query.call_count == 1
@@ -0,0 +1,99 @@
+from unittest.mock import MagicMock
+
+from redis.exceptions import ResponseError
+
+from core.index.segment_hit_counter import SegmentHitCounter
+
+
+def test_hits_are_aggregated_and_flushed_in_one_update(mocker):
+    mock_flusher = mocker.patch.object(SegmentHitCounter, '_flusher')
+    mock_pipeline = mocker.patch('core.index.segment_hit_counter.redis_client.pipeline').return_value
+
+    SegmentHitCounter.add('dataset-id', ['node-1', 'node-2'])
+    SegmentHitCounter.add('dataset-id', ['node-1'])
+
+    assert mock_pipeline.hincrby.call_count == 3
+    mock_pipeline.hincrby.assert_any_call('segment_hit_counts', 'dataset-id:node-1', 1)
+    assert mock_flusher.schedule.call_count == 2
+
+    mocker.patch('core.index.segment_hit_counter.redis_client.lock')
+    mocker.patch('core.index.segment_hit_counter.redis_client.exists', return_value=0)
+    mock_rename = mocker.patch('core.index.segment_hit_counter.redis_client.rename')
+    mocker.patch('core.index.segment_hit_counter.redis_client.hgetall', return_value={
+        b'dataset-id:node-1': b'2',
+        b'dataset-id:node-2': b'1'
+    })
+    mock_hdel = mocker.patch('core.index.segment_hit_counter.redis_client.hdel')
+    mock_delete = mocker.patch('core.index.segment_hit_counter.redis_client.delete')
+    mock_session = mocker.patch('core.index.segment_hit_counter.db.session')
+
+    SegmentHitCounter.flush(flask_app=MagicMock())
+
+    mock_rename.assert_called_once_with('segment_hit_counts', 'segment_hit_counts:flushing')
+    mock_session.execute.assert_called_once()
+    assert mock_session.execute.call_args.args[1] == {
+        'dataset_ids': ['dataset-id', 'dataset-id'],
+        'index_node_ids': ['node-1', 'node-2'],
+        'hits': [2, 1]
+    }
+    mock_session.commit.assert_called_once()
+    mock_hdel.assert_called_once_with('segment_hit_counts:flushing', b'dataset-id:node-1', b'dataset-id:node-2')
+    mock_delete.assert_called_once_with('segment_hit_counts:flushing')
+
+
+def test_leftover_hits_are_flushed_first(mocker):
+    mocker.patch('core.index.segment_hit_counter.redis_client.lock')
+    # counts left by a flush that stopped before deleting them
+    mocker.patch('core.index.segment_hit_counter.redis_client.exists', return_value=1)
+    mock_rename = mocker.patch('core.index.segment_hit_counter.redis_client.rename')
+    mocker.patch('core.index.segment_hit_counter.redis_client.hgetall', side_effect=[
+        {b'dataset-id:node-1': b'4'},
+        {b'dataset-id:node-1': b'1'}
+    ])
+    mocker.patch('core.index.segment_hit_counter.redis_client.hdel')
+    mock_delete = mocker.patch('core.index.segment_hit_counter.redis_client.delete')
+    mock_session = mocker.patch('core.index.segment_hit_counter.db.session')
+
+    SegmentHitCounter.flush(flask_app=MagicMock())
+
+    # the leftover hash is written before the current counts
+    assert [c.args[1]['hits'] for c in mock_session.execute.call_args_list] == [[4], [1]]
+    assert mock_delete.call_count == 2
+    mock_rename.assert_called_once()
+
+
+def test_flush_gives_counts_back_on_failure(mocker):
+    mocker.patch('core.index.segment_hit_counter.redis_client.lock')
+    mocker.patch('core.index.segment_hit_counter.redis_client.exists', return_value=0)
+    mocker.patch('core.index.segment_hit_counter.redis_client.rename')
+    mocker.patch('core.index.segment_hit_counter.redis_client.hgetall', return_value={b'dataset-id:node-1': b'2'})
+    mocker.patch('core.index.segment_hit_counter.redis_client.delete')
+    mock_pipeline = mocker.patch('core.index.segment_hit_counter.redis_client.pipeline').return_value
+    mock_session = mocker.patch('core.index.segment_hit_counter.db.session')
+    mock_session.execute.side_effect = Exception('db is down')
+
+    SegmentHitCounter.flush(flask_app=MagicMock())
+
+    mock_session.rollback.assert_called_once()
+    mock_pipeline.hincrby.assert_called_once_with('segment_hit_counts', b'dataset-id:node-1', 2)
+    mock_pipeline.hdel.assert_called_once_with('segment_hit_counts:flushing', b'dataset-id:node-1')
+
+
+def test_flush_without_hits(mocker):
+    mocker.patch('core.index.segment_hit_counter.redis_client.lock')
+    mocker.patch('core.index.segment_hit_counter.redis_client.exists', return_value=0)
+    mocker.patch('core.index.segment_hit_counter.redis_client.rename', side_effect=ResponseError('no such key'))
+    mock_session = mocker.patch('core.index.segment_hit_counter.db.session')
+
+    SegmentHitCounter.flush(flask_app=MagicMock())
+
+    mock_session.execute.assert_not_called()
+
+
+def test_flush_in_another_process(mocker):
+    mocker.patch('core.index.segment_hit_counter.redis_client.lock').return_value.acquire.return_value = False
+    mock_rename = mocker.patch('core.index.segment_hit_counter.redis_client.rename')
+
+    SegmentHitCounter.flush(flask_app=MagicMock())
+
+    mock_rename.assert_not_called()
@@ -0,0 +1,24 @@
+from core.indexing_runner import IndexingRunner
+
+
+def test_split_batches_by_tokens_limit_boundary():
+    batches = IndexingRunner._split_batches_by_tokens(['a', 'b', 'c', 'd'], [3, 2, 5, 1], max_tokens=5)
+
+    # a batch may reach max_tokens exactly, one more token starts the next batch
+    assert batches == [['a', 'b'], ['c'], ['d']]
+
+
+def test_split_batches_by_tokens_oversized_text():
+    batches = IndexingRunner._split_batches_by_tokens(['a', 'big', 'b'], [1, 100, 1], max_tokens=10)
+
+    assert batches == [['a'], ['big'], ['b']]
+
+
+def test_split_batches_by_tokens_max_size():
+    batches = IndexingRunner._split_batches_by_tokens(['a', 'b', 'c'], [1, 1, 1], max_tokens=100, max_size=2)
+
+    assert batches == [['a', 'b'], ['c']]
+
+
+def test_split_batches_by_tokens_empty():
+    assert IndexingRunner._split_batches_by_tokens([], [], max_tokens=10) == []
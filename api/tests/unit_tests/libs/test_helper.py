@@ -0,0 +1,6 @@
+from libs.helper import escape_like_pattern
+
+
+def test_escape_like_pattern():
+    assert escape_like_pattern('100%_done\\') == '100\\%\\_done\\\\'
+    assert escape_like_pattern('plain keyword') == 'plain keyword'
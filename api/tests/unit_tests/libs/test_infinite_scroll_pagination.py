@@ -0,0 +1,43 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from libs.infinite_scroll_pagination import InfiniteScrollPagination
+from models.model import Message
+from services.errors.message import LastMessageNotExistsError
+
+
+def _query(rows):
+    query = MagicMock()
+    query.filter.return_value = query
+    query.with_entities.return_value.scalar_subquery.return_value = MagicMock()
+    query.order_by.return_value.limit.return_value.all.return_value = rows
+    return query
+
+
+def test_paginate_fetches_one_extra_row():
+    query = _query(['m1', 'm2', 'm3'])
+
+    pagination = InfiniteScrollPagination.paginate_by_keyset(query, Message, None, 2, LastMessageNotExistsError)
+
+    query.order_by.return_value.limit.assert_called_once_with(3)
+    assert pagination.data == ['m1', 'm2']
+    assert pagination.has_more is True
+
+
+def test_paginate_last_page():
+    query = _query(['m1'])
+
+    pagination = InfiniteScrollPagination.paginate_by_keyset(query, Message, 'last-id', 2, LastMessageNotExistsError)
+
+    assert pagination.data == ['m1']
+    assert pagination.has_more is False
+    query.first.assert_not_called()
+
+
+def test_paginate_with_unknown_last_id():
+    query = _query([])
+    query.first.return_value = None
+
+    with pytest.raises(LastMessageNotExistsError):
+        InfiniteScrollPagination.paginate_by_keyset(query, Message, 'unknown-id', 2, LastMessageNotExistsError)
@@ -0,0 +1,38 @@
+from unittest.mock import MagicMock
+
+from libs.periodic_flusher import PeriodicFlusher
+
+
+def test_schedule_arms_one_timer_until_it_fires(mocker):
+    mock_app = MagicMock()
+    mocker.patch('libs.periodic_flusher.current_app', new=mock_app)
+    mock_timer = mocker.patch('libs.periodic_flusher.threading.Timer')
+    flush = MagicMock()
+    flusher = PeriodicFlusher(interval=lambda: 5, flush=flush)
+
+    flusher.schedule()
+    flusher.schedule()
+
+    mock_timer.assert_called_once()
+    assert mock_timer.call_args.args[0] == 5
+    mock_timer.return_value.start.assert_called_once()
+
+    # the timer fires with the app of the caller that armed it
+    run, flask_app = mock_timer.call_args.args[1], mock_timer.call_args.kwargs['kwargs']['flask_app']
+    run(flask_app=flask_app)
+    flush.assert_called_once_with(mock_app._get_current_object.return_value)
+
+    flusher.schedule()
+    assert mock_timer.call_count == 2
+
+
+def test_failed_flush_does_not_block_the_next_one(mocker):
+    mocker.patch('libs.periodic_flusher.current_app', new=MagicMock())
+    mock_timer = mocker.patch('libs.periodic_flusher.threading.Timer')
+    flusher = PeriodicFlusher(interval=lambda: 5, flush=MagicMock(side_effect=Exception('db is down')))
+
+    flusher.schedule()
+    mock_timer.call_args.args[1](flask_app=MagicMock())
+    flusher.schedule()
+
+    assert mock_timer.call_count == 2
@@ -0,0 +1,42 @@
+import pytest
+
+from libs import rsa
+
+
+@pytest.fixture
+def key_storage(mocker):
+    keys = {}
+    mocker.patch('libs.rsa.storage.save', side_effect=lambda filepath, data: keys.__setitem__(filepath, data))
+    mocker.patch('libs.rsa.storage.load', side_effect=lambda filepath: keys[filepath])
+    mocker.patch('libs.rsa.redis_client.get', return_value=None)
+    mocker.patch('libs.rsa.redis_client.setex')
+    mocker.patch('libs.rsa.redis_client.delete')
+    return keys
+
+
+def test_decrypt_is_cached(key_storage, mocker):
+    public_key = rsa.generate_key_pair('tenant-1')
+    encrypted_text = rsa.encrypt('api-key', public_key)
+
+    spy_decrypt = mocker.spy(rsa, '_decrypt')
+    spy_load = mocker.spy(rsa.storage, 'load')
+
+    assert rsa.decrypt(encrypted_text, 'tenant-1') == 'api-key'
+    assert rsa.decrypt(encrypted_text, 'tenant-1') == 'api-key'
+    assert spy_decrypt.call_count == 1
+
+    assert rsa.decrypt(rsa.encrypt('other-api-key', public_key), 'tenant-1') == 'other-api-key'
+    assert spy_decrypt.call_count == 2
+    assert spy_load.call_count == 1
+
+
+def test_decrypt_after_key_pair_reset_elsewhere(key_storage):
+    public_key = rsa.generate_key_pair('tenant-2')
+    assert rsa.decrypt(rsa.encrypt('api-key', public_key), 'tenant-2') == 'api-key'
+
+    # simulate a reset done by another process, which leaves the local private key cached
+    cached_private_key = rsa._private_key_cache['tenant-2']
+    new_public_key = rsa.generate_key_pair('tenant-2')
+    rsa._private_key_cache['tenant-2'] = cached_private_key
+
+    assert rsa.decrypt(rsa.encrypt('new-api-key', new_public_key), 'tenant-2') == 'new-api-key'
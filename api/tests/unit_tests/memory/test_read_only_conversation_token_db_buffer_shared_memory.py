@@ -0,0 +1,104 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.memory import read_only_conversation_token_db_buffer_shared_memory
+from core.memory.read_only_conversation_token_db_buffer_shared_memory import \
+    ReadOnlyConversationTokenDBBufferSharedMemory
+from core.model_providers.models.entity.message import PromptMessage, MessageType
+from core.model_providers.models.llm.base import BaseLLM
+from models.model import Conversation, Message
+
+
+def _get_memory(mocker, messages: list[Message], max_token_limit: int, num_tokens=None):
+    mocker.patch.dict(read_only_conversation_token_db_buffer_shared_memory._prompt_overhead_tokens_cache, clear=True)
+    mock_query = MagicMock()
+    mock_query.filter.return_value.order_by.return_value.limit.return_value.all.return_value = \
+        list(reversed(messages))
+    mocker.patch('extensions.ext_database.db.session.query', return_value=mock_query)
+    mocker.patch.object(ReadOnlyConversationTokenDBBufferSharedMemory, '_backfill_message_tokens')
+
+    model_instance = MagicMock(spec=BaseLLM)
+    model_instance.tokenizer_key = 'FakeLLM:fake:fake-model'
+    # one token per character
+    model_instance.get_num_tokens.side_effect = num_tokens or (lambda prompt_messages: sum(
+        len(prompt_message.content) for prompt_message in prompt_messages))
+
+    memory = ReadOnlyConversationTokenDBBufferSharedMemory(
+        conversation=Conversation(id='conversation_id'),
+        model_instance=model_instance,
+        max_token_limit=max_token_limit
+    )
+
+    return memory, model_instance
+
+
+def _get_messages(prefix: str) -> list[Message]:
+    return [
+        Message(id=f'{prefix}_1', query='aaaa', answer='bbbb'),
+        Message(id=f'{prefix}_2', query='cc', answer='dd'),
+        Message(id=f'{prefix}_3', query='e', answer='f'),
+    ]
+
+
+def test_buffer_within_limit(mocker):
+    memory, _ = _get_memory(mocker, _get_messages('within'), max_token_limit=100)
+
+    assert [message.content for message in memory.buffer] == ['aaaa', 'bbbb', 'cc', 'dd', 'e', 'f']
+
+
+def test_buffer_prunes_oldest_messages(mocker):
+    memory, _ = _get_memory(mocker, _get_messages('prune'), max_token_limit=5)
+
+    assert [message.content for message in memory.buffer] == ['dd', 'e', 'f']
+
+
+def test_buffer_tokenizes_each_message_once(mocker):
+    memory, model_instance = _get_memory(mocker, _get_messages('once'), max_token_limit=5)
+
+    memory.buffer
+    memory.buffer
+
+    # one call per query and answer, and two to measure the prompt overhead of the tokenizer
+    assert model_instance.get_num_tokens.call_count == 8
+
+
+def test_buffer_uses_persisted_tokens(mocker):
+    messages = [
+        Message(id='persisted_1', query='aaaa', answer='bbbb', memory_tokenizer='FakeLLM:fake:fake-model',
+                memory_query_tokens=100, memory_answer_tokens=1),
+        # counted by another tokenizer, and the completion tokens of the answer are not in memory units
+        Message(id='persisted_2', query='cc', answer='dd', memory_tokenizer='fake:fake-model',
+                memory_query_tokens=1, memory_answer_tokens=1, model_provider='fake', model_id='fake-model',
+                answer_tokens=30),
+    ]
+    memory, model_instance = _get_memory(mocker, messages, max_token_limit=10)
+
+    assert [message.content for message in memory.buffer] == ['bbbb', 'cc', 'dd']
+    # the query and answer of the second message are tokenized, plus two calls for the prompt overhead
+    assert model_instance.get_num_tokens.call_count == 2 + 2
+    memory._backfill_message_tokens.assert_called_once_with([('persisted_2', 2, 2)])
+
+
+def _chat_num_tokens(prompt_messages):
+    # like chat models: framing tokens per message, plus reply priming once per prompt
+    return sum(len(prompt_message.content) + 3 for prompt_message in prompt_messages) + 3
+
+
+def _prune_by_whole_prompt(chat_messages, max_token_limit):
+    # the pruning before per-message counts, tokenizing the remaining messages after each removal
+    while _chat_num_tokens(chat_messages) > max_token_limit and chat_messages:
+        chat_messages = chat_messages[1:]
+    return chat_messages
+
+
+@pytest.mark.parametrize('max_token_limit', range(0, 40))
+def test_buffer_counts_prompt_overhead_once(mocker, max_token_limit):
+    messages = _get_messages(f'overhead_{max_token_limit}')
+    memory, _ = _get_memory(mocker, messages, max_token_limit=max_token_limit, num_tokens=_chat_num_tokens)
+
+    chat_messages = [PromptMessage(content=content, type=MessageType.HUMAN)
+                     for message in messages for content in (message.query, message.answer)]
+    expected = [message.content for message in _prune_by_whole_prompt(chat_messages, max_token_limit)]
+
+    assert [message.content for message in memory.buffer] == expected
@@ -34,11 +34,9 @@ def test_check_quota_over_limit(mocker):
         return_value={'support_provider_types': ['system']}
     )
 
-    mock_query = MagicMock()
-    mock_query.filter.return_value.first.return_value = None
-    mocker.patch('extensions.ext_database.db.session.query', return_value=mock_query)
+    mocker.patch('core.model_providers.quota_accounting.ProviderQuotaAccounting.is_over_limit', return_value=True)
 
-    provider = FakeModelProvider(provider=Provider(provider_type=ProviderType.SYSTEM.value))
+    provider = FakeModelProvider(provider=Provider(provider_type=ProviderType.SYSTEM.value, is_valid=True))
 
     with pytest.raises(QuotaExceededError):
         provider.check_quota_over_limit()
@@ -51,11 +49,9 @@ def test_check_quota_not_over_limit(mocker):
         return_value={'support_provider_types': ['system']}
     )
 
-    mock_query = MagicMock()
-    mock_query.filter.return_value.first.return_value = Provider()
-    mocker.patch('extensions.ext_database.db.session.query', return_value=mock_query)
+    mocker.patch('core.model_providers.quota_accounting.ProviderQuotaAccounting.is_over_limit', return_value=False)
 
-    provider = FakeModelProvider(provider=Provider(provider_type=ProviderType.SYSTEM.value))
+    provider = FakeModelProvider(provider=Provider(provider_type=ProviderType.SYSTEM.value, is_valid=True))
 
     assert provider.check_quota_over_limit() is None
 
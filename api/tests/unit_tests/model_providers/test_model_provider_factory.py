@@ -0,0 +1,40 @@
+from flask import Flask
+
+from core.model_providers.model_provider_factory import ModelProviderFactory
+from models.provider import Provider, ProviderType
+
+
+def _mock_preferred_provider(mocker):
+    provider = Provider(
+        tenant_id='tenant-id',
+        provider_name='openai',
+        provider_type=ProviderType.CUSTOM.value,
+        is_valid=True
+    )
+    return mocker.patch.object(ModelProviderFactory, '_get_preferred_provider', return_value=provider)
+
+
+def test_preferred_model_provider_is_resolved_once_per_app_context(mocker):
+    mock_get_preferred_provider = _mock_preferred_provider(mocker)
+
+    with Flask(__name__).app_context():
+        model_provider = ModelProviderFactory.get_preferred_model_provider('tenant-id', 'openai')
+        assert ModelProviderFactory.get_preferred_model_provider('tenant-id', 'openai') is model_provider
+        assert mock_get_preferred_provider.call_count == 1
+
+        ModelProviderFactory.clear_tenant_cache('tenant-id')
+        ModelProviderFactory.get_preferred_model_provider('tenant-id', 'openai')
+        assert mock_get_preferred_provider.call_count == 2
+
+    with Flask(__name__).app_context():
+        ModelProviderFactory.get_preferred_model_provider('tenant-id', 'openai')
+        assert mock_get_preferred_provider.call_count == 3
+
+
+def test_no_cache_outside_app_context(mocker):
+    mock_get_preferred_provider = _mock_preferred_provider(mocker)
+
+    ModelProviderFactory.get_preferred_model_provider('tenant-id', 'openai')
+    ModelProviderFactory.get_preferred_model_provider('tenant-id', 'openai')
+
+    assert mock_get_preferred_provider.call_count == 2
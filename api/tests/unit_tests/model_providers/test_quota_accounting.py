@@ -0,0 +1,57 @@
+from unittest.mock import MagicMock
+
+from core.model_providers import quota_accounting
+from core.model_providers.quota_accounting import ProviderQuotaAccounting
+from models.provider import Provider
+
+
+def _provider():
+    return Provider(id='provider-id', tenant_id='tenant-id', provider_name='openai',
+                    quota_limit=10, quota_used=3)
+
+
+def test_quota_is_loaded_from_db_once(mocker):
+    mocker.patch('core.model_providers.quota_accounting.redis_client.hmget', return_value=[None, None])
+    mock_run_script = mocker.patch.object(ProviderQuotaAccounting, '_run_script', return_value=[b'10', b'3'])
+    mock_query = mocker.patch('core.model_providers.quota_accounting.db.session.query')
+    mock_query.return_value.filter.return_value.first.return_value = _provider()
+
+    assert ProviderQuotaAccounting.is_over_limit(_provider()) is False
+    assert mock_run_script.call_args.args[0] is quota_accounting._INIT_SCRIPT
+    assert mock_run_script.call_args.args[2] == [10, 3, ProviderQuotaAccounting.idle_ttl]
+
+    mocker.patch('core.model_providers.quota_accounting.redis_client.hmget', return_value=[b'10', b'10'])
+    assert ProviderQuotaAccounting.is_over_limit(_provider()) is True
+    assert mock_query.call_count == 1
+
+
+def test_consume_is_flushed_in_background(mocker):
+    mock_flusher = mocker.patch.object(ProviderQuotaAccounting, '_flusher')
+    mock_run_script = mocker.patch.object(ProviderQuotaAccounting, '_run_script', return_value=1)
+    mock_query = mocker.patch('core.model_providers.quota_accounting.db.session.query')
+
+    ProviderQuotaAccounting.consume(_provider(), 5)
+    ProviderQuotaAccounting.consume(_provider(), 5)
+
+    assert mock_run_script.call_count == 2
+    assert mock_run_script.call_args.args[2] == [5, 'provider-id']
+    assert mock_flusher.schedule.call_count == 2
+    mock_query.assert_not_called()
+
+    mocker.patch('core.model_providers.quota_accounting.redis_client.spop', side_effect=[[b'provider-id'], []])
+    mock_run_script.return_value = 10
+    mocker.patch('core.model_providers.quota_accounting.db.session.commit')
+    ProviderQuotaAccounting.flush(flask_app=MagicMock())
+
+    assert mock_run_script.call_args.args[0] is quota_accounting._TAKE_PENDING_SCRIPT
+    mock_query.return_value.filter.return_value.update.assert_called_once()
+
+
+def test_consume_falls_back_to_db(mocker):
+    mocker.patch.object(ProviderQuotaAccounting, '_run_script', side_effect=ConnectionError())
+    mock_query = mocker.patch('core.model_providers.quota_accounting.db.session.query')
+    mocker.patch('core.model_providers.quota_accounting.db.session.commit')
+
+    ProviderQuotaAccounting.consume(_provider(), 5)
+
+    mock_query.return_value.filter.return_value.update.assert_called_once()
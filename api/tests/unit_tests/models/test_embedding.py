@@ -0,0 +1,44 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from models.dataset import Embedding
+
+
+def test_float32_round_trip():
+    data = [0.1, -0.2, 0.3]
+    embedding = Embedding(model_name='test', hash='hash')
+    embedding.set_embedding(data)
+
+    assert not embedding.is_legacy_format()
+    assert len(embedding.embedding) == Embedding.ENCODING_HEADER_SIZE + 4 * len(data)
+
+    array = embedding.get_embedding_array()
+    assert array.dtype == np.float32
+    assert np.allclose(array, data)
+    assert np.allclose(embedding.get_embedding(), data)
+
+
+def test_float16_round_trip():
+    data = [0.1, -0.2, 0.3]
+    embedding = Embedding(model_name='test', hash='hash')
+    embedding.set_embedding(data, 'float16')
+
+    assert len(embedding.embedding) == Embedding.ENCODING_HEADER_SIZE + 2 * len(data)
+    assert np.allclose(embedding.get_embedding(), data, atol=1e-3)
+
+
+def test_read_legacy_pickled_embedding():
+    data = [0.1, -0.2, 0.3]
+    embedding = Embedding(model_name='test', hash='hash')
+    embedding.embedding = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+    assert embedding.is_legacy_format()
+    assert embedding.get_embedding() == data
+    assert embedding.get_embedding_array().dtype == np.float64
+
+
+def test_unsupported_dtype():
+    with pytest.raises(ValueError):
+        Embedding.encode_embedding([0.1], 'float64')
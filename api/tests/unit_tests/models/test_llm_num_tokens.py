@@ -0,0 +1,51 @@
+from typing import List, Optional
+from unittest.mock import MagicMock
+
+from core.model_providers.models.entity.message import PromptMessage, MessageType
+from core.model_providers.models.llm.base import BaseLLM
+
+
+class CountingLLM(BaseLLM):
+    def __init__(self, name: str):
+        self.name = name
+        self._model_provider = MagicMock()
+        self._model_provider.provider_name = 'counting'
+        self.calls = 0
+
+    def _init_client(self):
+        pass
+
+    def _run(self, messages: List[PromptMessage], stop: Optional[List[str]] = None, callbacks=None, **kwargs):
+        pass
+
+    def _get_num_tokens(self, messages: List[PromptMessage]) -> int:
+        self.calls += 1
+        return sum(len(message.content) for message in messages)
+
+    def _set_model_kwargs(self, model_kwargs):
+        pass
+
+    def handle_exceptions(self, ex: Exception) -> Exception:
+        return ex
+
+
+def test_get_num_tokens_is_memoized_across_instances():
+    first = CountingLLM('memoized-model')
+    second = CountingLLM('memoized-model')
+    messages = [PromptMessage(content='system prompt', type=MessageType.SYSTEM)]
+
+    assert first.get_num_tokens(messages) == 13
+    assert second.get_num_tokens(messages) == 13
+    assert first.calls + second.calls == 1
+
+
+def test_get_num_tokens_keyed_by_tokenizer_and_message_type():
+    first = CountingLLM('model-a')
+    second = CountingLLM('model-b')
+
+    first.get_num_tokens([PromptMessage(content='hello', type=MessageType.HUMAN)])
+    first.get_num_tokens([PromptMessage(content='hello', type=MessageType.ASSISTANT)])
+    second.get_num_tokens([PromptMessage(content='hello', type=MessageType.HUMAN)])
+
+    assert first.calls == 2
+    assert second.calls == 1
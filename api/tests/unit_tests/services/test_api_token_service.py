@@ -0,0 +1,72 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from models.model import ApiToken, App
+from services.api_token_service import ApiTokenService
+
+
+@pytest.fixture
+def mock_db(mocker):
+    ApiTokenService.configure(cache_ttl=10, last_used_update_interval=60)
+    return mocker.patch('services.api_token_service.db')
+
+
+def test_api_token_is_cached(mock_db):
+    mock_db.session.query.return_value.filter.return_value.first.return_value = ApiToken(
+        id='token-id', type='app', app_id='app-id', token='app-token'
+    )
+
+    for _ in range(3):
+        api_token = ApiTokenService.get_api_token('app-token', 'app')
+        assert api_token.app_id == 'app-id'
+
+    assert mock_db.session.query.call_count == 1
+
+    ApiTokenService.invalidate_token('app-token')
+    ApiTokenService.get_api_token('app-token', 'app')
+    assert mock_db.session.query.call_count == 2
+
+
+def test_invalid_api_token_is_not_cached(mock_db):
+    mock_db.session.query.return_value.filter.return_value.first.return_value = None
+
+    assert ApiTokenService.get_api_token('invalid-token', 'app') is None
+    assert ApiTokenService.get_api_token('invalid-token', 'app') is None
+    assert mock_db.session.query.call_count == 2
+
+
+def test_app_snapshot_is_merged_without_query(mock_db):
+    app_model = App(id='app-id', tenant_id='tenant-id', name='app', mode='chat', status='normal',
+                    enable_site=True, enable_api=True, api_rpm=0, api_rph=0)
+    mock_db.session.query.return_value.filter.return_value.first.return_value = app_model
+    mock_db.session.merge.side_effect = lambda instance, load: instance
+
+    assert ApiTokenService.get_app('app-id') is app_model
+
+    cached_app = ApiTokenService.get_app('app-id')
+    assert cached_app is not app_model
+    assert cached_app.enable_api is True
+    assert mock_db.session.query.call_count == 1
+    assert mock_db.session.merge.call_args.kwargs['load'] is False
+
+    ApiTokenService.invalidate_app('app-id')
+    ApiTokenService.get_app('app-id')
+    assert mock_db.session.query.call_count == 2
+
+
+def test_last_used_is_recorded_once_per_interval(mock_db, mocker):
+    mock_flusher = mocker.patch.object(ApiTokenService, '_flusher')
+    api_token = MagicMock(id='token-id')
+
+    for _ in range(5):
+        ApiTokenService.record_last_used(api_token)
+
+    mock_flusher.schedule.assert_called_once()
+    mock_db.session.execute.assert_not_called()
+
+    ApiTokenService.flush_last_used(flask_app=MagicMock())
+
+    mock_db.session.execute.assert_called_once()
+    assert [row['token_id'] for row in mock_db.session.execute.call_args.args[1]] == ['token-id']
+    mock_db.session.commit.assert_called_once()
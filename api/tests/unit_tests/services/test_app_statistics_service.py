@@ -0,0 +1,178 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+from redis.exceptions import ResponseError
+
+from services.app_statistics_service import AppStatisticsService, _REBUILD_SQLS
+
+
+def _message(**kwargs):
+    message = MagicMock()
+    message.id = 'message-id'
+    message.app_id = 'app-id'
+    message.conversation_id = 'conversation-id'
+    message.from_end_user_id = 'end-user-id'
+    message.created_at = datetime(2023, 9, 18, 10, 25, 3)
+    message.message_tokens = 10
+    message.answer_tokens = 20
+    message.total_price = Decimal('0.0001234')
+    message.provider_response_latency = 1.5
+    for key, value in kwargs.items():
+        setattr(message, key, value)
+    return message
+
+
+def _conversation(**kwargs):
+    conversation = MagicMock()
+    conversation.id = 'conversation-id'
+    conversation.override_model_configs = None
+    conversation.created_at = datetime(2023, 9, 18, 9, 59, 59)
+    for key, value in kwargs.items():
+        setattr(conversation, key, value)
+    return conversation
+
+
+def test_record_message(mocker):
+    mock_flusher = mocker.patch.object(AppStatisticsService, '_flusher')
+    mock_pipeline = mocker.patch('services.app_statistics_service.redis_client.pipeline').return_value
+
+    AppStatisticsService.record_message(_message(), _conversation())
+
+    key = AppStatisticsService.counters_key
+    mock_pipeline.hincrby.assert_any_call(key, 'app-id:2023091810:message_count', 1)
+    mock_pipeline.hincrby.assert_any_call(key, 'app-id:2023091810:total_price', 1234)
+    mock_pipeline.hincrbyfloat.assert_called_once_with(key, 'app-id:2023091810:total_latency', 1.5)
+    # sessions are keyed by the hour the conversation was created
+    mock_pipeline.hincrby.assert_any_call(key, 'app-id:2023091809:session_message_count', 1)
+    assert {c.args[1] for c in mock_pipeline.sadd.call_args_list} == {
+        'app-id:2023091810:conversation:conversation-id',
+        'app-id:2023091810:end_user:end-user-id',
+        'app-id:2023091809:session:conversation-id'
+    }
+    mock_pipeline.execute.assert_called_once()
+    mock_flusher.schedule.assert_called_once()
+
+
+def test_record_message_of_debug_conversation(mocker):
+    mocker.patch.object(AppStatisticsService, '_flusher')
+    mock_pipeline = mocker.patch('services.app_statistics_service.redis_client.pipeline').return_value
+
+    AppStatisticsService.record_message(_message(from_end_user_id=None),
+                                        _conversation(override_model_configs='{}'))
+
+    assert all('session' not in c.args[1] for c in mock_pipeline.hincrby.call_args_list)
+    assert [c.args[1] for c in mock_pipeline.sadd.call_args_list] == ['app-id:2023091810:conversation:conversation-id']
+
+
+def test_record_message_skips_unsaved_message(mocker):
+    mock_flusher = mocker.patch.object(AppStatisticsService, '_flusher')
+    mock_pipeline = mocker.patch('services.app_statistics_service.redis_client.pipeline')
+
+    # inserted when generating starts, the prompt is only set when the message is saved
+    AppStatisticsService.record_message(_message(message=''), _conversation())
+
+    mock_pipeline.assert_not_called()
+    mock_flusher.schedule.assert_not_called()
+
+
+def test_rebuild_counts_saved_messages_only():
+    for sql in _REBUILD_SQLS:
+        for select in sql.split('UNION'):
+            # feedbacks are counted on any message, like record_feedback does
+            if 'messages' not in select or 'message_feedbacks' in select:
+                continue
+
+            assert "CAST(message AS text) <> '\"\"'" in select or "CAST(m.message AS text) <> '\"\"'" in select
+
+
+def _mock_flush_lock(mocker, leftover: bool = False):
+    mocker.patch('services.app_statistics_service.redis_client.lock')
+    mocker.patch('services.app_statistics_service.redis_client.exists', return_value=int(leftover))
+
+
+def test_flush_groups_counters_by_app_hour(mocker):
+    _mock_flush_lock(mocker)
+    mocker.patch('services.app_statistics_service.redis_client.rename')
+    mocker.patch('services.app_statistics_service.redis_client.hgetall', return_value={
+        b'app-id:2023091810:message_count': b'2',
+        b'app-id:2023091810:total_price': b'2468',
+        b'app-id:2023091810:total_latency': b'3.5',
+        b'app-id:2023091809:session_message_count': b'2',
+    })
+    mocker.patch('services.app_statistics_service.redis_client.smembers', return_value={
+        b'app-id:2023091810:conversation:d8c6f1a0-4f5a-4b8e-9a53-2f0c1a9d3b11',
+    })
+    mock_hdel = mocker.patch('services.app_statistics_service.redis_client.hdel')
+    mock_srem = mocker.patch('services.app_statistics_service.redis_client.srem')
+    mock_delete = mocker.patch('services.app_statistics_service.redis_client.delete')
+    mock_session = mocker.patch('services.app_statistics_service.db.session')
+
+    AppStatisticsService.flush(flask_app=MagicMock())
+
+    assert mock_session.execute.call_count == 2
+    counters_params = mock_session.execute.call_args_list[0].args[1]
+    assert counters_params['app_ids'] == ['app-id', 'app-id']
+    assert counters_params['hours'] == [datetime(2023, 9, 18, 10), datetime(2023, 9, 18, 9)]
+    assert counters_params['message_count'] == [2, 0]
+    assert counters_params['total_price'] == [Decimal('0.0002468'), Decimal('0')]
+    assert counters_params['total_latency'] == [3.5, 0]
+    assert counters_params['session_message_count'] == [0, 2]
+
+    members_params = mock_session.execute.call_args_list[1].args[1]
+    assert members_params['member_types'] == ['conversation']
+    assert members_params['member_ids'] == ['d8c6f1a0-4f5a-4b8e-9a53-2f0c1a9d3b11']
+    assert mock_session.commit.call_count == 2
+    assert len(mock_hdel.call_args.args[1:]) == 4
+    mock_srem.assert_called_once()
+    assert [c.args[0] for c in mock_delete.call_args_list] == ['app_statistics_counters:flushing',
+                                                                'app_statistics_members:flushing']
+
+
+def test_flush_writes_leftover_counters_first(mocker):
+    _mock_flush_lock(mocker, leftover=True)
+    mocker.patch('services.app_statistics_service.redis_client.rename')
+    mocker.patch('services.app_statistics_service.redis_client.hgetall', side_effect=[
+        {b'app-id:2023091810:message_count': b'3'},
+        {b'app-id:2023091810:message_count': b'1'}
+    ])
+    mocker.patch('services.app_statistics_service.redis_client.smembers', return_value=set())
+    mocker.patch('services.app_statistics_service.redis_client.hdel')
+    mocker.patch('services.app_statistics_service.redis_client.delete')
+    mock_session = mocker.patch('services.app_statistics_service.db.session')
+
+    AppStatisticsService.flush(flask_app=MagicMock())
+
+    counters_params = [c.args[1] for c in mock_session.execute.call_args_list if 'message_count' in c.args[1]]
+    assert [params['message_count'] for params in counters_params] == [[3], [1]]
+
+
+def test_flush_gives_counts_back_on_failure(mocker):
+    _mock_flush_lock(mocker)
+    mocker.patch('services.app_statistics_service.redis_client.rename')
+    mocker.patch('services.app_statistics_service.redis_client.hgetall', return_value={
+        b'app-id:2023091810:message_count': b'2',
+    })
+    mocker.patch('services.app_statistics_service.redis_client.smembers', return_value=set())
+    mocker.patch('services.app_statistics_service.redis_client.delete')
+    mock_pipeline = mocker.patch('services.app_statistics_service.redis_client.pipeline').return_value
+    mock_session = mocker.patch('services.app_statistics_service.db.session')
+    mock_session.execute.side_effect = Exception('db is down')
+
+    AppStatisticsService.flush(flask_app=MagicMock())
+
+    mock_session.rollback.assert_called_once()
+    mock_pipeline.hincrby.assert_called_once_with(AppStatisticsService.counters_key,
+                                                  'app-id:2023091810:message_count', 2)
+    mock_pipeline.hdel.assert_called_once_with('app_statistics_counters:flushing',
+                                               b'app-id:2023091810:message_count')
+
+
+def test_flush_without_changes(mocker):
+    _mock_flush_lock(mocker)
+    mocker.patch('services.app_statistics_service.redis_client.rename', side_effect=ResponseError('no such key'))
+    mock_session = mocker.patch('services.app_statistics_service.db.session')
+
+    AppStatisticsService.flush(flask_app=MagicMock())
+
+    mock_session.execute.assert_not_called()
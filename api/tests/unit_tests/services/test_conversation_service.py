@@ -0,0 +1,38 @@
+from unittest.mock import MagicMock
+
+from models.model import Conversation
+from services.conversation_service import ConversationService
+
+
+def test_load_properties(mocker):
+    conversations = [Conversation(id='conversation-1'), Conversation(id='conversation-2')]
+
+    mock_session = mocker.patch('services.conversation_service.db.session')
+    message_count_query = MagicMock()
+    message_count_query.filter.return_value.group_by.return_value.all.return_value = [('conversation-1', 3)]
+    feedback_query = MagicMock()
+    feedback_query.filter.return_value.group_by.return_value.all.return_value = [
+        ('conversation-1', 'user', 'like', 2),
+        ('conversation-2', 'admin', 'dislike', 1)
+    ]
+    mock_session.query.side_effect = [message_count_query, feedback_query]
+
+    ConversationService.load_properties(conversations, ['message_count', 'user_feedback_stats'])
+
+    assert mock_session.query.call_count == 2
+
+    # served from the preloaded values, without querying per conversation
+    assert conversations[0].message_count == 3
+    assert conversations[1].message_count == 0
+    assert conversations[0].user_feedback_stats == {'like': 2, 'dislike': 0}
+    assert conversations[0].admin_feedback_stats == {'like': 0, 'dislike': 0}
+    assert conversations[1].admin_feedback_stats == {'like': 0, 'dislike': 1}
+    assert mock_session.query.call_count == 2
+
+
+def test_load_properties_without_conversations(mocker):
+    mock_session = mocker.patch('services.conversation_service.db.session')
+
+    ConversationService.load_properties([], ['message_count'])
+
+    mock_session.query.assert_not_called()
@@ -0,0 +1,64 @@
+from unittest.mock import MagicMock
+
+from core.stream.generate_task_scheduler import GenerateTaskScheduler
+
+
+def _add_task(scheduler: GenerateTaskScheduler, mocker, alive: bool = True):
+    mocker.patch('core.stream.generate_task_scheduler.time.monotonic', return_value=0)
+    mocker.patch.object(scheduler, '_ensure_started')
+    worker_thread = MagicMock()
+    worker_thread.is_alive.return_value = alive
+    on_ping = MagicMock()
+    on_timeout = MagicMock()
+    scheduler.add(worker_thread, on_ping=on_ping, on_timeout=on_timeout)
+
+    return worker_thread, on_ping, on_timeout
+
+
+def test_ping_until_timeout(mocker):
+    scheduler = GenerateTaskScheduler(timeout=30, ping_interval=10)
+    _, on_ping, on_timeout = _add_task(scheduler, mocker)
+
+    scheduler.run_pending(now=5)
+    assert on_ping.call_count == 0
+
+    scheduler.run_pending(now=10)
+    scheduler.run_pending(now=20)
+    assert on_ping.call_count == 2
+    on_timeout.assert_not_called()
+
+    scheduler.run_pending(now=30)
+    assert on_ping.call_count == 2
+    on_timeout.assert_called_once()
+    assert scheduler.pending_count() == 0
+
+
+def test_finished_worker_is_dropped(mocker):
+    scheduler = GenerateTaskScheduler(timeout=30, ping_interval=10)
+    worker_thread, on_ping, on_timeout = _add_task(scheduler, mocker)
+
+    worker_thread.is_alive.return_value = False
+    scheduler.run_pending(now=10)
+
+    on_ping.assert_not_called()
+    on_timeout.assert_not_called()
+    assert scheduler.pending_count() == 0
+
+
+def test_call_later(mocker):
+    scheduler = GenerateTaskScheduler(timeout=30, ping_interval=10)
+    _add_task(scheduler, mocker)
+    callback, cancelled_callback = MagicMock(), MagicMock()
+    scheduler.call_later(0.05, callback)
+    scheduler.call_later(0.05, cancelled_callback).cancel()
+
+    # calls are not counted as generate workers
+    assert scheduler.pending_count() == 1
+
+    scheduler.run_pending(now=0.01)
+    callback.assert_not_called()
+
+    scheduler.run_pending(now=0.05)
+    callback.assert_called_once()
+    cancelled_callback.assert_not_called()
+    assert scheduler.pending_count() == 1
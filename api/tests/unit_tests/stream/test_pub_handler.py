@@ -0,0 +1,148 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.conversation_message_task import PubHandler, ConversationTaskStoppedException
+from models.model import EndUser
+
+
+def _pub_handler(mocker, window: float, max_bytes: int, scheduled_flush: bool = False):
+    mocker.patch.object(PubHandler, '_is_stopped', return_value=False)
+    if not scheduled_flush:
+        mocker.patch('core.conversation_message_task.generate_task_scheduler.call_later')
+    mock_publish = mocker.patch('core.conversation_message_task.stream_transport.publish')
+    pub_handler = PubHandler(
+        user=EndUser(id='end-user-id'),
+        task_id='task-id',
+        message=MagicMock(id='message-id'),
+        conversation=MagicMock(id='conversation-id', mode='chat'),
+        text_coalesce_window=window,
+        text_coalesce_max_bytes=max_bytes
+    )
+
+    return pub_handler, mock_publish
+
+
+def _published_texts(mock_publish):
+    return [call.args[1]['data']['text'] for call in mock_publish.call_args_list
+            if call.args[1]['event'] == 'message']
+
+
+def test_first_text_is_published_immediately(mocker):
+    mocker.patch('core.conversation_message_task.time.monotonic', return_value=100.0)
+    pub_handler, mock_publish = _pub_handler(mocker, window=0.05, max_bytes=1024)
+
+    pub_handler.pub_text('Hello')
+    pub_handler.pub_text(',')
+    pub_handler.pub_text(' world')
+
+    assert _published_texts(mock_publish) == ['Hello']
+
+    pub_handler.pub_message_end([])
+
+    assert _published_texts(mock_publish) == ['Hello', ', world']
+    assert mock_publish.call_args_list[-1].args[1]['event'] == 'message_end'
+
+
+def test_text_is_flushed_by_window_and_size(mocker):
+    mock_monotonic = mocker.patch('core.conversation_message_task.time.monotonic', return_value=100.0)
+    pub_handler, mock_publish = _pub_handler(mocker, window=0.05, max_bytes=8)
+
+    pub_handler.pub_text('a')
+    pub_handler.pub_text('b')
+    mock_monotonic.return_value = 100.06
+    pub_handler.pub_text('c')
+    pub_handler.pub_text('defghijk')
+
+    assert _published_texts(mock_publish) == ['a', 'bc', 'defghijk']
+
+
+def test_buffered_text_is_flushed_when_the_window_ends(mocker):
+    pub_handler, mock_publish = _pub_handler(mocker, window=0.05, max_bytes=1024, scheduled_flush=True)
+    published = threading.Event()
+
+    def publish(channel, content):
+        if content.get('data', {}).get('text') == 'b':
+            published.set()
+
+    mock_publish.side_effect = publish
+
+    pub_handler.pub_text('a')
+    pub_handler.pub_text('b')
+
+    # no more text comes, the buffered delta is still delivered by the scheduler
+    assert published.wait(timeout=2)
+    assert _published_texts(mock_publish) == ['a', 'b']
+
+    pub_handler.pub_message_end([])
+    assert _published_texts(mock_publish) == ['a', 'b']
+
+
+def test_flush_cancels_the_scheduled_flush(mocker):
+    mocker.patch('core.conversation_message_task.time.monotonic', return_value=100.0)
+    pub_handler, mock_publish = _pub_handler(mocker, window=0.05, max_bytes=1024)
+    mock_call_later = mocker.patch('core.conversation_message_task.generate_task_scheduler.call_later')
+
+    pub_handler.pub_text('a')
+    pub_handler.pub_text('b')
+    pub_handler.pub_text('c')
+
+    # scheduled once when the buffer gets its first delta
+    mock_call_later.assert_called_once()
+    assert mock_call_later.call_args.args == (pytest.approx(0.05), pub_handler._flush_text)
+
+    pub_handler.pub_end()
+
+    mock_call_later.return_value.cancel.assert_called_once()
+    assert _published_texts(mock_publish) == ['a', 'bc']
+
+
+def test_coalescing_disabled(mocker):
+    pub_handler, mock_publish = _pub_handler(mocker, window=0, max_bytes=0)
+
+    for text in ['a', 'b', 'c']:
+        pub_handler.pub_text(text)
+
+    assert _published_texts(mock_publish) == ['a', 'b', 'c']
+
+
+def _stop_checking_pub_handler(stop_check_interval: float, task_id: str = 'task-id'):
+    return PubHandler(
+        user=EndUser(id='end-user-id'),
+        task_id=task_id,
+        message=MagicMock(id='message-id'),
+        conversation=MagicMock(id='conversation-id', mode='chat'),
+        stop_check_interval=stop_check_interval
+    )
+
+
+def test_stop_flag_is_read_at_most_once_per_interval(mocker):
+    mocker.patch('core.conversation_message_task.stream_transport.publish')
+    mock_monotonic = mocker.patch('core.conversation_message_task.time.monotonic', return_value=100.0)
+    mock_get = mocker.patch('core.conversation_message_task.redis_client.get', return_value=None)
+    pub_handler = _stop_checking_pub_handler(stop_check_interval=0.2)
+
+    for _ in range(10):
+        pub_handler.pub_text('a')
+    assert mock_get.call_count == 1
+
+    mock_monotonic.return_value = 100.3
+    mock_get.return_value = b'1'
+    with pytest.raises(ConversationTaskStoppedException):
+        pub_handler.pub_text('a')
+    assert mock_get.call_count == 2
+
+
+def test_stop_in_same_process_is_seen_without_redis(mocker):
+    mocker.patch('core.conversation_message_task.stream_transport.publish')
+    mocker.patch('core.conversation_message_task.redis_client.setex')
+    mock_get = mocker.patch('core.conversation_message_task.redis_client.get', return_value=None)
+    pub_handler = _stop_checking_pub_handler(stop_check_interval=60, task_id='stopped-task-id')
+
+    pub_handler.pub_text('a')
+    PubHandler.stop(EndUser(id='end-user-id'), 'stopped-task-id')
+
+    with pytest.raises(ConversationTaskStoppedException):
+        pub_handler.pub_text('b')
+    assert mock_get.call_count == 1
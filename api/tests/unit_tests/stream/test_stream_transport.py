@@ -0,0 +1,42 @@
+import threading
+
+from core.stream.stream_transport import StreamTransport
+
+
+def test_in_memory_publish_skips_redis(mocker):
+    mock_publish = mocker.patch('extensions.ext_redis.redis_client.publish')
+    transport = StreamTransport(in_memory=True)
+    subscription = transport.subscribe('channel')
+
+    transport.publish('channel', {'event': 'message', 'data': {'text': 'a'}})
+    transport.publish('channel', {'event': 'end'})
+
+    results = []
+    for result in subscription.listen():
+        results.append(result)
+        if result['event'] == 'end':
+            break
+
+    assert results == [{'event': 'message', 'data': {'text': 'a'}}, {'event': 'end'}]
+    mock_publish.assert_not_called()
+
+
+def test_publish_without_local_subscriber_uses_redis(mocker):
+    mock_publish = mocker.patch('extensions.ext_redis.redis_client.publish')
+    transport = StreamTransport(in_memory=True)
+    subscription = transport.subscribe('channel')
+    subscription.unsubscribe()
+
+    transport.publish('channel', {'event': 'ping'})
+
+    mock_publish.assert_called_once_with('channel', '{"event": "ping"}')
+
+
+def test_close_ends_listen():
+    transport = StreamTransport(in_memory=True)
+    subscription = transport.subscribe('channel')
+
+    timer = threading.Timer(0.05, subscription.close)
+    timer.start()
+
+    assert list(subscription.listen()) == []
@@ -0,0 +1,67 @@
+from unittest.mock import MagicMock
+
+from tasks.generate_conversation_name_task import generate_conversation_name_task
+
+
+def _mock_db(mocker, conversation, message):
+    mock_session = mocker.patch('tasks.generate_conversation_name_task.db.session')
+    mock_session.query.return_value.filter.return_value.first.side_effect = [conversation, message]
+    return mock_session
+
+
+def _updated_name(mock_session):
+    mock_update = mock_session.query.return_value.filter.return_value.update
+    mock_update.assert_called_once()
+    return mock_update.call_args.args[0]['name']
+
+
+def test_generate_conversation_name(mocker):
+    conversation = MagicMock()
+    mock_session = _mock_db(mocker, conversation, MagicMock(query='hi', answer='hello'))
+    mocker.patch('tasks.generate_conversation_name_task.LLMGenerator.generate_conversation_name',
+                 return_value='x' * 80)
+
+    generate_conversation_name_task.run('conversation-id', 'message-id')
+
+    assert _updated_name(mock_session) == 'x' * 75 + '...'
+    mock_session.commit.assert_called_once()
+
+
+def test_generate_conversation_name_keeps_a_user_rename(mocker):
+    conversation = MagicMock()
+    mock_session = _mock_db(mocker, conversation, MagicMock(query='hi', answer='hello'))
+    # renamed by the user while the name was generated, the conditional update matches no row
+    mock_session.query.return_value.filter.return_value.update.return_value = 0
+    mocker.patch('tasks.generate_conversation_name_task.LLMGenerator.generate_conversation_name',
+                 return_value='Greetings')
+
+    generate_conversation_name_task.run('conversation-id', 'message-id')
+
+    criteria = [str(criterion) for criterion in mock_session.query.return_value.filter.call_args.args]
+    assert criteria == ['conversations.id = :id_1', 'conversations.name = :name_1']
+    assert mock_session.query.return_value.filter.call_args.args[1].right.value == 'New conversation'
+    assert not isinstance(conversation.name, str)
+
+
+def test_generate_conversation_name_falls_back_on_error(mocker):
+    conversation = MagicMock()
+    mock_session = _mock_db(mocker, conversation, MagicMock(query='hi', answer='hello'))
+    mocker.patch('tasks.generate_conversation_name_task.LLMGenerator.generate_conversation_name',
+                 side_effect=ValueError('bad output'))
+
+    generate_conversation_name_task.run('conversation-id', 'message-id')
+
+    assert _updated_name(mock_session) == 'New conversation'
+
+
+def test_handler_enqueues_the_task(mocker):
+    from events.event_handlers.generate_conversation_name_when_first_message_created import handle
+
+    mock_delay = mocker.patch(
+        'events.event_handlers.generate_conversation_name_when_first_message_created.generate_conversation_name_task.delay')
+    conversation = MagicMock(id='conversation-id', mode='chat')
+
+    handle(MagicMock(id='message-id'), conversation=conversation, is_first_message=True)
+    handle(MagicMock(id='message-id-2'), conversation=conversation, is_first_message=False)
+
+    mock_delay.assert_called_once_with('conversation-id', 'message-id')
@@ -0,0 +1,28 @@
+from unittest.mock import MagicMock
+
+from langchain.schema import Document
+
+from core.conversation_message_task import ConversationMessageTask
+from core.tool.dataset_retriever_tool import DatasetRetrieverTool
+from models.dataset import Dataset
+
+
+def test_dataset_of_orchestrator_is_reused(mocker):
+    mock_query = mocker.patch('core.tool.dataset_retriever_tool.db.session.query')
+    mock_keyword_table_index = mocker.patch('core.tool.dataset_retriever_tool.KeywordTableIndex')
+    mock_keyword_table_index.return_value.search.return_value = [
+        Document(page_content='content', metadata={'doc_id': 'node-1'})
+    ]
+
+    dataset = Dataset(id='dataset-id', tenant_id='tenant-id', name='dataset', indexing_technique='economy')
+    tool = DatasetRetrieverTool.from_dataset(
+        dataset=dataset,
+        k=2,
+        conversation_message_task=MagicMock(spec=ConversationMessageTask),
+        return_resource=False,
+        retriever_from='dev'
+    )
+
+    assert tool.run(tool_input={'query': 'query'}) == 'content'
+    assert mock_keyword_table_index.call_args.kwargs['dataset'] is dataset
+    mock_query.assert_not_called()